@@ -0,0 +1,77 @@
+from time import perf_counter
+from zipfile import ZipFile
+
+from converter import unique_filename
+
+
+class _ZipStreamBuffer:
+    """Write-only file object that collects what ZipFile writes until it is drained.
+
+    It has no seek/tell, so ZipFile writes each member with a trailing data
+    descriptor instead of seeking back to patch the local header, which is
+    what lets the archive be sent while it is still being built.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members, on_zip_time=None):
+    """Yields a ZIP archive chunk by chunk from an iterable of (arcname, data) pairs.
+
+    Each member is written and flushed as soon as the iterable produces it, so
+    only one member is held by the archive at a time. ``on_zip_time``, if
+    given, is called with the seconds spent writing the archive (not waiting
+    for members) once it is complete.
+    """
+    buffer = _ZipStreamBuffer()
+    zip_seconds = 0.0
+    with ZipFile(buffer, 'w') as zipf:
+        for arcname, data in members:
+            start = perf_counter()
+            zipf.writestr(arcname, data)
+            chunk = buffer.drain()
+            zip_seconds += perf_counter() - start
+            yield chunk
+        start = perf_counter()
+    # Central directory, written when the archive is closed
+    chunk = buffer.drain()
+    zip_seconds += perf_counter() - start
+    if on_zip_time is not None:
+        on_zip_time(zip_seconds)
+    yield chunk
+
+
+def batch_members(results):
+    """Yields the (arcname, data) members of a batch archive from an iterable of FileResults.
+
+    Converted documents keep their result order. Files that failed and any
+    extraction warnings are listed in conversion_errors.txt and
+    conversion_warnings.txt at the end instead of failing the whole batch.
+    """
+    errors = []
+    warnings = []
+    used_names = set()
+    for result in results:
+        if result.error:
+            errors.append(f"{result.label}: {result.error}")
+        else:
+            warnings.extend(f"{result.label}: {warning['message']}" for warning in result.warnings)
+            # Two students can share a name (and a re-uploaded file a UID); keep every member
+            yield unique_filename(result.filename, used_names), result.data
+    if errors:
+        yield "conversion_errors.txt", "\n".join(errors) + "\n"
+    if warnings:
+        yield "conversion_warnings.txt", "\n".join(warnings) + "\n"
@@ -0,0 +1 @@
+"""Performance benchmarks for the converter. Run modules with ``python -m benchmarks.<name>``."""
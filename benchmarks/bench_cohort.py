@@ -0,0 +1,48 @@
+"""Benchmark: one cohort workbook vs one workbook per student.
+
+Converts the same students three ways in a single process: a workbook per
+student with convert, one workbook with every student stacked down a sheet,
+and one workbook with a sheet per student, both with convert_workbook.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cohort [--students N] [--courses N]
+"""
+import argparse
+import time
+
+from benchmarks.workbooks import make_cohort_workbook, make_workbook
+from converter import convert, convert_workbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100, help="students in the cohort (default: 100)")
+    parser.add_argument("--courses", type=int, default=6, help="courses per student (default: 6)")
+    args = parser.parse_args()
+
+    separate = [make_workbook(i, courses=args.courses) for i in range(args.students)]
+    stacked = make_cohort_workbook(args.students, stacked=True, courses=args.courses)
+    sheets = make_cohort_workbook(args.students, stacked=False, courses=args.courses)
+    convert(separate[0])  # warm imports and the skeleton
+
+    start = time.perf_counter()
+    for contents in separate:
+        convert(contents)
+    separate_seconds = time.perf_counter() - start
+    load_seconds = {}
+    for name, contents in (("stacked", stacked), ("sheets", sheets)):
+        start = time.perf_counter()
+        results = convert_workbook(contents)
+        load_seconds[name] = (time.perf_counter() - start, sum(result.timings["load"] for _, result in results))
+        assert len(results) == args.students
+
+    print(f"{args.students} students, {args.courses} courses each")
+    print(f"workbook per student: {separate_seconds:7.2f} s  ({args.students / separate_seconds:6.1f} students/s)")
+    for name, (seconds, loading) in load_seconds.items():
+        print(f"cohort, {name:8s}:    {seconds:7.2f} s  ({args.students / seconds:6.1f} students/s, "
+              f"{separate_seconds / seconds:4.1f}x, load {loading:5.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark: per-file cost of CSV/TSV exports vs the same exports as xlsx.
+
+Writes each synthetic student as xlsx, CSV and TSV, checks the three give the
+same extracted record, then times loading the sheet grid alone and the whole
+conversion for each format (medians over the batch).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_csv [--students N] [--courses N]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.workbooks import make_delimited, make_workbook
+from converter import convert, load_raw_sheet
+
+FORMATS = [("xlsx", "export.xlsx"), ("csv", "export.csv"), ("tsv", "export.tsv")]
+
+
+def median_ms(func, inputs, filename):
+    samples = []
+    for contents in inputs:
+        start = time.perf_counter()
+        func(contents, filename=filename)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200, help="files per format (default: 200)")
+    parser.add_argument("--courses", type=int, default=6, help="courses per student (default: 6)")
+    args = parser.parse_args()
+
+    inputs = {
+        "xlsx": [make_workbook(i, courses=args.courses) for i in range(args.students)],
+        "csv": [make_delimited(i, courses=args.courses) for i in range(args.students)],
+        "tsv": [make_delimited(i, courses=args.courses, delimiter="\t") for i in range(args.students)],
+    }
+    # Every format must extract the same student (warms imports and the skeleton too)
+    records = [convert(inputs[fmt][0], filename=filename).record for fmt, filename in FORMATS]
+    assert all(record == records[0] for record in records), "formats extract different records"
+
+    print(f"{args.students} students, {args.courses} courses")
+    print(f"{'format':8s} {'bytes':>8s} {'load ms':>9s} {'convert ms':>11s}")
+    for fmt, filename in FORMATS:
+        size = statistics.median(len(contents) for contents in inputs[fmt])
+        load = median_ms(load_raw_sheet, inputs[fmt], filename)
+        total = median_ms(convert, inputs[fmt], filename)
+        print(f"{fmt:8s} {size:8.0f} {load:9.2f} {total:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
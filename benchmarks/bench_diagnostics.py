@@ -0,0 +1,59 @@
+"""Benchmark: per-file conversion cost with debug diagnostics off vs on.
+
+With DEBUG enabled every schedule row, parsed time and course is formatted and
+written, which is what converter's unconditional prints used to cost; with the
+default level that output is skipped entirely. Both runs write to /dev/null so
+only formatting and I/O call overhead is measured.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_diagnostics [--files N] [--courses N]
+"""
+import argparse
+import logging
+import os
+import time
+
+from benchmarks.workbooks import make_workbook
+from converter import convert, logger
+
+
+def time_per_file(workbooks):
+    start = time.perf_counter()
+    for contents in workbooks:
+        convert(contents)
+    return (time.perf_counter() - start) / len(workbooks) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=50, help="files per run (default: 50)")
+    parser.add_argument("--courses", type=int, default=7, help="courses per workbook (default: 7)")
+    args = parser.parse_args()
+
+    workbooks = [make_workbook(i, courses=args.courses) for i in range(args.files)]
+    devnull = open(os.devnull, "w")
+    handler = logging.StreamHandler(devnull)
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        convert(workbooks[0])  # warm imports and caches
+
+        logger.setLevel(logging.WARNING)
+        quiet_ms = time_per_file(workbooks)
+        logger.setLevel(logging.DEBUG)
+        debug_ms = time_per_file(workbooks)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+        logger.setLevel(logging.NOTSET)
+        devnull.close()
+
+    print(f"{args.files} files, {args.courses} courses each")
+    print(f"debug diagnostics on:  {debug_ms:7.2f} ms/file")
+    print(f"debug diagnostics off: {quiet_ms:7.2f} ms/file")
+    print(f"saving:                {debug_ms - quiet_ms:7.2f} ms/file ({(debug_ms - quiet_ms) / debug_ms:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: re-converting edited workbooks from scratch vs patching the previous documents.
+
+Converts a batch of students into a temporary record store, then re-converts
+edited copies of each workbook twice: without the store, so every document is
+rendered from the skeleton, and with the store's previous conversions, so only
+the changed course rows and schedule cells are patched (where worth_patching
+allows). Two advising edits are measured: one section moved to another time,
+and one course dropped. Render (which includes the store lookup) and save
+stage medians are compared, along with the sum of the stages and the wall-clock
+time of the whole convert call.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_incremental [--students N] [--courses N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from benchmarks.workbooks import HEADER_ROW_INDEX, make_workbook, save_workbook
+from converter import convert
+from records import RecordStore, input_hash
+
+
+STAGES = ["render", "save"]
+# The edited section's new meeting time
+MOVED_TIME = "3:30-4:25 pm"
+
+
+def move_section(contents, course=0):
+    """Returns the workbook with one course's meeting time changed."""
+    workbook = load_workbook(BytesIO(contents))
+    workbook.active.cell(HEADER_ROW_INDEX + 2 + course, 10, MOVED_TIME)
+    return save_workbook(workbook)
+
+
+def timed_convert(contents, previous=None):
+    """Converts contents, returning (result, wall-clock seconds)."""
+    start = time.perf_counter()
+    result = convert(contents, previous)
+    return result, time.perf_counter() - start
+
+
+def median_ms(runs, stage=None):
+    if stage == "wall":
+        return statistics.median(seconds for _, seconds in runs) * 1000
+    if stage is None:
+        return statistics.median(sum(result.timings.values()) for result, _ in runs) * 1000
+    return statistics.median(result.timings[stage] for result, _ in runs) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200, help="students in the batch (default: 200)")
+    parser.add_argument("--courses", type=int, default=6, help="courses per student before the edit (default: 6)")
+    args = parser.parse_args()
+
+    originals = [make_workbook(i, courses=args.courses) for i in range(args.students)]
+    edits = {
+        "moved": [move_section(contents) for contents in originals],
+        "dropped": [make_workbook(i, courses=args.courses - 1) for i in range(args.students)],
+    }
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = RecordStore(os.path.join(store_dir, "records.sqlite3"))
+        convert(originals[0])  # warm imports and the skeleton
+        for contents in originals:
+            store.put(input_hash(contents), [(None, convert(contents))])
+
+        print(f"{args.students} students, {args.courses} courses")
+        print(f"{'edit':8s} {'stage':8s} {'full ms':>9s} {'patched ms':>11s}")
+        for edit, edited in edits.items():
+            # Alternate the two ways per student, so drift over the run affects both alike
+            full, patched = [], []
+            for contents in edited:
+                full.append(timed_convert(contents))
+                patched.append(timed_convert(contents, store.previous_render))
+            assert all(a.record == b.record for (a, _), (b, _) in zip(full, patched))
+            for stage in STAGES + [None, "wall"]:
+                print(f"{edit:8s} {stage or 'total':8s} {median_ms(full, stage):9.2f} {median_ms(patched, stage):11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Micro-benchmark: cached regex parse_time vs the old strptime fallback chain.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parse_time [--repeat N]
+"""
+import argparse
+import time
+from datetime import datetime
+
+from converter import parse_time, STANDARD_TIMES, TIME_PATTERN
+
+
+def strptime_parse_time(time_str):
+    """The pre-cache parse_time: tries each strptime format in turn."""
+    if not isinstance(time_str, str):
+        return None
+    time_str = time_str.strip()
+    if not time_str:
+        return None
+    for fmt in ('%I:%M %p', '%I:%M%p', '%H:%M %p', '%H:%M%p', '%H:%M', '%I:%M'):
+        try:
+            return datetime.strptime(time_str, fmt).time()
+        except ValueError:
+            pass
+    return None
+
+
+def registrar_time_strings():
+    """The endpoint strings a typical batch feeds to parse_time."""
+    raw_ranges = [
+        "8:25-9:20 am", "10:05-11:00 am", "12:15-1:10 pm", "1:20 -2:15 pm",
+        "9:00-9:55", "4:35-6:00 pm", "6:10-7:35 pm", "2:25 pm-3:20 pm",
+    ]
+    strings = []
+    for raw in raw_ranges + STANDARD_TIMES:
+        match = TIME_PATTERN.search(raw)
+        if match:
+            start, end = match.group(0).split('-')
+            strings.extend([start.strip(), end.strip()])
+        # Standard slot endpoints are parsed with the slot's am/pm appended
+        for part in raw.split('-'):
+            strings.append(part.strip() + " pm")
+    return strings
+
+
+def run(func, workload):
+    start = time.perf_counter_ns()
+    for time_str in workload:
+        func(time_str)
+    return (time.perf_counter_ns() - start) / len(workload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000,
+                        help="times the distinct-string set is replayed (default: 2000)")
+    args = parser.parse_args()
+
+    distinct = registrar_time_strings()
+    workload = distinct * args.repeat
+
+    parse_time.cache_clear()
+    cached_ns = run(parse_time, workload)
+    strptime_ns = run(strptime_parse_time, workload)
+
+    info = parse_time.cache_info()
+    hit_rate = info.hits / (info.hits + info.misses)
+    print(f"workload:         {len(workload)} parses of {len(set(distinct))} distinct strings")
+    print(f"strptime chain:   {strptime_ns:9.1f} ns/parse")
+    print(f"cached regex:     {cached_ns:9.1f} ns/parse")
+    print(f"speedup:          {strptime_ns / cached_ns:9.1f}x")
+    print(f"cache hit rate:   {hit_rate:9.2%} ({info.hits} hits, {info.misses} misses, size {info.currsize}/{info.maxsize})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Benchmark: per-stage conversion timings and peak memory at several batch sizes.
+
+Each file is converted with converter.convert, which times its stages: load
+(xlsx -> sheet), extraction (student info and courses), grid mapping (schedule
+rows -> time slots), render (filling the document XML) and save (DOCX
+packaging); the batch's documents are then zipped. Per-file stages report
+median/p95 over the batch; peak memory is traced in a second, untimed pass.
+
+Results are written as JSON, and ``--compare`` prints the change in stage
+medians against an earlier results file (e.g. one from the previous commit).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stages [--batches 1 10 100 1000] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from archive import stream_zip
+from benchmarks.workbooks import make_workbook
+from converter import CONVERTER_VERSION, convert
+
+
+FILE_STAGES = ["load", "extraction", "grid_mapping", "render", "save"]
+
+
+def convert_timed(contents, timings):
+    """Converts one workbook, appending each stage's seconds to timings[stage]."""
+    result = convert(contents)
+    for stage in FILE_STAGES:
+        timings[stage].append(result.timings[stage])
+    return f"student_{len(timings['save'])}.docx", result.docx_bytes
+
+
+def zip_documents(documents):
+    return sum(len(chunk) for chunk in stream_zip(documents))
+
+
+def summarize(seconds):
+    ordered = sorted(seconds)
+    p95_index = max(0, -(-len(ordered) * 95 // 100) - 1)  # nearest-rank
+    return {
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[p95_index] * 1000,
+        "total_ms": sum(ordered) * 1000,
+    }
+
+
+def run_batch(workbooks, trace_memory=True):
+    timings = {stage: [] for stage in FILE_STAGES}
+    start = time.perf_counter()
+    documents = [convert_timed(contents, timings) for contents in workbooks]
+    zip_start = time.perf_counter()
+    zip_bytes = zip_documents(documents)
+    end = time.perf_counter()
+
+    stages = {stage: summarize(timings[stage]) for stage in FILE_STAGES}
+    stages["zip"] = summarize([end - zip_start])
+    result = {
+        "batch_size": len(workbooks),
+        "wall_s": end - start,
+        "files_per_s": len(workbooks) / (end - start),
+        "input_bytes": sum(len(contents) for contents in workbooks),
+        "output_bytes": zip_bytes,
+        "stages": stages,
+    }
+    del documents
+
+    if trace_memory:
+        # Separate pass: tracing allocations slows everything down too much to time with it on
+        tracemalloc.start()
+        scratch = {stage: [] for stage in FILE_STAGES}
+        zip_documents(convert_timed(contents, scratch) for contents in workbooks)
+        result["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_batch(result, baseline=None):
+    print(f"batch {result['batch_size']:5d}: {result['wall_s']:8.2f} s  ({result['files_per_s']:7.1f} files/s)"
+          + (f", peak traced {result['peak_traced_bytes'] / 2**20:7.1f} MiB" if "peak_traced_bytes" in result else ""))
+    for stage, summary in result["stages"].items():
+        line = f"    {stage:13s} median {summary['median_ms']:9.3f} ms   p95 {summary['p95_ms']:9.3f} ms"
+        if baseline is not None and stage in baseline["stages"]:
+            before = baseline["stages"][stage]["median_ms"]
+            if before:
+                line += f"   ({summary['median_ms'] / before - 1:+7.1%} vs baseline)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="batch sizes to measure (default: 1 10 100 1000)")
+    parser.add_argument("--courses", type=int, nargs="+", default=[3, 6, 9],
+                        help="course counts the generated workbooks cycle through (default: 3 6 9)")
+    parser.add_argument("--junk-rows", type=int, default=4, help="footer rows below the courses (default: 4)")
+    parser.add_argument("--formatted-rows", type=int, default=0,
+                        help="styled empty rows at the end of each sheet (default: 0)")
+    parser.add_argument("--extra-columns", type=int, default=0, help="filled columns past J (default: 0)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory pass")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/stages-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare stage medians against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    workbooks = [
+        make_workbook(i, courses=args.courses[i % len(args.courses)], junk_rows=args.junk_rows,
+                      formatted_rows=args.formatted_rows, extra_columns=args.extra_columns)
+        for i in range(max(args.batches))
+    ]
+    baselines = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baselines = {batch["batch_size"]: batch for batch in json.load(baseline_file)["batches"]}
+
+    # One untimed conversion so imports and the skeleton build aren't charged to the first batch
+    run_batch(workbooks[:1], trace_memory=False)
+
+    results = {
+        "commit": commit,
+        "converter_version": CONVERTER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": {
+            "courses": args.courses, "junk_rows": args.junk_rows,
+            "formatted_rows": args.formatted_rows, "extra_columns": args.extra_columns,
+        },
+        "batches": [],
+    }
+    for batch_size in args.batches:
+        result = run_batch(workbooks[:batch_size], trace_memory=not args.no_memory)
+        print_batch(result, baselines.get(batch_size))
+        results["batches"].append(result)
+
+    output = args.output or os.path.join("benchmarks", "results", f"stages-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
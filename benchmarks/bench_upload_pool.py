@@ -0,0 +1,45 @@
+"""Benchmark: batch conversion wall time, serial loop vs the worker pool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_upload_pool [--files N] [--workers 1 2 4 ...]
+"""
+import argparse
+import os
+import time
+
+from benchmarks.workbooks import make_workbook
+from workers import ConversionPool, convert_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200, help="files per batch (default: 200)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help="pool sizes to measure (default: 1 2 4 and the CPU count)")
+    args = parser.parse_args()
+
+    files = [(f"student_{i}.xlsx", make_workbook(i)) for i in range(args.files)]
+
+    start = time.perf_counter()
+    for _, contents in files:
+        convert_file(contents)
+    serial = time.perf_counter() - start
+    print(f"{args.files} files, {os.cpu_count()} CPUs")
+    print(f"serial loop:        {serial:7.2f} s  ({args.files / serial:6.1f} files/s)")
+
+    for workers in args.workers:
+        pool = ConversionPool(workers)
+        pool.start()  # warm-up is not part of the batch time
+        start = time.perf_counter()
+        results = pool.convert_many(files)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        failed = sum(1 for result in results if result.error)
+        print(f"pool, {workers:2d} workers:   {elapsed:7.2f} s  ({args.files / elapsed:6.1f} files/s, "
+              f"{serial / elapsed:4.1f}x serial, {failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Synthetic registrar workbooks in the layout converter expects."""
+import csv
+from io import BytesIO, StringIO
+
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+
+COURSE_HEADER = ["CRN", "Course", "Title", "Instructor(s)", "Credits", "Campus", "Status", "Date", "Days", "Time"]
+HEADER_ROW_INDEX = 9  # 0-indexed; course rows (and the schedule grid rows 10-16) follow it
+
+SAMPLE_MEETINGS = [
+    ("MW", "8:25-9:20 am"), ("TR", "10:05-11:00 am"), ("F", "12:15-1:10 pm"),
+    ("M", "1:20 -2:15 pm"), ("T", "9:00-9:55"), ("W", "4:35-6:00 pm"), ("R", "2:25-3:20 pm"),
+]
+
+# Footer lines registrar exports leave below the course rows; none has a Course
+# value, so the converter drops them
+JUNK_ROWS = ["Total Credits:", "Report generated by Student Records", "Page 1 of 1", "*** End of report ***"]
+
+# Fill used for formatted-but-empty cells
+JUNK_FILL = PatternFill("solid", fgColor="DDEBF7")
+
+
+def write_student(sheet, index, courses=6, junk_rows=0, extra_columns=0, first_row=1):
+    """Writes one student's block into sheet starting at first_row; returns the row after its last row."""
+    sheet.cell(first_row, 1, f"Information for student: Student {index} Example (U{10000000 + index})")
+    sheet.cell(first_row + 2, 1, "Major and Department:")
+    sheet.cell(first_row + 2, 2, "Biology, Science")
+    header_row = first_row + HEADER_ROW_INDEX
+    header = COURSE_HEADER + [f"Extra {c_idx + 1}" for c_idx in range(extra_columns)]
+    for c_idx, value in enumerate(header):
+        sheet.cell(header_row, c_idx + 1, value)
+    for i in range(courses):
+        row = header_row + 1 + i
+        days, times = SAMPLE_MEETINGS[i % len(SAMPLE_MEETINGS)]
+        sheet.cell(row, 1, 10000 + i)
+        sheet.cell(row, 2, f"BIO {100 + i}")
+        sheet.cell(row, 3, "Course Title")
+        sheet.cell(row, 4, f"Instructor {i}")
+        sheet.cell(row, 5, 4 if i % 3 == 0 else 3)
+        sheet.cell(row, 9, days)
+        sheet.cell(row, 10, times)
+        for c_idx in range(extra_columns):
+            sheet.cell(row, len(COURSE_HEADER) + c_idx + 1, f"x{i}.{c_idx}")
+    row = header_row + 1 + courses
+    for i in range(junk_rows):
+        sheet.cell(row + 1 + i, 1, JUNK_ROWS[i % len(JUNK_ROWS)])
+    return row + 1 + junk_rows
+
+
+def save_workbook(workbook):
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def make_workbook(index=0, courses=6, junk_rows=0, formatted_rows=0, extra_columns=0):
+    """Returns the xlsx bytes of one student's schedule export.
+
+    ``junk_rows`` footer lines are written below the course rows and
+    ``formatted_rows`` rows of styled but empty cells after those, which is how
+    exports end up with sheet dimensions far past their data.
+    ``extra_columns`` adds filled columns to the right of the schedule columns.
+    """
+    workbook = Workbook()
+    sheet = workbook.active
+    row = write_student(sheet, index, courses, junk_rows, extra_columns)
+    for r_idx in range(row, row + formatted_rows):
+        for c_idx in range(1, len(COURSE_HEADER) + extra_columns + 1):
+            sheet.cell(r_idx, c_idx).fill = JUNK_FILL
+    return save_workbook(workbook)
+
+
+def make_delimited(index=0, courses=6, junk_rows=0, delimiter=","):
+    """Returns the same export as make_workbook, saved as CSV (or TSV with ``delimiter="\\t"``) bytes."""
+    workbook = Workbook()
+    sheet = workbook.active
+    write_student(sheet, index, courses, junk_rows)
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\r\n")
+    for row in sheet.iter_rows(values_only=True):
+        writer.writerow(["" if value is None else value for value in row])
+    return buffer.getvalue().encode("utf-8")
+
+
+def make_cohort_workbook(students=50, stacked=True, courses=6, junk_rows=0):
+    """Returns the xlsx bytes of a cohort export: students stacked down one sheet, or one sheet each."""
+    workbook = Workbook()
+    sheet = workbook.active
+    row = 1
+    for index in range(students):
+        if stacked:
+            # Each block must cover the schedule rows, so short blocks are padded to that height
+            row = max(write_student(sheet, index, courses, junk_rows, first_row=row), row + 17) + 1
+        else:
+            if index:
+                sheet = workbook.create_sheet()
+            sheet.title = f"Student {index}"
+            write_student(sheet, index, courses, junk_rows)
+    return save_workbook(workbook)
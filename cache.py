@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from converter import conversion_version
+from workbook import DELIMITED_EXTENSIONS
+
+
+# Byte budgets for the two cache tiers. The disk tier is only used when
+# CONVERSION_CACHE_DIR is set; a budget of 0 disables that tier.
+CACHE_MEMORY_BYTES = int(os.environ.get("CONVERSION_CACHE_MEMORY_BYTES", 64 * 1024 * 1024))
+CACHE_DISK_BYTES = int(os.environ.get("CONVERSION_CACHE_DISK_BYTES", 1024 * 1024 * 1024))
+CACHE_DIR = os.environ.get("CONVERSION_CACHE_DIR") or None
+
+CACHE_FILE_SUFFIX = ".docx-cache"
+
+
+def cache_key(xlsx_bytes, version=None, filename=None):
+    """Content address of an upload: SHA-256 over the conversion version and the workbook bytes.
+
+    The version defaults to converter.conversion_version(), which covers the
+    loaded layout profiles.
+
+    A .csv/.tsv file name picks the delimiter text files are parsed with, so
+    it is part of the key too.
+    """
+    digest = hashlib.sha256((version or conversion_version()).encode())
+    digest.update(b"\0")
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in DELIMITED_EXTENSIONS:
+        digest.update(DELIMITED_EXTENSIONS[extension].encode())
+        digest.update(b"\0")
+    digest.update(xlsx_bytes)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """Two-tier LRU cache of converted documents keyed by cache_key.
+
+    Entries are (filename, docx_bytes, warnings). The memory tier is an OrderedDict in
+    recency order; the optional disk tier keeps one file per key in
+    ``disk_dir`` (written atomically, so several processes can share it) with
+    an in-process recency index. Each tier evicts least recently used entries
+    once its byte budget is exceeded. Disk hits are promoted to memory.
+    """
+
+    def __init__(self, memory_bytes=CACHE_MEMORY_BYTES, disk_dir=CACHE_DIR, disk_bytes=CACHE_DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir if disk_dir and disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key):
+        """Returns the cached (filename, docx_bytes, warnings) for key, or None."""
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if self.disk_dir and key in self._disk:
+                entry = self._read_disk(key)
+                if entry is not None:
+                    self._disk.move_to_end(key)
+                    self._store_memory(key, entry)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, filename, docx_bytes, warnings=()):
+        entry = (filename, docx_bytes, list(warnings))
+        with self._lock:
+            self._store_memory(key, entry)
+            if self.disk_dir and key not in self._disk:
+                self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+    ## --- Memory tier ---
+    @staticmethod
+    def _header(entry):
+        return json.dumps({"filename": entry[0], "warnings": entry[2]}).encode()
+
+    def _store_memory(self, key, entry):
+        # Memory values are (entry, size in bytes)
+        size = len(entry[0].encode()) + len(entry[1])
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= self._memory.pop(key)[1]
+        self._memory[key] = (entry, size)
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_size -= evicted_size
+            self.memory_evictions += 1
+
+    ## --- Disk tier ---
+    # Each file holds a one-line JSON header (filename, warnings), a newline, then the DOCX bytes.
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + CACHE_FILE_SUFFIX)
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(CACHE_FILE_SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(CACHE_FILE_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                header, _, docx_bytes = cache_file.read().partition(b"\n")
+            os.utime(path)  # keep recency across restarts
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            self._disk_size -= self._disk.pop(key, 0)
+            return None
+        header = json.loads(header)
+        return header["filename"], docx_bytes, header["warnings"]
+
+    def _write_disk(self, key, entry):
+        payload = self._header(entry) + b"\n" + entry[1]
+        if len(payload) > self.disk_bytes:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as cache_file:
+                cache_file.write(payload)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        self._disk[key] = len(payload)
+        self._disk_size += len(payload)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.disk_evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide ConversionCache configured from the environment."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ConversionCache()
+        return _default_cache
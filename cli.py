@@ -0,0 +1,293 @@
+"""Converts workbook exports to DOCX schedules in bulk, without the web server.
+
+Inputs can be files, directories (searched for *.xlsx, *.csv and *.tsv), glob patterns or a
+manifest listing one path per line. Documents are written to an output
+directory, a zip archive, or both, and a CSV report records the outcome and
+warnings for every input. With an output directory, inputs that haven't
+changed since their document was written are skipped. --occupancy saves the
+converted students' schedule grids as a cohort occupancy tensor (.npz).
+
+    python cli.py exports/ --output-dir schedules/ --zip schedules.zip --workers 16
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from itertools import groupby
+from zipfile import ZipFile
+
+import numpy as np
+
+from converter import STANDARD_DAYS, STANDARD_TIMES, cohort_occupancy, conversion_version, section_occupancy, unique_filename
+from workers import CONVERSION_WORKERS, ConversionPool
+
+
+INPUT_EXTENSIONS = (".xlsx", ".csv", ".tsv")
+# Record of what each output directory was built from, used to skip up-to-date inputs
+STATE_FILE_NAME = ".generatedoc-state.json"
+REPORT_FIELDS = ["source", "student", "status", "output", "warning_count", "warnings", "error"]
+# Minimum seconds between progress line updates
+PROGRESS_INTERVAL = 0.2
+
+
+def collect_inputs(patterns, manifest=None):
+    """Expands files, directories, glob patterns and manifest entries into a de-duplicated list of paths."""
+    patterns = list(patterns)
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as manifest_file:
+            for line in manifest_file:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(os.path.join(base_dir, line))
+
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(pattern)
+                for name in names
+                if name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith("~$")  # skip Excel lock files
+            )
+        elif os.path.exists(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                print(f"warning: no inputs match {pattern!r}", file=sys.stderr)
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def load_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE_NAME)
+    try:
+        with open(path) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+    # Documents from another converter version (or other layout profiles) are out of date
+    if state.get("converter_version") != conversion_version():
+        return {}
+    return state.get("files", {})
+
+
+def save_state(output_dir, files):
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as state_file:
+        json.dump({"converter_version": conversion_version(), "files": files}, state_file)
+    os.replace(temp_path, os.path.join(output_dir, STATE_FILE_NAME))
+
+
+def input_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_up_to_date(path, entry, output_dir, cohort):
+    if entry is None or "documents" not in entry or entry.get("cohort", False) != cohort:
+        return False
+    try:
+        signature = input_signature(path)
+    except OSError:
+        return False
+    return (entry["size"] == signature["size"] and entry["mtime_ns"] == signature["mtime_ns"]
+            and all(os.path.exists(os.path.join(output_dir, document["output"])) for document in entry["documents"]))
+
+
+class Progress:
+    """Single status line on stderr: counts so far and throughput."""
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.counts = {"converted": 0, "skipped": 0, "failed": 0}
+        self.start = time.perf_counter()
+        self._last_update = 0.0
+
+    def update(self, status):
+        self.counts[status] += 1
+        now = time.perf_counter()
+        if self.interactive and now - self._last_update >= PROGRESS_INTERVAL:
+            self._last_update = now
+            self.stream.write("\r" + self.line())
+            self.stream.flush()
+
+    def line(self):
+        done = sum(self.counts.values())
+        elapsed = time.perf_counter() - self.start
+        rate = self.counts["converted"] / elapsed if elapsed else 0.0
+        return (f"[{done}/{self.total}] converted {self.counts['converted']}, skipped {self.counts['skipped']}, "
+                f"failed {self.counts['failed']}  {rate:.1f} files/s")
+
+    def finish(self):
+        self.stream.write(("\r" if self.interactive else "") + self.line() + "\n")
+        self.stream.flush()
+
+
+def run(args):
+    sources = collect_inputs(args.inputs, args.manifest)
+    if not sources:
+        print("error: no input workbooks found", file=sys.stderr)
+        return 2
+
+    state = {}
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        if not args.force:
+            state = load_state(args.output_dir)
+    up_to_date = {
+        source for source in sources
+        if args.output_dir and is_up_to_date(source, state.get(source), args.output_dir, args.cohort)
+    }
+    to_convert = [source for source in sources if source not in up_to_date]
+    # Taken before converting, so an input edited during the run is picked up by the next one
+    signatures = {}
+    for source in to_convert:
+        try:
+            signatures[source] = input_signature(source)
+        except OSError:
+            pass  # Reported as failed when the worker can't read it
+
+    # Names already held by skipped inputs' documents can't be reused by new ones
+    used_names = {document["output"] for source in up_to_date for document in state[source]["documents"]}
+    report_path = args.report or (
+        os.path.join(args.output_dir, "conversion_report.csv") if args.output_dir
+        else os.path.splitext(args.zip)[0] + "_report.csv"
+    )
+
+    pool = ConversionPool(args.workers)
+    progress = Progress(len(sources))
+    # One group of FileResults per input (several per cohort workbook)
+    results = groupby(pool.iter_convert_paths(to_convert, cohort=args.cohort), key=lambda result: result.source)
+    zip_archive = ZipFile(args.zip, "w") if args.zip else None
+    new_state = {}
+    grids = []  # (label, ScheduleGrid) of converted students, for --occupancy
+    try:
+        with open(report_path, "w", newline="") as report_file:
+            report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            report.writeheader()
+            for source in sources:
+                if source in up_to_date:
+                    entry = new_state[source] = state[source]
+                    for document in entry["documents"]:
+                        if zip_archive is not None:
+                            zip_archive.write(os.path.join(args.output_dir, document["output"]), document["output"])
+                        report.writerow(report_row(source, document["student"], "skipped",
+                                                   document["output"], document["warnings"]))
+                    progress.update("skipped")
+                    continue
+
+                _, file_results = next(results)
+                documents = []
+                for result in file_results:
+                    if result.error:
+                        report.writerow(report_row(source, result.student, "failed", error=result.error))
+                        continue
+                    output = unique_filename(result.filename, used_names)
+                    if args.output_dir:
+                        with open(os.path.join(args.output_dir, output), "wb") as output_file:
+                            output_file.write(result.data)
+                    if zip_archive is not None:
+                        zip_archive.writestr(output, result.data)
+                    warnings = [warning["message"] for warning in result.warnings]
+                    documents.append({"output": output, "student": result.student, "warnings": warnings})
+                    if result.grid is not None:
+                        grids.append((result.label, result.grid))
+                    report.writerow(report_row(source, result.student, "converted", output, warnings))
+
+                if documents:
+                    if source in signatures:
+                        new_state[source] = {**signatures[source], "cohort": args.cohort, "documents": documents}
+                    progress.update("converted")
+                else:
+                    progress.update("failed")
+    finally:
+        if zip_archive is not None:
+            zip_archive.close()
+        pool.shutdown()
+        if args.output_dir:
+            # Keep entries for inputs not part of this run so later runs can still skip them
+            kept = {
+                source: entry for source, entry in state.items()
+                if not any(document["output"] in used_names for document in entry.get("documents", []))
+            }
+            save_state(args.output_dir, {**kept, **new_state})
+    progress.finish()
+    print(f"report written to {report_path}", file=sys.stderr)
+    if args.occupancy:
+        save_occupancy(args.occupancy, grids)
+        print(f"occupancy of {len(grids)} students written to {args.occupancy}", file=sys.stderr)
+    return 1 if progress.counts["failed"] else 0
+
+
+def save_occupancy(path, grids):
+    """Saves (label, ScheduleGrid) pairs as arrays: per-student busy cells, students per cell and per-section load."""
+    labels = [label for label, _ in grids]
+    occupancy = cohort_occupancy([grid for _, grid in grids])
+    sections, section_load = section_occupancy([grid for _, grid in grids])
+    np.savez_compressed(
+        path,
+        students=np.array(labels, dtype=str),
+        times=np.array(STANDARD_TIMES),
+        days=np.array(STANDARD_DAYS),
+        occupancy=occupancy,                  # (students, times, days) bool
+        load=occupancy.sum(axis=0),           # (times, days) students in class
+        sections=np.array(sections, dtype=str),
+        section_load=section_load,            # (sections, times, days) students per section
+    )
+
+
+def report_row(source, student, status, output="", warnings=(), error=""):
+    return {
+        "source": source,
+        "student": student or "",
+        "status": status,
+        "output": output,
+        "warning_count": len(warnings),
+        "warnings": " | ".join(warnings),
+        "error": error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*", help="workbook files, directories or glob patterns")
+    parser.add_argument("--manifest", help="file listing input paths, one per line (relative to the manifest)")
+    parser.add_argument("--output-dir", help="directory to write the documents to")
+    parser.add_argument("--zip", help="zip archive to write the documents to")
+    parser.add_argument("--workers", type=int, default=CONVERSION_WORKERS,
+                        help=f"worker processes (default: {CONVERSION_WORKERS})")
+    parser.add_argument("--report", help="CSV report path (default: in the output directory, or next to the zip)")
+    parser.add_argument("--force", action="store_true", help="convert every input, even if it is up to date")
+    parser.add_argument("--cohort", action="store_true",
+                        help="inputs hold several students (a sheet each, or stacked blocks); write one document per student")
+    parser.add_argument("--occupancy", metavar="FILE.npz",
+                        help="save the converted students' schedule occupancy tensor (skipped inputs aren't included; use --force)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log per-file warnings as they happen")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("no inputs given")
+    if not args.output_dir and not args.zip:
+        parser.error("at least one of --output-dir and --zip is required")
+
+    # Per-file warnings go to the report and are logged at INFO; show them as they happen only when asked for
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
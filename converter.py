@@ -1,816 +1,1898 @@
-def converter(file_contents):
-    # %%
-    import pandas as pd
-    from docx import Document
-    from docx.shared import Inches
-    from docx.enum.table import WD_TABLE_ALIGNMENT
-    from docx.enum.table import WD_ALIGN_VERTICAL
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.shared import Pt
-    from docx.shared import RGBColor # Import RGBColor for shading
-    from docx.oxml import OxmlElement # Import OxmlElement for shading
-    from docx.oxml.ns import qn # Import qn for shading
-    from docx.shared import Cm # Import Cm for setting height
-
-    from datetime import datetime
-    import re
-    import numpy as np # Import numpy for isnan
-
-    ## --- Configuration ---
-
-    # Input and Output Files
-    EXCEL_FILENAME = "Sample sched.xlsx" # Define EXCEL_FILENAME here
-    OUTPUT_FILENAME = "generated_schedule.docx"
-
-    # Excel Column Indices (0-indexed)
-    # Adjust these based on your specific Excel file layout
-    STUDENT_INFO_COL_INDEX = 0     # Column containing "Information for student:" and "Major and Department:"
-    MAJOR_VALUE_COL_INDEX = 1      # Column containing the Major value (next to "Major and Department:")
-    COURSE_CRN_COL_INDEX = None    # Column containing Course CRN (will be found dynamically)
-    COURSE_CODE_COL_INDEX = None   # Column containing Course Code (will be found dynamically)
-    COURSE_INSTRUCTOR_COL_INDEX = None # Column containing Instructor(s) (will be found dynamically)
-    COURSE_CREDITS_COL_INDEX = None  # Column containing Credits (will be found dynamically)
-    SCHEDULE_DAYS_COL_INDEX = 8    # Column containing the days abbreviation (e.g., I is index 8)
-    SCHEDULE_TIME_COL_INDEX = 9    # Column containing the time range (e.g., J is index 9)
-    SCHEDULE_COURSE_COL_INDEX = 1 # Column containing the course entry for the schedule grid (e.g., B is index 1)
-
-
-    # Row Ranges (0-indexed)
-    # Adjust these based on your specific Excel file layout
-    STUDENT_INFO_SEARCH_ROWS = range(0, 5)      # Rows to search for "Information for student:"
-    MAJOR_SEARCH_ROWS = range(0, 15)           # Rows to search for "Major and Department:"
-    COURSE_HEADER_SEARCH_ROWS = range(0, 20)   # Rows to search for the course table headers (CRN, Course, etc.)
-    SCHEDULE_DATA_ROWS = range(10, 17)        # Rows containing the actual weekly schedule data grid
-
-    # Placeholder Information (if not extracted from Excel)
-    PLACEHOLDER_ADVISOR = "ENTER ADVISOR HERE"
-    PLACEHOLDER_COMMENTS = "ENTER COMMENTS HERE"
-    PLACEHOLDER_ORIENTATION = "ENTER ORIENTATION HERE"
-
-    # Mapping for Schedule Days Abbreviations
-    DAY_MAPPING = {
-        "M": ["Mon"],
-        "T": ["Tue"],
-        "W": ["Wed"],
-        "R": ["Thu"],
-        "F": ["Fri"],
-        "MW": ["Mon", "Wed"],
-        "TR": ["Tue", "Thu"],
-    }
+from bisect import bisect_left, bisect_right
+from copy import deepcopy
+from datetime import time
+from difflib import SequenceMatcher
+from functools import lru_cache
+from io import BytesIO
+from time import localtime, perf_counter
+from typing import NamedTuple
+from zipfile import ZipFile
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+from docx import Document
+from docx.shared import Inches
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.table import WD_ALIGN_VERTICAL
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement # Import OxmlElement for shading
+from docx.oxml.ns import qn # Import qn for shading
+from docx.oxml.parser import parse_xml
+from docx.shared import Cm # Import Cm for setting height
+
+from workbook import SHEET_TRUNCATED, WorkbookTooLarge, load_sheet, load_sheets, write_workbook
+
+
+# Diagnostics go through this logger. Debug output (row-by-row tracing) is only
+# formatted when DEBUG is enabled for "converter"; per-file warnings are also
+# collected into the record's "warnings" list and returned with the result.
+logger = logging.getLogger(__name__)
+
+## --- Configuration ---
+
+# Version of the extraction and document layout. Bump it whenever the generated
+# document can change for the same input, so cached conversions are not reused.
+CONVERTER_VERSION = "4"
+
+# Excel Column Indices (0-indexed)
+# These and the row ranges, labels and day mapping below describe the default
+# layout profile; exports laid out differently are described by extra profiles
+# (see "Layout Profiles") rather than by editing these values
+STUDENT_INFO_COL_INDEX = 0     # Column containing "Information for student:" and "Major and Department:"
+MAJOR_VALUE_COL_INDEX = 1      # Column containing the Major value (next to "Major and Department:")
+SCHEDULE_DAYS_COL_INDEX = 8    # Column containing the days abbreviation (e.g., I is index 8)
+SCHEDULE_TIME_COL_INDEX = 9    # Column containing the time range (e.g., J is index 9)
+SCHEDULE_COURSE_COL_INDEX = 1 # Column containing the course entry for the schedule grid (e.g., B is index 1)
+
+
+# Row Ranges (0-indexed)
+# Adjust these based on your specific Excel file layout
+STUDENT_INFO_SEARCH_ROWS = range(0, 5)      # Rows to search for "Information for student:"
+MAJOR_SEARCH_ROWS = range(0, 15)           # Rows to search for "Major and Department:"
+COURSE_HEADER_SEARCH_ROWS = range(0, 20)   # Rows to search for the course table headers (CRN, Course, etc.)
+SCHEDULE_DATA_ROWS = range(10, 17)        # Rows containing the actual weekly schedule data grid
+
+# Label that starts each student's block (also where cohort sheets are split)
+STUDENT_INFO_ANCHOR = "Information for student:"
+# Label in the student info column whose neighbour holds the major
+MAJOR_LABEL = "Major and Department:"
+# Headers of the course table's CRN, Course, Instructor(s) and Credits columns;
+# a row holding all four is the course table header
+COURSE_HEADER_KEYWORDS = ['CRN', 'Course', 'Instructor(s)', 'Credits']
+
+# Placeholder Information (if not extracted from Excel)
+PLACEHOLDER_ADVISOR = "ENTER ADVISOR HERE"
+PLACEHOLDER_COMMENTS = "ENTER COMMENTS HERE"
+PLACEHOLDER_ORIENTATION = "ENTER ORIENTATION HERE"
+
+# Mapping for Schedule Days Abbreviations
+DAY_MAPPING = {
+    "M": ["Mon"],
+    "T": ["Tue"],
+    "W": ["Wed"],
+    "R": ["Thu"],
+    "F": ["Fri"],
+    "MW": ["Mon", "Wed"],
+    "TR": ["Tue", "Thu"],
+}
+
+# Standard Times for the Output Schedule Grid (Table Rows)
+# These define the fixed rows in your output Word document schedule table
+STANDARD_TIMES = [
+    "7:55-8:15 am", "8:25-8:50 am", "9:00-9:20 am", "9:30-9:55 am",
+    "10:05-10:25 am", "10:35-11:00 am", "11:10-11:30 am", "11:40-12:05 am",
+    "12:15-12:35 pm", "12:45-1:10 pm", "1:20-1:40 pm", "1:50-2:15 pm",
+    "2:25-2:45 pm", "2:55-3:20 pm", "3:30-3:50 pm", "4:00-4:25 pm",
+    "4:35-6:00 pm", "6:10 – 7:35 pm", "7:45 – 8:10 pm"
+]
+
+# Standard Days for the Output Schedule Grid (Table Columns)
+# These define the fixed columns in your output Word document schedule table
+STANDARD_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+# Schedule cells that always read "COMMON HOUR" (time slot, day); courses mapped there are hidden
+COMMON_HOUR_TIMES = ["12:15-12:35 pm", "12:45-1:10 pm"]
+COMMON_HOUR_DAYS = ["Mon", "Wed", "Fri"]
+
+# Regex pattern to find time ranges in the schedule data column
+TIME_PATTERN = re.compile(r"\d{1,2}:\d{2}.*?-\s*\d{1,2}:\d{2}\s*(?:am|pm)?", re.IGNORECASE)
+
+# Matches the time strings parse_time accepts: "H:MM", "HH:MM", optionally followed by am/pm
+TIME_STRING_PATTERN = re.compile(r"(\d{1,2}):(\d{1,2})\s*(am|pm)?", re.IGNORECASE)
+
+# Bound for the parse_time cache; registrar exports repeat a few dozen time strings
+PARSE_TIME_CACHE_SIZE = 1024
+
+# Schedule grid occupancy cells are bitmasks over a student's schedule entries
+# (one bit per schedule row), so at most this many entries fit in one grid
+GRID_MASK_BITS = 64
+
+# JSON file, or directory of *.json files, with extra layout profiles; unset uses only the default
+LAYOUT_PROFILES_PATH = os.environ.get("LAYOUT_PROFILES_PATH") or None
+# Bound for the fingerprint -> profile cache; a batch holds a handful of distinct layouts
+LAYOUT_CACHE_SIZE = 256
+
+## --- Helper Functions ---
+@lru_cache(maxsize=PARSE_TIME_CACHE_SIZE)
+def parse_time(time_str):
+    """Parses a time string into a datetime.time object.
+
+    Accepts the same inputs as the strptime chain this replaced
+    ('%I:%M %p', '%I:%M%p', '%H:%M %p', '%H:%M%p', '%H:%M'): a 12-hour time
+    with am/pm, a 24-hour time with a (then ignored) am/pm suffix, or a
+    24-hour time without one. Results are cached by the raw string, so
+    callers must not pass unhashable values.
+    """
+    if not isinstance(time_str, str):
+        return None
+    time_str = time_str.strip()
+    if not time_str:
+        return None
+
+    match = TIME_STRING_PATTERN.fullmatch(time_str)
+    if match:
+        hour_str, minute_str, meridiem = match.groups()
+        hour = int(hour_str)
+        minute = int(minute_str)
+        # Two-digit minutes must be 00-59; a single digit is always accepted
+        if minute < 60:
+            if meridiem and hour_str not in ("0", "00") and 1 <= hour <= 12:
+                # 12-hour clock: 12 am is midnight, 12 pm is noon
+                hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+                return time(hour, minute)
+            if hour < 24:
+                # 24-hour clock; an am/pm suffix is ignored like '%H:%M %p' did
+                return time(hour, minute)
+
+    # If all fail, return None; callers record a warning with the row context
+    logger.debug("Could not parse time string %r with expected formats.", time_str)
+    return None
+
+
+## --- Standard Time Slot Index ---
+class SlotIndex(NamedTuple):
+    """Standard time slots compiled into minutes-since-midnight intervals.
+
+    ``starts``/``ends``/``labels`` hold the regular slots sorted by start with
+    non-decreasing ends, so the slots covered by a range are one contiguous
+    bisect window. Slots that break that ordering (e.g. "11:40-12:05 am", whose
+    end parses to 00:05) are kept in ``irregular`` and checked directly, and
+    slots without a "-" separator are matched literally through ``literals``.
+    """
+    starts: list
+    ends: list
+    labels: list
+    irregular: list
+    literals: dict
+
+
+def to_minutes(time_obj):
+    """Converts a datetime.time object into minutes since midnight."""
+    return time_obj.hour * 60 + time_obj.minute
+
+
+def parse_standard_slot(std_time_range):
+    """Parses a standard time slot like "12:45-1:10 pm" into (start, end) time objects.
+
+    The slot's am/pm suffix is applied to whichever endpoint lacks one.
+    Returns None if the slot has no "-" separator or an endpoint fails to parse.
+    """
+    std_parts = std_time_range.split('-')
+    if len(std_parts) != 2:
+        return None
+    std_start_str_raw = std_parts[0].strip()
+    std_end_str_raw = std_parts[1].strip()
+
+    # Determine if the standard range is AM or PM based on the full string or end part
+    is_pm_range = 'pm' in std_time_range.lower() or ('pm' in std_end_str_raw.lower() and 'am' not in std_start_str_raw.lower())
+    is_am_range = 'am' in std_time_range.lower() or ('am' in std_end_str_raw.lower() and 'pm' not in std_start_str_raw.lower())
+
+    def parse_endpoint(raw):
+        # Force AM/PM if not present in the raw string part, based on the range
+        if 'am' in raw.lower() or 'pm' in raw.lower():
+            return parse_time(raw)
+        elif is_am_range:
+            return parse_time(raw + " am")
+        elif is_pm_range:
+            # This covers 12:xx pm and 1:xx pm etc.
+            return parse_time(raw + " pm")
+        # No AM/PM info in string or range, try parsing as is (might default to AM)
+        return parse_time(raw)
+
+    std_start_obj = parse_endpoint(std_start_str_raw)
+    std_end_obj = parse_endpoint(std_end_str_raw)
+    if std_start_obj is None or std_end_obj is None:
+        return None
+    return std_start_obj, std_end_obj
+
+
+def parse_time_range(start_str, end_str):
+    """Parses a course meeting's start and end strings into time objects (None where unparseable).
+
+    A start without am/pm takes the end's, like parse_standard_slot does for
+    the standard slots, so "1:20 -2:15 pm" starts at 1:20 pm rather than
+    1:20 am. If that would put the start after the end ("11:10-12:05 pm"),
+    the start takes the other meridian.
+    """
+    start = parse_time(start_str)
+    end = parse_time(end_str)
+    if start is None or end is None:
+        return start, end
+    start_match = TIME_STRING_PATTERN.fullmatch(start_str.strip())
+    end_match = TIME_STRING_PATTERN.fullmatch(end_str.strip())
+    if start_match.group(3) is None and end_match.group(3):
+        end_meridian = end_match.group(3).lower()
+        for meridian in (end_meridian, "pm" if end_meridian == "am" else "am"):
+            candidate = parse_time(f"{start_str.strip()} {meridian}")
+            if candidate <= end:
+                return candidate, end
+    return start, end
+
+
+def compile_slot_index(standard_times):
+    """Compiles a list of standard time slot strings into a SlotIndex."""
+    parsed = []
+    literals = {}
+    for std_time_range in standard_times:
+        if len(std_time_range.split('-')) != 2:
+            # Non-standard time strings (like "Evening") only match the raw value exactly
+            literals[std_time_range.strip().lower()] = std_time_range
+            continue
+        slot = parse_standard_slot(std_time_range)
+        if slot is not None:
+            parsed.append((to_minutes(slot[0]), to_minutes(slot[1]), std_time_range))
+
+    parsed.sort(key=lambda slot: (slot[0], slot[1]))
+    starts, ends, labels, irregular = [], [], [], []
+    for start, end, label in parsed:
+        if ends and end < ends[-1]:
+            irregular.append((start, end, label))
+        else:
+            starts.append(start)
+            ends.append(end)
+            labels.append(label)
+    return SlotIndex(starts, ends, labels, irregular, literals)
+
+
+def covered_slots(slot_index, start_time_obj, end_time_obj, raw_time_range_value=""):
+    """Returns the standard time slots that fall entirely within [start, end]."""
+    start = to_minutes(start_time_obj)
+    end = to_minutes(end_time_obj)
+    # Regular slots: starts and ends are both sorted, so the covered slots are
+    # those at or after the first start >= `start` and before the first end > `end`
+    lo = bisect_left(slot_index.starts, start)
+    hi = bisect_right(slot_index.ends, end)
+    covered = slot_index.labels[lo:hi]
+    for std_start, std_end, label in slot_index.irregular:
+        if std_start >= start and std_end <= end:
+            covered.append(label)
+    literal = slot_index.literals.get(raw_time_range_value.strip().lower())
+    if literal is not None:
+        covered.append(literal)
+    return covered
+
+
+# Compiled once at import; shared by every conversion
+STANDARD_SLOT_INDEX = compile_slot_index(STANDARD_TIMES)
+
+
+def add_warning(warnings, code, message, **details):
+    """Records a structured per-file warning ({"code", "message", ...details}) and logs it at INFO.
+
+    The structured list is how warnings reach users; most real exports raise a
+    few, so they stay out of WARNING-level server logs.
+    """
+    warnings.append({"code": code, "message": message, **details})
+    logger.info(message)
+
+
+## --- Layout Profiles ---
+class LayoutProfile(NamedTuple):
+    """Where one export layout keeps each part of a student's sheet (0-indexed rows and columns).
+
+    Built from a declarative spec by compile_layout. ``course_headers`` are
+    the CRN, Course, Instructor(s) and Credits header texts, and
+    ``header_columns`` maps header texts to the columns they must sit in for a
+    sheet to match the profile (see match_layout). ``info_pattern`` parses
+    the name and UID out of the student info line.
+    """
+    name: str
+    student_info_col: int
+    major_value_col: int
+    schedule_days_col: int
+    schedule_time_col: int
+    schedule_course_col: int
+    student_info_rows: range
+    major_rows: range
+    course_header_rows: range
+    schedule_rows: range
+    student_info_anchor: str
+    major_label: str
+    course_headers: tuple
+    day_mapping: dict
+    header_columns: dict
+    info_pattern: re.Pattern
+
+
+# The default profile as a spec; other profiles only list the fields they change.
+# Row ranges are [start, stop) pairs.
+DEFAULT_LAYOUT_SPEC = {
+    "name": "default",
+    "student_info_col": STUDENT_INFO_COL_INDEX,
+    "major_value_col": MAJOR_VALUE_COL_INDEX,
+    "schedule_days_col": SCHEDULE_DAYS_COL_INDEX,
+    "schedule_time_col": SCHEDULE_TIME_COL_INDEX,
+    "schedule_course_col": SCHEDULE_COURSE_COL_INDEX,
+    "student_info_rows": [STUDENT_INFO_SEARCH_ROWS.start, STUDENT_INFO_SEARCH_ROWS.stop],
+    "major_rows": [MAJOR_SEARCH_ROWS.start, MAJOR_SEARCH_ROWS.stop],
+    "course_header_rows": [COURSE_HEADER_SEARCH_ROWS.start, COURSE_HEADER_SEARCH_ROWS.stop],
+    "schedule_rows": [SCHEDULE_DATA_ROWS.start, SCHEDULE_DATA_ROWS.stop],
+    "student_info_anchor": STUDENT_INFO_ANCHOR,
+    "major_label": MAJOR_LABEL,
+    "course_headers": COURSE_HEADER_KEYWORDS,
+    "day_mapping": DAY_MAPPING,
+    "header_columns": {},
+}
+LAYOUT_COLUMN_FIELDS = ["student_info_col", "major_value_col", "schedule_days_col", "schedule_time_col", "schedule_course_col"]
+LAYOUT_ROW_FIELDS = ["student_info_rows", "major_rows", "course_header_rows", "schedule_rows"]
+
+
+def compile_layout(spec):
+    """Validates a layout spec (a dict like DEFAULT_LAYOUT_SPEC, missing fields taken from it) into a LayoutProfile.
+
+    Raises ValueError naming the profile and field when the spec is invalid.
+    """
+    name = spec.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"Layout profile {spec!r} has no name.")
+    unknown = set(spec) - set(DEFAULT_LAYOUT_SPEC)
+    if unknown:
+        raise ValueError(f"Layout profile '{name}' has unknown fields: {', '.join(sorted(unknown))}.")
+    fields = {**DEFAULT_LAYOUT_SPEC, **spec}
+
+    def invalid(field, expected):
+        return ValueError(f"Layout profile '{name}': {field} must be {expected}, not {fields[field]!r}.")
+
+    for field in LAYOUT_COLUMN_FIELDS:
+        if not isinstance(fields[field], int) or fields[field] < 0:
+            raise invalid(field, "a column index (0 for column A)")
+    rows = {}
+    for field in LAYOUT_ROW_FIELDS:
+        bounds = fields[field]
+        if (not isinstance(bounds, (list, tuple)) or len(bounds) != 2
+                or not all(isinstance(bound, int) and bound >= 0 for bound in bounds) or bounds[0] >= bounds[1]):
+            raise invalid(field, "a [start, stop) pair of row indexes")
+        rows[field] = range(*bounds)
+    for field in ("student_info_anchor", "major_label"):
+        if not isinstance(fields[field], str) or not fields[field].strip():
+            raise invalid(field, "a non-empty label")
+    course_headers = fields["course_headers"]
+    if (not isinstance(course_headers, (list, tuple)) or len(course_headers) != 4
+            or not all(isinstance(header, str) and header for header in course_headers)):
+        raise invalid("course_headers", "the [CRN, Course, Instructor(s), Credits] header texts")
+    day_mapping = fields["day_mapping"]
+    if not isinstance(day_mapping, dict) or not all(
+        isinstance(days, list) and days and all(day in STANDARD_DAYS for day in days) for days in day_mapping.values()
+    ):
+        raise invalid("day_mapping", f"a mapping of day codes to lists of {STANDARD_DAYS}")
+    header_columns = fields["header_columns"]
+    if not isinstance(header_columns, dict) or not all(
+        isinstance(c_idx, int) and c_idx >= 0 for c_idx in header_columns.values()
+    ):
+        raise invalid("header_columns", "a mapping of header texts to column indexes")
+
+    return LayoutProfile(
+        name=name,
+        **{field: fields[field] for field in LAYOUT_COLUMN_FIELDS},
+        **rows,
+        student_info_anchor=fields["student_info_anchor"],
+        major_label=fields["major_label"],
+        course_headers=tuple(course_headers),
+        day_mapping={code: list(days) for code, days in day_mapping.items()},
+        header_columns=dict(header_columns),
+        info_pattern=re.compile(re.escape(fields["student_info_anchor"]) + r"\s*(.*?)\s+\((U\d+)\)"),
+    )
+
+
+DEFAULT_LAYOUT = compile_layout(DEFAULT_LAYOUT_SPEC)
+
+
+class LayoutRegistry(NamedTuple):
+    """The compiled layout profiles, in matching order (the default last).
+
+    ``header_keywords`` are the distinct course header sets of the profiles
+    and ``scan_rows`` how far down any profile looks for its anchors, which
+    is how much of each sheet sheet_text_rows converts. ``version`` is
+    CONVERTER_VERSION qualified by a digest of the extra profiles' specs (see
+    conversion_version).
+    """
+    profiles: list
+    header_keywords: list
+    scan_rows: int
+    version: str
+
+
+def read_layout_specs(path):
+    """Reads the layout specs from a JSON file (one spec or a list of them) or a directory of such files."""
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".json"))
+    else:
+        paths = [path]
+    specs = []
+    for spec_path in paths:
+        with open(spec_path, encoding="utf-8") as spec_file:
+            loaded = json.load(spec_file)
+        specs.extend(loaded if isinstance(loaded, list) else [loaded])
+    return specs
+
+
+def compile_layouts(specs):
+    """Compiles layout specs into a LayoutRegistry, adding the default profile.
+
+    Profiles that pin more header columns are tried first, so a specific
+    layout wins over a looser one with the same course headers; the default,
+    which pins none, is tried last.
+    """
+    profiles = [compile_layout(spec) for spec in specs]
+    names = [profile.name for profile in profiles]
+    duplicates = sorted({name for name in names if names.count(name) > 1} | ({DEFAULT_LAYOUT.name} & set(names)))
+    if duplicates:
+        raise ValueError(f"Layout profile names must be unique; repeated: {', '.join(duplicates)}.")
+    profiles.sort(key=lambda profile: -len(profile.header_columns))
+    profiles.append(DEFAULT_LAYOUT)
+    header_keywords = list(dict.fromkeys(frozenset(profile.course_headers) for profile in profiles))
+    scan_rows = max(max(profile.student_info_rows.stop, profile.major_rows.stop, profile.course_header_rows.stop)
+                    for profile in profiles)
+    version = CONVERTER_VERSION
+    if specs:
+        digest = hashlib.sha256(json.dumps(specs, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+        version = f"{CONVERTER_VERSION}+{digest[:16]}"
+    return LayoutRegistry(profiles, header_keywords, scan_rows, version)
+
+
+_layouts = None
+_layouts_lock = threading.Lock()
+
+
+def get_layouts():
+    """Returns the process-wide LayoutRegistry, compiling LAYOUT_PROFILES_PATH on first use.
+
+    warm_up triggers this, so a bad profile fails at startup rather than on an upload.
+    """
+    global _layouts
+    with _layouts_lock:
+        if _layouts is None:
+            _layouts = compile_layouts(read_layout_specs(LAYOUT_PROFILES_PATH) if LAYOUT_PROFILES_PATH else [])
+        return _layouts
+
+
+def sheet_text_rows(df_raw, stop=None):
+    """The first ``stop`` rows of a sheet (default: the registry's scan_rows) as stripped strings, "" for empty cells.
+
+    Layout detection and the anchor scan both read these, so the top of each
+    sheet is stringified once.
+    """
+    if stop is None:
+        stop = get_layouts().scan_rows
+    return [[str(val).strip() if pd.notna(val) else "" for val in row]
+            for row in df_raw.iloc[:stop].to_numpy(dtype=object).tolist()]
+
+
+def conversion_version():
+    """The version cached and stored documents are keyed by: CONVERTER_VERSION, plus a digest of any extra layout profiles.
+
+    Editing the profiles can change the documents for the same input, so
+    they must not be served from earlier conversions.
+    """
+    return get_layouts().version
+
+
+def layout_fingerprint(text_rows, layouts):
+    """Identifies a sheet's layout by its course header row: (row index, header cell texts), or None.
+
+    The header row is the first of ``text_rows`` (see sheet_text_rows) holding
+    every course header of some profile. Students exported the same way share
+    a fingerprint, whatever their courses.
+    """
+    for r_idx, texts in enumerate(text_rows):
+        present = set(texts)
+        if any(keywords <= present for keywords in layouts.header_keywords):
+            width = len(texts)
+            while width and not texts[width - 1]:
+                width -= 1
+            return r_idx, tuple(texts[:width])
+    return None
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def match_layout(fingerprint):
+    """Returns the first profile whose course header sits at the fingerprint's row with every pinned column in place.
+
+    Falls back to the default profile (which then reports what it couldn't
+    find). Cached by fingerprint, so a batch only matches each layout once.
+    """
+    layouts = get_layouts()
+    if fingerprint is not None:
+        header_row, texts = fingerprint
+        present = set(texts)
+        for profile in layouts.profiles:
+            if (header_row in profile.course_header_rows and set(profile.course_headers) <= present
+                    and all(c_idx < len(texts) and texts[c_idx] == text for text, c_idx in profile.header_columns.items())):
+                return profile
+    return DEFAULT_LAYOUT
+
+
+def detect_layout(df_raw, text_rows=None):
+    """Returns the LayoutProfile for a loaded sheet (whose sheet_text_rows may be passed in)."""
+    layouts = get_layouts()
+    if text_rows is None:
+        text_rows = sheet_text_rows(df_raw, layouts.scan_rows)
+    return match_layout(layout_fingerprint(text_rows, layouts))
+
+
+class SheetAnchors(NamedTuple):
+    """Where the labelled parts of a sheet were found (0-indexed; None if not found).
+
+    ``info_line`` is the student info line cell text and ``major`` the value
+    next to the major label. ``header_row`` is the course table
+    header and the ``*_col`` fields are the positions of its CRN, Course,
+    Instructor(s) and Credits headers.
+    """
+    info_row: int
+    info_line: str
+    major_row: int
+    major: str
+    header_row: int
+    crn_col: int
+    course_col: int
+    instructor_col: int
+    credits_col: int
+
+
+def scan_sheet_anchors(df_raw, warnings, layout=DEFAULT_LAYOUT, text_rows=None):
+    """Finds the student info line, major and course table header in one pass over the top rows.
+
+    Rows come from ``text_rows`` (the sheet_text_rows layout detection
+    already made) when they reach far enough, so no row is stringified twice.
+    Each row is checked for every anchor still missing; scanning stops as
+    soon as all of them are found.
+    """
+    scan_stop = min(len(df_raw), max(layout.student_info_rows.stop, layout.major_rows.stop, layout.course_header_rows.stop))
+    if text_rows is None or len(text_rows) < scan_stop:
+        text_rows = sheet_text_rows(df_raw, scan_stop)
+    has_info_col = layout.student_info_col < df_raw.shape[1]
+    has_major_col = layout.major_value_col < df_raw.shape[1]
+    crn_header, course_header, instructor_header, credits_header = layout.course_headers
+
+    info_row = info_line = major_row = None
+    major = ""
+    crn_course_row = None # First row with both the CRN and Course headers
+    crn_course_values = None
+    header_found = False # Whether any row has all of the course headers
+
+    for r_idx, row_values in enumerate(text_rows[:scan_stop]):
+
+        if has_info_col:
+            label = row_values[layout.student_info_col]
+            if info_row is None and r_idx in layout.student_info_rows and layout.student_info_anchor in label:
+                info_row = r_idx
+                info_line = label
+            if major_row is None and r_idx in layout.major_rows and label == layout.major_label:
+                major_row = r_idx
+                if has_major_col:
+                    major = row_values[layout.major_value_col]
+                else:
+                    add_warning(warnings, "major_value_out_of_bounds",
+                                f"Major value column index {layout.major_value_col+1} is out of bounds.",
+                                row=r_idx + 1, column=layout.major_value_col + 1)
+
+        if not header_found and r_idx in layout.course_header_rows:
+            if crn_course_row is None and crn_header in row_values and course_header in row_values:
+                crn_course_row = r_idx
+                crn_course_values = row_values
+            header_found = all(keyword in row_values for keyword in layout.course_headers)
+
+        if info_row is not None and major_row is not None and header_found:
+            break
+
+    # The course header row is the first one with the CRN and Course headers, provided some
+    # row in the search range carries the full set of header keywords
+    header_row = crn_col = course_col = instructor_col = credits_col = None
+    if header_found:
+        header_row = crn_course_row
+        positions = {}
+        for c_idx, value in enumerate(crn_course_values):
+            positions.setdefault(value, c_idx)
+        crn_col = positions[crn_header]
+        course_col = positions[course_header]
+        instructor_col = positions.get(instructor_header)
+        credits_col = positions.get(credits_header)
+    else:
+        add_warning(warnings, "course_header_not_found",
+                    f"Could not find a row containing all keywords {list(layout.course_headers)} in rows {layout.course_header_rows.start+1}-{layout.course_header_rows.stop+1}.",
+                    keywords=list(layout.course_headers))
 
-    # Standard Times for the Output Schedule Grid (Table Rows)
-    # These define the fixed rows in your output Word document schedule table
-    STANDARD_TIMES = [
-        "7:55-8:15 am", "8:25-8:50 am", "9:00-9:20 am", "9:30-9:55 am",
-        "10:05-10:25 am", "10:35-11:00 am", "11:10-11:30 am", "11:40-12:05 am",
-        "12:15-12:35 pm", "12:45-1:10 pm", "1:20-1:40 pm", "1:50-2:15 pm",
-        "2:25-2:45 pm", "2:55-3:20 pm", "3:30-3:50 pm", "4:00-4:25 pm",
-        "4:35-6:00 pm", "6:10 – 7:35 pm", "7:45 – 8:10 pm"
-    ]
-
-    # Standard Days for the Output Schedule Grid (Table Columns)
-    # These define the fixed columns in your output Word document schedule table
-    STANDARD_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-
-    # Regex pattern to find time ranges in the schedule data column
-    TIME_PATTERN = re.compile(r"\d{1,2}:\d{2}.*?-\s*\d{1,2}:\d{2}\s*(?:am|pm)?", re.IGNORECASE)
-
-    ## --- Helper Functions ---
-    def parse_time(time_str):
-        """Parses a time string into a datetime.time object."""
-        if not isinstance(time_str, str):
-            return None
-        time_str = time_str.strip()
-        if not time_str:
-            return None
+    return SheetAnchors(info_row, info_line, major_row, major,
+                        header_row, crn_col, course_col, instructor_col, credits_col)
 
-        try:
-            # Try formats with am/pm first (most common and specific)
-            for fmt in ('%I:%M %p', '%I:%M%p', '%H:%M %p', '%H:%M%p'):
-                 try:
-                      return datetime.strptime(time_str, fmt).time()
-                 except ValueError:
-                      pass
-
-            # Then try military time (24-hour)
-            try:
-                return datetime.strptime(time_str, '%H:%M').time()
-            except ValueError:
-                pass
-
-            # If neither of the above worked, it might be a 12-hour time *without* AM/PM.
-            # This is the ambiguous case. We need to be careful here.
-            # Let's try parsing it as a 12-hour format without assuming AM/PM yet.
-            try:
-                 # Use %I:%M to parse, but this needs careful handling of the result
-                 time_obj_no_ampm = datetime.strptime(time_str, '%I:%M').time()
-
-                 # If the time string contains a 12 (e.g., "12:15"), this is likely 12 PM if the overall range is PM
-                 # If the time string is 1-11 (e.g., "1:20", "11:40"), it's ambiguous.
-                 # This parsing logic might need to happen *outside* this function,
-                 # where we have context from the full time range string.
-                 # For now, we'll return this and rely on the calling code to handle 12-hour times without am/pm context.
-                 return time_obj_no_ampm
-
-            except ValueError:
-                 pass
-
-            # If all fail, print warning and return None
-            print(f"Warning: Could not parse time string '{time_str}' with expected formats.")
-            return None
-        except Exception as e:
-            print(f"Error parsing time string '{time_str}': {e}")
-            return None
-
-    def find_column_index(df, keywords, search_rows):
-        """Finds the column index that contains all specified keywords within the search rows."""
-        for r_idx in search_rows:
-            if r_idx < len(df):
-                # Corrected: Use df_raw instead of df
-                row_values = [str(val).strip() if pd.notna(val) else "" for val in df_raw.iloc[r_idx].tolist()]
-                # Check if all keywords are present in this row's values
-                if all(keyword in row_values for keyword in keywords):
-                    # Return the 0-indexed column indices of the first occurrence of each keyword
-                    col_indices = {}
-                    for keyword in keywords:
-                        try:
-                            col_indices[keyword] = row_values.index(keyword)
-                        except ValueError:
-                             # This should not happen if all(keyword in row_values for keyword in keywords) is true,
-                             # but as a fallback
-                             print(f"Warning: Keyword '{keyword}' found in row {r_idx+1} but its index could not be determined.")
-                             return None, None, None, None # Indicate failure
-
-                    # Return indices in a fixed order for the course columns
-                    return col_indices.get('CRN'), col_indices.get('Course'), col_indices.get('Instructor(s)'), col_indices.get('Credits')
-
-        print(f"Warning: Could not find a row containing all keywords {keywords} in rows {search_rows.start+1}-{search_rows.stop+1}.")
-        return None, None, None, None # Return None if no header row is found
-
-    def shade_cell(cell, color_hex="D3D3D3"): # Default to light gray
-        """Shades a table cell with the specified color."""
-        try:
-            print(f"Attempting to shade cell with color: {color_hex}") # Debug print
-            # Ensure the color_hex is valid (e.g., "RRGGBB")
-            if not re.fullmatch(r"[0-9a-fA-F]{6}", color_hex):
-                print(f"Warning: Invalid hex color format '{color_hex}'. Using default light gray.")
-                color_hex = "D3D3D3"
 
-            tc = cell._tc
-            tcPr = tc.get_or_add_tcPr()
+def shade_cell(cell, color_hex="D3D3D3"): # Default to light gray
+    """Shades a table cell with the specified color."""
+    try:
+        logger.debug("Attempting to shade cell with color: %s", color_hex)
+        # Ensure the color_hex is valid (e.g., "RRGGBB")
+        if not re.fullmatch(r"[0-9a-fA-F]{6}", color_hex):
+            logger.warning("Invalid hex color format '%s'. Using default light gray.", color_hex)
+            color_hex = "D3D3D3"
 
-            # Remove existing shading elements if any to avoid duplicates
-            for child in tcPr.xpath('./w:shd'):
-                 tcPr.remove(child)
+        tc = cell._tc
+        tcPr = tc.get_or_add_tcPr()
 
-            shading = OxmlElement(qn('w:shd'))
-            # Set the fill attribute using the qualified name
-            shading.set(qn('w:fill'), color_hex)
+        # Remove existing shading elements if any to avoid duplicates
+        for child in tcPr.xpath('./w:shd'):
+             tcPr.remove(child)
 
-            tcPr.append(shading)
-            print("Shading element added to cell.") # Debug print
+        shading = OxmlElement(qn('w:shd'))
+        # Set the fill attribute using the qualified name
+        shading.set(qn('w:fill'), color_hex)
 
-        except Exception as e:
-            print(f"Error applying shading to cell: {e}")
+        tcPr.append(shading)
+        logger.debug("Shading element added to cell.")
 
+    except Exception as e:
+        logger.warning("Error applying shading to cell: %s", e)
 
-    ## --- Data Loading and Extraction ---
 
+## --- Data Loading and Extraction ---
+def load_raw_sheet(file_contents, filename=None):
+    """Loads the raw (headerless) sheet grid, returning None if the workbook can't be read.
+
+    Raises workbook.WorkbookTooLarge for inputs over the unpacked size budget,
+    and lets a conversion time limit (a TimeoutError) through.
+
+    CSV/TSV exports of the same layout are read too (see workbook.sheet_format;
+    ``filename`` is a hint for telling them apart).
+    """
     df_raw = None # Initialize df_raw to None
-    print(f"Loading data from: {EXCEL_FILENAME}")
+    logger.debug("Loading data from uploaded workbook")
     try:
-        # Load Excel file without a header initially to search for information rows
-        df_raw = pd.read_excel(file_contents, header=None)
-        print("Successfully loaded Excel file.")
-        print("First 20 rows and 12 columns of the raw DataFrame:")
-        # Ensure we don't try to print columns beyond the DataFrame's actual columns
-        print(df_raw.head(20).iloc[:, :min(12, df_raw.shape[1])])
-        print("-" * 30)
-
-    except FileNotFoundError:
-        print(f"Error: The file '{EXCEL_FILENAME}' was not found.")
-        # Exit or set a flag to skip subsequent processing if file not found
-        # For now, the rest of the script will handle df_raw being None
-        pass # Continue execution to allow checking df_raw later
+        # Load Excel file without a header initially to search for information rows.
+        # Only the bounded top-left block of the first sheet is streamed in.
+        df_raw = load_sheet(file_contents, filename=filename)
+        if logger.isEnabledFor(logging.DEBUG):
+            # Ensure we don't try to show columns beyond the DataFrame's actual columns
+            logger.debug("Successfully loaded Excel file. First 20 rows and 12 columns of the raw DataFrame:\n%s",
+                         df_raw.head(20).iloc[:, :min(12, df_raw.shape[1])])
+
+    except (WorkbookTooLarge, TimeoutError):
+        # Over budget (size or time) rather than unreadable; the caller reports it as is
+        raise
     except Exception as e:
-        print(f"An error occurred while loading the Excel file: {e}")
-        pass # Continue execution to allow checking df_raw later
-
-
-    # Check if df_raw was successfully loaded before proceeding
-    if df_raw is not None:
-
-        # Extract name and UID
-        info_line = None
-        # Check within the specified search rows for the info line
-        for i in STUDENT_INFO_SEARCH_ROWS:
-            if i < len(df_raw) and STUDENT_INFO_COL_INDEX < df_raw.shape[1]:
-                cell_value = df_raw.iloc[i, STUDENT_INFO_COL_INDEX]
-                if pd.notna(cell_value) and "Information for student:" in str(cell_value):
-                    info_line = str(cell_value)
-                    break
-            elif i >= len(df_raw):
-                break # Stop if we exceed the DataFrame rows
-
-
-        name = ""
-        uid = ""
-        if info_line:
-            match = re.search(r"Information for student:\s*(.*?)\s+\((U\d+)\)", info_line)
-            if match:
-                name = match.group(1)
-                uid = match.group(2)
-            else:
-                 print(f"Warning: Found info line '{info_line}' but could not parse name and UID.")
+        logger.warning("An error occurred while loading the Excel file: %s", e)
+
+    return df_raw
+
+
+def extract_student(df_raw, layout=None, text_rows=None):
+    """Extracts the student record (info, courses, credits and schedule grid) from a loaded sheet.
+
+    ``layout`` is the sheet's LayoutProfile, detected when not given, and
+    ``text_rows`` its sheet_text_rows if already made.
+    """
+    if text_rows is None:
+        text_rows = sheet_text_rows(df_raw)
+    if layout is None:
+        layout = detect_layout(df_raw, text_rows)
+    warnings = []
+    record = extract_details(df_raw, warnings, layout, text_rows)
+    # Map the schedule rows onto the standard time slots
+    record["schedule_grid"] = build_schedule_grid(df_raw, warnings, layout)
+    record["schedule_grid_data"] = schedule_grid_entries(record["schedule_grid"])
+    record["warnings"] = warnings
+    return record
+
+
+def extract_details(df_raw, warnings, layout=DEFAULT_LAYOUT, text_rows=None):
+    """Extracts the student info, courses and total credits from a loaded sheet (everything but the schedule grid)."""
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    # Loading stops at the read bounds; say so when the sheet ran past them
+    truncated = df_raw.attrs.get(SHEET_TRUNCATED)
+    if truncated:
+        bounds = " and ".join(f"{truncated[bound]} {bound}" for bound in ("rows", "columns") if bound in truncated)
+        add_warning(warnings, "sheet_truncated",
+                    f"Only the first {bounds} of the sheet were read; courses or schedule entries past them are missing.",
+                    **truncated)
+
+    # Locate the student info line, major and course header in one pass
+    anchors = scan_sheet_anchors(df_raw, warnings, layout, text_rows)
+
+    # Extract name and UID
+    name = ""
+    uid = ""
+    info_line = anchors.info_line
+    if info_line:
+        match = layout.info_pattern.search(info_line)
+        if match:
+            name = match.group(1)
+            uid = match.group(2)
         else:
-             print(f"Warning: 'Information for student:' line not found in column {STUDENT_INFO_COL_INDEX+1} within rows {STUDENT_INFO_SEARCH_ROWS.start+1}-{STUDENT_INFO_SEARCH_ROWS.stop+1}.")
-
-
-        # Extract major
-        major_line_found = False
-        major = ""
-        # Check within the specified search rows for the major line
-        for i in MAJOR_SEARCH_ROWS:
-            if i < len(df_raw) and STUDENT_INFO_COL_INDEX < df_raw.shape[1]:
-                cell_value = df_raw.iloc[i, STUDENT_INFO_COL_INDEX]
-                if pd.notna(cell_value) and str(cell_value).strip() == "Major and Department:":
-                    major_line_found = True
-                    # Check if the major value column exists and the cell is not empty
-                    if MAJOR_VALUE_COL_INDEX < df_raw.shape[1]:
-                         major_value = df_raw.iloc[i, MAJOR_VALUE_COL_INDEX]
-                         major = str(major_value).strip() if pd.notna(major_value) else ""
-                    else:
-                         print(f"Warning: Major value column index {MAJOR_VALUE_COL_INDEX+1} is out of bounds.")
-                    break # Found the major line
-
-            elif i >= len(df_raw):
-                 break # Stop if we exceed the DataFrame rows
-
-        if not major_line_found:
-             print(f"Warning: 'Major and Department:' line not found in column {STUDENT_INFO_COL_INDEX+1} within rows {MAJOR_SEARCH_ROWS.start+1}-{MAJOR_SEARCH_ROWS.stop+1}.")
-
-
-        # Use placeholder fields
-        advisor = PLACEHOLDER_ADVISOR
-        comments = PLACEHOLDER_COMMENTS
-        orientation = PLACEHOLDER_ORIENTATION
-
-        # Find the course table header row and column indices dynamically
-        course_header_keywords = ['CRN', 'Course', 'Instructor(s)', 'Credits']
-        COURSE_CRN_COL_INDEX, COURSE_CODE_COL_INDEX, COURSE_INSTRUCTOR_COL_INDEX, COURSE_CREDITS_COL_INDEX = find_column_index(
-            df_raw, course_header_keywords, COURSE_HEADER_SEARCH_ROWS
+             add_warning(warnings, "student_info_unparsed",
+                         f"Found info line '{info_line}' but could not parse name and UID.",
+                         value=info_line)
+    else:
+         add_warning(warnings, "student_info_missing",
+                     f"'{layout.student_info_anchor}' line not found in column {layout.student_info_col+1} within rows {layout.student_info_rows.start+1}-{layout.student_info_rows.stop+1}.",
+                     column=layout.student_info_col + 1)
+
+    # Extract major
+    major = anchors.major
+    if anchors.major_row is None:
+         add_warning(warnings, "major_missing",
+                     f"'{layout.major_label}' line not found in column {layout.student_info_col+1} within rows {layout.major_rows.start+1}-{layout.major_rows.stop+1}.",
+                     column=layout.student_info_col + 1)
+
+
+    # Use placeholder fields
+    advisor = PLACEHOLDER_ADVISOR
+    comments = PLACEHOLDER_COMMENTS
+    orientation = PLACEHOLDER_ORIENTATION
+
+    # Course data runs from the row after the header row to the end of the sheet
+    course_data = pd.DataFrame()
+    if anchors.header_row is not None:
+        course_data_start_index = anchors.header_row + 1
+        if course_data_start_index < len(df_raw):
+            course_data = df_raw.iloc[course_data_start_index:]
+        else:
+            add_warning(warnings, "course_data_missing",
+                        f"Course data start index {course_data_start_index+1} is beyond the end of the DataFrame. No course data extracted.",
+                        row=course_data_start_index + 1)
+
+    # Parse courses from course_data with whole-column operations
+    courses = []
+    total_credits = 0
+    if not course_data.empty:
+        def column_text(c_idx):
+            # Column as stripped strings (NaN becomes "nan" like str() did)
+            return course_data.iloc[:, c_idx].astype(str).str.strip()
+
+        initial_rows = len(course_data)
+
+        # Keep rows where BOTH the 'CRN' and 'Course' cells are present and not just whitespace
+        crn_values = column_text(anchors.crn_col)
+        course_values = column_text(anchors.course_col)
+        keep = (
+            course_data.iloc[:, anchors.crn_col].notna().to_numpy()
+            & course_data.iloc[:, anchors.course_col].notna().to_numpy()
+            & (crn_values != "").to_numpy()
+            & (course_values != "").to_numpy()
         )
-
-        header_row = []
-        course_data = pd.DataFrame()
-        course_data_start_index = None
-
-        if COURSE_CRN_COL_INDEX is not None and COURSE_CODE_COL_INDEX is not None:
-            # Assuming the header row is the one containing 'CRN' and 'Course'
-            # We need to re-find the exact row index where these headers are located
-            temp_header_row_index = None
-            for i in COURSE_HEADER_SEARCH_ROWS:
-                if i < len(df_raw):
-                    row_values = [str(val).strip() if pd.notna(val) else "" for val in df_raw.iloc[i].tolist()]
-                    if 'CRN' in row_values and 'Course' in row_values:
-                         temp_header_row_index = i
-                         break
-                elif i >= len(df_raw):
-                     break
-
-
-            if temp_header_row_index is not None:
-                header_row = [str(col).strip() if pd.notna(col) else "" for col in df_raw.iloc[temp_header_row_index].tolist()]
-                course_data_start_index = temp_header_row_index + 1
-
-                # Extract course data starting from the row after the header row
-                if course_data_start_index < len(df_raw):
-                     course_data = df_raw.iloc[course_data_start_index:].copy()
-
-                     # Ensure the number of columns matches before assigning headers
-                     if len(header_row) == course_data.shape[1]:
-                         course_data.columns = header_row
-                         # pandas automatically handles duplicate column names by appending .1, .2 etc.
-                     else:
-                         print(f"Warning: Number of columns in header row ({len(header_row)}) does not match data columns ({course_data.shape[1]}). Cannot assign headers.")
-                         course_data = pd.DataFrame() # Reset course_data if headers can't be assigned
-                else:
-                     print(f"Warning: Course data start index {course_data_start_index+1} is beyond the end of the DataFrame. No course data extracted.")
-                     course_data = pd.DataFrame() # No data to extract
-            else:
-                print("Warning: Course header row not found. Cannot extract course data.")
-                course_data = pd.DataFrame() # No header means no data
-
-
-        # *** THIS IS THE SECTION TO FOCUS ON FOR REMOVING EMPTY ROWS FROM THE DATAFRAME ***
-        # Drop or filter out rows that don't represent actual courses
-        if not course_data.empty:
-            # Use the dynamically found column names for filtering
-            crn_col_name = 'CRN' if 'CRN' in course_data.columns else None
-            course_col_name = 'Course' if 'Course' in course_data.columns else None
-
-            initial_rows = len(course_data)
-
-            if crn_col_name and course_col_name:
-                # Filter: Keep rows where BOTH the 'CRN' column is NOT null AND the 'Course' column is NOT null
-                # Also ensure the values are not just empty strings after stripping whitespace
-                course_data_filtered = course_data[
-                    course_data[crn_col_name].apply(lambda x: pd.notna(x) and str(x).strip() != "") &
-                    course_data[course_col_name].apply(lambda x: pd.notna(x) and str(x).strip() != "")
-                ].copy()
-
-                rows_after_filter = len(course_data_filtered)
-                print(f"Filtered course_data: Started with {initial_rows} rows, filtered {initial_rows - rows_after_filter}, ending with {rows_after_filter} rows.")
-                course_data = course_data_filtered # Update course_data to the filtered version
-            else:
-                print("Warning: 'CRN' or 'Course' columns not found after header assignment. Cannot filter rows based on these columns. Proceeding with potentially unfiltered data.")
-                # In this case, course_data remains as extracted, potentially containing empty rows
-
-
-        # Parse courses from the filtered course_data DataFrame
-        courses = []
-        if not course_data.empty:
-            # Use the dynamically found column names if they exist, otherwise use default or placeholder
-            crn_col_name = 'CRN' if 'CRN' in course_data.columns else None
-            course_col_name = 'Course' if 'Course' in course_data.columns else None
-            instructor_col_name = 'Instructor(s)' if 'Instructor(s)' in course_data.columns else None
-            credits_col_name = 'Credits' if 'Credits' in course_data.columns else None
-
-            if crn_col_name and course_col_name: # Require CRN and Course columns to exist for parsing
-                for _, row in course_data.iterrows():
-                    # Get values using .get() with default "" for robustness
-                    crn = str(row.get(crn_col_name, "")).strip()
-                    course_code = str(row.get(course_col_name, "")).strip()
-                    instructor = str(row.get(instructor_col_name, "")).strip() if instructor_col_name else ""
-                    credits_raw = row.get(credits_col_name) if credits_col_name else 0
-
-                    credits = 0
-                    if pd.notna(credits_raw):
-                         try:
-                             # Safely convert credits, handling potential issues
-                             credits_str = str(credits_raw).replace(',', '').strip()
-                             if credits_str:
-                                 credits = int(float(credits_str)) # Use float first for robustness
-                         except (ValueError, TypeError):
-                             credits = 0 # Set to 0 if conversion fails
-
-                    # Add the course only if CRN and Course Code are present after stripping
-                    # This check is technically redundant if the filtering above works correctly,
-                    # but it adds an extra layer of safety for creating the 'courses' list.
-                    if crn and course_code:
-                        courses.append({
-                            "CRN": crn,
-                            "Course": course_code,
-                            "Instructor": instructor,
-                            "Credits": str(credits) # Store as string for consistency
-                        })
-            else:
-                print("Warning: 'CRN' or 'Course' columns not found in filtered course data. Cannot parse course list.")
+        crn_values = crn_values[keep]
+        course_values = course_values[keep]
+        if anchors.instructor_col is not None:
+            instructor_values = column_text(anchors.instructor_col)[keep]
         else:
-            print("No course data found after filtering.")
+            instructor_values = pd.Series("", index=crn_values.index)
+
+        # Credits: drop thousands separators, coerce to numbers, and truncate to int;
+        # missing or unparseable values count as 0
+        if anchors.credits_col is not None:
+            credits_text = column_text(anchors.credits_col)[keep].str.replace(',', '', regex=False)
+            credits_values = pd.to_numeric(credits_text, errors='coerce')
+            credits_values = credits_values.where(np.isfinite(credits_values), 0).astype('int64')
+        else:
+            credits_values = pd.Series(0, index=crn_values.index, dtype='int64')
+
+        logger.debug("Filtered course_data: Started with %d rows, filtered %d, ending with %d rows.",
+                     initial_rows, initial_rows - len(crn_values), len(crn_values))
+
+        courses = [
+            {
+                "CRN": crn,
+                "Course": course_code,
+                "Instructor": instructor,
+                "Credits": str(credits) # Store as string for consistency
+            }
+            for crn, course_code, instructor, credits in zip(
+                crn_values.tolist(), course_values.tolist(), instructor_values.tolist(), credits_values.tolist()
+            )
+        ]
+
+        # Calculate total credits (negative credit values are not counted)
+        total_credits = int(credits_values[credits_values >= 0].sum())
+    else:
+        logger.debug("No course data found.")
 
-        # --- Debugging: Print the courses list before generating the Word table ---
-        print("\n--- Contents of 'courses' list before Word table generation ---")
-        print(f"Number of courses in list: {len(courses)}")
+    # --- Debugging: Log the courses list before generating the Word table ---
+    if debug:
+        logger.debug("Number of courses in list: %d", len(courses))
         for i, course in enumerate(courses):
-            print(f"  Course {i+1}: {course}")
-        print("-----------------------------------------------------------\n")
+            logger.debug("  Course %d: %s", i + 1, course)
+
+
+    return {
+        "name": name,
+        "uid": uid,
+        "major": major,
+        "advisor": advisor,
+        "comments": comments,
+        "orientation": orientation,
+        "courses": courses,
+        "total_credits": total_credits,
+        "layout": layout.name,
+    }
 
 
-        # Calculate total credits
-        total_credits = 0
-        if courses:
-            try:
-                # Sum credits, ensuring they are digits
-                total_credits = sum(int(c.get("Credits", "0")) for c in courses if c.get("Credits", "0").isdigit())
-            except ValueError:
-                print("Warning: Could not calculate total credits due to non-integer credit values.")
-                total_credits = "Error calculating"
+## --- Schedule Grid Parsing ---
+# Positions of the grid rows (time slots) and columns (days)
+SLOT_POSITIONS = {time_slot: s_idx for s_idx, time_slot in enumerate(STANDARD_TIMES)}
+DAY_POSITIONS = {day: d_idx for d_idx, day in enumerate(STANDARD_DAYS)}
+COMMON_HOUR_CELLS = np.zeros((len(STANDARD_TIMES), len(STANDARD_DAYS)), dtype=bool)
+COMMON_HOUR_CELLS[np.ix_([SLOT_POSITIONS[t] for t in COMMON_HOUR_TIMES], [DAY_POSITIONS[d] for d in COMMON_HOUR_DAYS])] = True
+# Irregular slots (e.g. "11:40-12:05 am", whose end parses to 00:05) are covered
+# by nearly every morning range, so courses sharing them don't actually clash
+# and the conflict report skips them
+CONFLICT_SLOTS = np.ones(len(STANDARD_TIMES), dtype=bool)
+CONFLICT_SLOTS[[SLOT_POSITIONS[label] for _, _, label in STANDARD_SLOT_INDEX.irregular]] = False
 
 
-        ## --- Schedule Grid Parsing ---
+class ScheduleGrid(NamedTuple):
+    """A student's weekly grid as a (slots x days) occupancy array.
 
-        # Create an empty target schedule grid
-        schedule_grid_data = {time: {day: "" for day in STANDARD_DAYS} for time in STANDARD_TIMES}
+    ``entries`` are the schedule row course entries in row order; bit i of an
+    ``occupancy`` cell is set when entry i meets in that time slot (row of
+    STANDARD_TIMES) on that day (column of STANDARD_DAYS).
+    """
+    entries: list
+    occupancy: np.ndarray
+
+
+def empty_occupancy():
+    return np.zeros((len(STANDARD_TIMES), len(STANDARD_DAYS)), dtype=np.uint64)
 
-        # Ensure required columns exist for schedule parsing
-        if SCHEDULE_DAYS_COL_INDEX < df_raw.shape[1] and SCHEDULE_TIME_COL_INDEX < df_raw.shape[1] and SCHEDULE_COURSE_COL_INDEX < df_raw.shape[1]:
-            # Ensure the SCHEDULE_DATA_ROWS range is valid for the DataFrame
-            valid_schedule_rows = range(
-                SCHEDULE_DATA_ROWS.start,
-                min(SCHEDULE_DATA_ROWS.stop, len(df_raw))
-            )
-            if not valid_schedule_rows:
-                 print("Warning: No valid rows found within the specified SCHEDULE_DATA_ROWS range.")
-            else:
-                print(f"\nParsing schedule data from rows {valid_schedule_rows.start+1}-{valid_schedule_rows.stop} using columns I ({SCHEDULE_DAYS_COL_INDEX+1}), J ({SCHEDULE_TIME_COL_INDEX+1}), and B ({SCHEDULE_COURSE_COL_INDEX+1})...")
-
-                # Iterate through the specified rows that contain schedule entries
-                for r_idx in valid_schedule_rows:
-                    # Get raw values from the defined schedule columns
-                    raw_time_range_value = str(df_raw.iloc[r_idx, SCHEDULE_TIME_COL_INDEX]).strip()
-                    raw_days_value = str(df_raw.iloc[r_idx, SCHEDULE_DAYS_COL_INDEX]).strip()
-                    raw_course_entry = str(df_raw.iloc[r_idx, SCHEDULE_COURSE_COL_INDEX]).strip() # Changed variable name for clarity
-
-                    # --- Always print the raw data for the row being processed for debugging ---
-                    print(f"  Processing row {r_idx+1} (Index {r_idx}): Time='{raw_time_range_value}', Days='{raw_days_value}', Course='{raw_course_entry}'")
-
-                    # Only process if we have time, days, and a course entry
-                    if raw_time_range_value and raw_days_value and raw_course_entry:
-                         # --- Parse the raw time range ---
-                         start_time_str = None
-                         end_time_str = None
-                         time_range_match = TIME_PATTERN.search(raw_time_range_value)
-                         if time_range_match:
-                              parts = time_range_match.group(0).split('-')
-                              if len(parts) == 2:
-                                  start_time_str = parts[0].strip()
-                                  end_time_str = parts[1].strip()
-                              else:
-                                   print(f"Warning: Could not split time range '{time_range_match.group(0)}' into start and end times.")
-
-                         # Convert extracted time strings to datetime.time objects
-                         start_time_obj = parse_time(start_time_str)
-                         end_time_obj = parse_time(end_time_str)
-
-                         # --- ADD DEBUG PRINT HERE ---
-                         print(f"    Parsed Time: Start='{start_time_str}' ({start_time_obj}), End='{end_time_str}' ({end_time_obj})")
-                         # --- END DEBUG PRINT ---
-
-
-                         # --- Determine which standard time slots are covered by this range ---
-                         covered_standard_times = []
-                         # Only proceed if both start and end times were successfully parsed
-                         if start_time_obj is not None and end_time_obj is not None:
-                             for std_time_range in STANDARD_TIMES:
-                                  std_parts = std_time_range.split('-')
-                                  if len(std_parts) == 2:
-                                       std_start_str_raw = std_parts[0].strip()
-                                       std_end_str_raw = std_parts[1].strip()
-
-                                       # Determine if the standard range is AM or PM based on the full string or end part
-                                       is_pm_range = 'pm' in std_time_range.lower() or ('pm' in std_end_str_raw.lower() and 'am' not in std_start_str_raw.lower())
-                                       is_am_range = 'am' in std_time_range.lower() or ('am' in std_end_str_raw.lower() and 'pm' not in std_start_str_raw.lower())
-
-                                       # Attempt to parse start and end times, providing AM/PM context explicitly
-                                       std_start_obj = None
-                                       std_end_obj = None
-
-                                       # Force AM/PM if not present in the raw string part, based on the range
-                                       if 'am' in std_start_str_raw.lower() or 'pm' in std_start_str_raw.lower():
-                                           # If AM/PM is already there, parse directly
-                                           std_start_obj = parse_time(std_start_str_raw)
-                                       elif is_am_range:
-                                            # If it's an overall AM range and no AM/PM in start, add " am"
-                                            std_start_obj = parse_time(std_start_str_raw + " am")
-                                       elif is_pm_range:
-                                           # If it's an overall PM range and no AM/PM in start, add " pm"
-                                           # This covers 12:xx pm and 1:xx pm etc.
-                                           std_start_obj = parse_time(std_start_str_raw + " pm")
-                                       else:
-                                            # If no AM/PM info in string or range, try parsing as is (might default to AM)
-                                            # This is a fallback and still potentially ambiguous
-                                            std_start_obj = parse_time(std_start_str_raw)
-
-
-                                       # Parse end time - apply the same logic
-                                       if 'am' in std_end_str_raw.lower() or 'pm' in std_end_str_raw.lower():
-                                           std_end_obj = parse_time(std_end_str_raw)
-                                       elif is_am_range:
-                                            std_end_obj = parse_time(std_end_str_raw + " am")
-                                       elif is_pm_range:
-                                            std_end_obj = parse_time(std_end_str_raw + " pm")
-                                       else:
-                                           std_end_obj = parse_time(std_end_str_raw)
-
-
-                                       # --- Keep your debug prints here ---
-                                       print(f"      Checking Standard Time Slot '{std_time_range}': Parsed Start='{std_start_str_raw}' ({std_start_obj}), Parsed End='{std_end_str_raw}' ({std_end_obj})")
-                                       print(f"        Comparison: {std_start_obj} >= {start_time_obj} ({std_start_obj >= start_time_obj}) AND {std_end_obj} <= {end_time_obj} ({std_end_obj <= end_time_obj})")
-                                       # --- END DEBUG PRINT ---
-
-
-                                       if std_start_obj is not None and std_end_obj is not None:
-                                           # Check if the standard time slot is fully within or exactly matches the raw time range
-                                           if std_start_obj >= start_time_obj and std_end_obj <= end_time_obj:
-                                               covered_standard_times.append(std_time_range)
-                                  else:
-                                       # Handle non-standard time strings in STANDARD_TIMES (like "Evening")
-                                       if std_time_range.strip().lower() == raw_time_range_value.strip().lower():
-                                            covered_standard_times.append(std_time_range)
-
-
-                         # Parse the raw days string to get standard days
-                         days_to_populate = []
-                         # Check if the raw days value is a key in our mapping
-                         if raw_days_value in DAY_MAPPING:
-                              days_to_populate = DAY_MAPPING[raw_days_value]
-                         else:
-                             # Fallback: Handle single-letter days if not explicitly in mapping
-                             if len(raw_days_value) == 1 and raw_days_value.upper() in [d[0] for d in STANDARD_DAYS]:
-                                 day_letter = raw_days_value.upper()
-                                 for std_day in STANDARD_DAYS:
-                                      if std_day.startswith(day_letter):
-                                           days_to_populate.append(std_day)
-                                           break # Assume unique first letters
-
-
-                         # --- Populate the schedule grid data if we have covered times and days ---
-                         if covered_standard_times and days_to_populate:
-                             print(f"  Mapping '{raw_course_entry}' for time range '{raw_time_range_value}' (covers: {covered_standard_times}) on days {days_to_populate}") # Debug print
-                             for std_time_slot in covered_standard_times:
-                                  for day in days_to_populate:
-                                      if std_time_slot in schedule_grid_data and day in schedule_grid_data[std_time_slot]:
-                                          # Append the course entry to the correct cell in the grid
-                                          # Add a newline if the cell is not empty to separate multiple entries
-                                          if schedule_grid_data[std_time_slot][day]:
-                                               schedule_grid_data[std_time_slot][day] += "\n" + raw_course_entry
-                                          else:
-                                               schedule_grid_data[std_time_slot][day] = raw_course_entry
-                                      else:
-                                           print(f"Warning: Could not map course entry '{raw_course_entry}' to unknown standard time '{std_time_slot}' or day '{day}'. Check STANDARD_TIMES and STANDARD_DAYS configuration.")
-                         else:
-                              # Print why a row wasn't mapped to help debugging
-                              if raw_time_range_value and raw_days_value and raw_course_entry: # Only print if data was present but not mapped
-                                 print(f"  Row {r_idx+1} skipped due to missing data in key columns: Time='{raw_time_range_value}', Days='{raw_days_value}', Course='{raw_course_entry}'")
-
-                    else:
-                         # This row is skipped because time, days, or course entry was empty/missing
-                         if any([pd.notna(df_raw.iloc[r_idx, SCHEDULE_TIME_COL_INDEX]),
-                                 pd.notna(df_raw.iloc[r_idx, SCHEDULE_DAYS_COL_INDEX]),
-                                 pd.notna(df_raw.iloc[r_idx, SCHEDULE_COURSE_COL_INDEX])]):
-                              print(f"  Row {r_idx+1} skipped due to missing data in key columns: Time='{raw_time_range_value}', Days='{raw_days_value}', Course='{raw_course_entry}'")
 
+def build_schedule_grid(df_raw, warnings, layout=DEFAULT_LAYOUT):
+    """Maps the schedule rows of a loaded sheet onto the standard time slot grid, returning a ScheduleGrid."""
+    debug = logger.isEnabledFor(logging.DEBUG)
 
+    entries = []
+    occupancy = empty_occupancy()
+
+    # Ensure required columns exist for schedule parsing
+    if layout.schedule_days_col < df_raw.shape[1] and layout.schedule_time_col < df_raw.shape[1] and layout.schedule_course_col < df_raw.shape[1]:
+        # Ensure the layout's schedule row range is valid for the DataFrame
+        valid_schedule_rows = range(
+            layout.schedule_rows.start,
+            min(layout.schedule_rows.stop, len(df_raw))
+        )
+        if not valid_schedule_rows:
+             add_warning(warnings, "schedule_rows_missing", f"No valid rows found within the schedule rows {layout.schedule_rows.start+1}-{layout.schedule_rows.stop} of layout '{layout.name}'.")
         else:
-             if SCHEDULE_DAYS_COL_INDEX is not None and SCHEDULE_DAYS_COL_INDEX >= df_raw.shape[1]:
-                  print(f"Cannot parse schedule data: Days column index {SCHEDULE_DAYS_COL_INDEX+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.")
-             if SCHEDULE_TIME_COL_INDEX is not None and SCHEDULE_TIME_COL_INDEX >= df_raw.shape[1]:
-                  print(f"Cannot parse schedule data: Time column index {SCHEDULE_TIME_COL_INDEX+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.")
-             if SCHEDULE_COURSE_COL_INDEX is not None and SCHEDULE_COURSE_COL_INDEX >= df_raw.shape[1]:
-                  print(f"Cannot parse schedule data: Schedule Course column index {SCHEDULE_COURSE_COL_INDEX+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.")
-
-    else: # If df_raw was not successfully loaded
-        print("Skipping data extraction and Word document generation due to file loading error.")
-        # Initialize necessary variables to default values to prevent errors later if the script didn't exit
-        name = ""
-        uid = ""
-        major = ""
-        advisor = PLACEHOLDER_ADVISOR
-        comments = PLACEHOLDER_COMMENTS
-        orientation = PLACEHOLDER_ORIENTATION
-        courses = []
-        total_credits = 0
-        schedule_grid_data = {time: {day: "" for day in STANDARD_DAYS} for time in STANDARD_TIMES}
-
-
-    ## --- Generate Word doc ---
-    # Only generate the document if the file was loaded, or handle the case where data is empty
-    if df_raw is not None:
-        doc = Document()
-
-        # --- Section 1: Student Information (Table Format) ---
-        doc.add_paragraph("\n\nNew York Campus, Undergraduate\n")
-
-        # Create a 4x2 table for student information
-        info_table = doc.add_table(rows=4, cols=2)
-        info_table.style = 'Table Grid' # Optional: Apply a table style
-
-        # Populate the table cells according to the corrected layout
-        # Row 0: UID (Col 1), Orientation Date (Col 2)
-        uid_cell_col1 = info_table.cell(0, 0)
-        uid_paragraph_col1_r0 = uid_cell_col1.paragraphs[0]
-        uid_paragraph_col1_r0.text = "" # Clear existing text
-        run = uid_paragraph_col1_r0.add_run("UID:")
-        run.bold = True
-        uid_paragraph_col1_r0.add_run(f" {uid}")
-
-        orientation_cell_col2 = info_table.cell(0, 1)
-        orientation_paragraph_col2_r0 = orientation_cell_col2.paragraphs[0]
-        orientation_paragraph_col2_r0.text = "" # Clear existing text
-        run = orientation_paragraph_col2_r0.add_run("Orientation Date:")
-        run.bold = True
-        orientation_paragraph_col2_r0.add_run(f" {orientation}")
-
-
-        # Row 1: Name (Col 1), Total Credits (Col 2)
-        name_cell_col1 = info_table.cell(1, 0)
-        name_paragraph_col1_r1 = name_cell_col1.paragraphs[0]
-        name_paragraph_col1_r1.text = "" # Clear existing text
-        run = name_paragraph_col1_r1.add_run("Name:")
-        run.bold = True
-        name_paragraph_col1_r1.add_run(f" {name}")
-
-        credits_cell_col2 = info_table.cell(1, 1)
-        credits_paragraph_col2_r1 = credits_cell_col2.paragraphs[0]
-        credits_paragraph_col2_r1.text = "" # Clear existing text
-        run = credits_paragraph_col2_r1.add_run("Total Credits:")
-        run.bold = True
-        credits_paragraph_col2_r1.add_run(f" {total_credits}")
-
-
-        # Row 2: Major (Col 1), Advisor (Col 2)
-        major_cell_col1 = info_table.cell(2, 0)
-        major_paragraph_col1_r2 = major_cell_col1.paragraphs[0]
-        major_paragraph_col1_r2.text = "" # Clear existing text
-        run = major_paragraph_col1_r2.add_run("Major:")
-        run.bold = True
-        major_paragraph_col1_r2.add_run(f" {major}")
-
-        advisor_cell_col2 = info_table.cell(2, 1)
-        advisor_paragraph_col2_r2 = advisor_cell_col2.paragraphs[0]
-        advisor_paragraph_col2_r2.text = "" # Clear existing text
-        run = advisor_paragraph_col2_r2.add_run("Advisor:")
-        run.bold = True
-        advisor_paragraph_col2_r2.add_run(f" {advisor}")
-
-        # Row 3: Comments (Col 1), Blank Cell (Col 2)
-        comments_cell_col1 = info_table.cell(3, 0)
-        comments_paragraph_col1_r3 = comments_cell_col1.paragraphs[0]
-        comments_paragraph_col1_r3.text = "" # Clear existing text
-        run = comments_paragraph_col1_r3.add_run("Comments:")
-        run.bold = True
-        comments_paragraph_col1_r3.add_run(f" {comments}")
-
-        info_table.cell(3, 1).text = "" # Keep this cell blank as requested
-
-
-        # Adjust text alignment and vertical alignment for the info table
-        for row in info_table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT # Align text to the left
-                cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER # Vertically center text
-
-        # Set minimum row height for the info table
-        info_table_row_height_cm = 0.8 # Adjust this value as needed
-        for row in info_table.rows:
-            row.height = Cm(info_table_row_height_cm)
-            row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
-
-
-        # --- Section 2: Course Table ---
-        doc.add_paragraph("\n") # Spacing after info table
-        doc.add_paragraph("Courses:").bold = True
-
-        if courses: # Check if the 'courses' list is not empty after filtering
-            # Add 1 for the header row
-            # Ensure the table has exactly len(courses) + 1 rows (header + one row per course)
-            table = doc.add_table(rows=len(courses) + 1, cols=5)
-            table.style = 'Table Grid'
-
-            hdr = table.rows[0].cells
-            hdr[0].text = 'CRN'
-            hdr[1].text = 'Course'
-            hdr[2].text = 'Instructor'
-            hdr[3].text = 'Crdt'
-            hdr[4].text = 'Attribute'
-
-            for cell in hdr:
+            logger.debug("Parsing schedule data from rows %d-%d using days column %d, time column %d and course column %d...",
+                         valid_schedule_rows.start + 1, valid_schedule_rows.stop,
+                         layout.schedule_days_col + 1, layout.schedule_time_col + 1, layout.schedule_course_col + 1)
+
+            # Iterate through the specified rows that contain schedule entries
+            for r_idx in valid_schedule_rows:
+                # Get raw values from the defined schedule columns
+                time_cell = df_raw.iloc[r_idx, layout.schedule_time_col]
+                days_cell = df_raw.iloc[r_idx, layout.schedule_days_col]
+                course_cell = df_raw.iloc[r_idx, layout.schedule_course_col]
+                raw_time_range_value = str(time_cell).strip()
+                raw_days_value = str(days_cell).strip()
+                raw_course_entry = str(course_cell).strip() # Changed variable name for clarity
+
+                if debug:
+                    logger.debug("  Processing row %d (Index %d): Time='%s', Days='%s', Course='%s'",
+                                 r_idx + 1, r_idx, raw_time_range_value, raw_days_value, raw_course_entry)
+
+                # Only process if we have time, days, and a course entry
+                if raw_time_range_value and raw_days_value and raw_course_entry:
+                     # --- Parse the raw time range ---
+                     start_time_str = None
+                     end_time_str = None
+                     time_range_match = TIME_PATTERN.search(raw_time_range_value)
+                     if time_range_match:
+                          parts = time_range_match.group(0).split('-')
+                          if len(parts) == 2:
+                              start_time_str = parts[0].strip()
+                              end_time_str = parts[1].strip()
+                          else:
+                               add_warning(warnings, "time_range_unsplit",
+                                           f"Could not split time range '{time_range_match.group(0)}' into start and end times.",
+                                           row=r_idx + 1, value=raw_time_range_value)
+
+                     # Convert extracted time strings to datetime.time objects
+                     start_time_obj, end_time_obj = parse_time_range(start_time_str, end_time_str)
+
+                     if debug:
+                         logger.debug("    Parsed Time: Start='%s' (%s), End='%s' (%s)",
+                                      start_time_str, start_time_obj, end_time_str, end_time_obj)
+                     if (start_time_obj is None or end_time_obj is None) and pd.notna(time_cell):
+                         add_warning(warnings, "unparseable_time",
+                                     f"Could not parse time range '{raw_time_range_value}' in row {r_idx+1}.",
+                                     row=r_idx + 1, value=raw_time_range_value)
+
+
+                     # --- Determine which standard time slots are covered by this range ---
+                     covered_standard_times = []
+                     # Only proceed if both start and end times were successfully parsed
+                     if start_time_obj is not None and end_time_obj is not None:
+                         covered_standard_times = covered_slots(
+                             STANDARD_SLOT_INDEX, start_time_obj, end_time_obj, raw_time_range_value
+                         )
+
+
+                     # Parse the raw days string to get standard days
+                     days_to_populate = []
+                     # Check if the raw days value is a key in our mapping
+                     if raw_days_value in layout.day_mapping:
+                          days_to_populate = layout.day_mapping[raw_days_value]
+                     else:
+                         # Fallback: Handle single-letter days if not explicitly in mapping
+                         if len(raw_days_value) == 1 and raw_days_value.upper() in [d[0] for d in STANDARD_DAYS]:
+                             day_letter = raw_days_value.upper()
+                             for std_day in STANDARD_DAYS:
+                                  if std_day.startswith(day_letter):
+                                       days_to_populate.append(std_day)
+                                       break # Assume unique first letters
+
+
+                     # --- Mark the covered cells in the occupancy grid if we have covered times and days ---
+                     if covered_standard_times and days_to_populate:
+                         if debug:
+                             logger.debug("  Mapping '%s' for time range '%s' (covers: %s) on days %s",
+                                          raw_course_entry, raw_time_range_value, covered_standard_times, days_to_populate)
+                         for std_time_slot in covered_standard_times:
+                              for day in days_to_populate:
+                                  if std_time_slot not in SLOT_POSITIONS or day not in DAY_POSITIONS:
+                                       add_warning(warnings, "unmapped_slot",
+                                                   f"Could not map course entry '{raw_course_entry}' to unknown standard time '{std_time_slot}' or day '{day}'. Check STANDARD_TIMES and STANDARD_DAYS configuration.",
+                                                   row=r_idx + 1, slot=std_time_slot, day=day)
+                         slot_positions = [SLOT_POSITIONS[t] for t in covered_standard_times if t in SLOT_POSITIONS]
+                         day_positions = [DAY_POSITIONS[d] for d in dict.fromkeys(days_to_populate) if d in DAY_POSITIONS]
+                         if slot_positions and day_positions:
+                             if len(entries) == GRID_MASK_BITS:
+                                 add_warning(warnings, "schedule_rows_overflow",
+                                             f"More than {GRID_MASK_BITS} schedule entries; '{raw_course_entry}' in row {r_idx+1} was not mapped.",
+                                             row=r_idx + 1)
+                             else:
+                                 # One vectorized write sets this entry's bit in every covered cell
+                                 occupancy[np.ix_(slot_positions, day_positions)] |= np.uint64(1) << np.uint64(len(entries))
+                                 entries.append(raw_course_entry)
+                     else:
+                          if pd.notna(days_cell) and not days_to_populate:
+                              add_warning(warnings, "unknown_days",
+                                          f"Unrecognized days value '{raw_days_value}' in row {r_idx+1}.",
+                                          row=r_idx + 1, value=raw_days_value)
+                          # Log why a row wasn't mapped to help debugging
+                          if debug:
+                             logger.debug("  Row %d skipped due to missing data in key columns: Time='%s', Days='%s', Course='%s'",
+                                          r_idx + 1, raw_time_range_value, raw_days_value, raw_course_entry)
+
+                else:
+                     # This row is skipped because time, days, or course entry was empty/missing
+                     if debug and any([pd.notna(time_cell), pd.notna(days_cell), pd.notna(course_cell)]):
+                          logger.debug("  Row %d skipped due to missing data in key columns: Time='%s', Days='%s', Course='%s'",
+                                       r_idx + 1, raw_time_range_value, raw_days_value, raw_course_entry)
+
+
+    else:
+         if layout.schedule_days_col is not None and layout.schedule_days_col >= df_raw.shape[1]:
+              add_warning(warnings, "schedule_column_out_of_bounds",
+                          f"Cannot parse schedule data: Days column index {layout.schedule_days_col+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.",
+                          column=layout.schedule_days_col + 1)
+         if layout.schedule_time_col is not None and layout.schedule_time_col >= df_raw.shape[1]:
+              add_warning(warnings, "schedule_column_out_of_bounds",
+                          f"Cannot parse schedule data: Time column index {layout.schedule_time_col+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.",
+                          column=layout.schedule_time_col + 1)
+         if layout.schedule_course_col is not None and layout.schedule_course_col >= df_raw.shape[1]:
+              add_warning(warnings, "schedule_column_out_of_bounds",
+                          f"Cannot parse schedule data: Schedule Course column index {layout.schedule_course_col+1} is out of bounds for DataFrame with {df_raw.shape[1]} columns.",
+                          column=layout.schedule_course_col + 1)
+
+    grid = ScheduleGrid(entries, occupancy)
+    report_schedule_conflicts(grid, warnings)
+    return grid
+
+
+def grid_cell_entries(grid, mask):
+    """The course entries whose bits are set in an occupancy mask, in row order."""
+    return [entry for bit, entry in enumerate(grid.entries) if mask >> bit & 1]
+
+
+def schedule_grid_entries(grid):
+    """Renders a ScheduleGrid as {time: {day: entries joined by newlines}}, the form the documents are filled from."""
+    grid_data = {time_slot: {day: "" for day in STANDARD_DAYS} for time_slot in STANDARD_TIMES}
+    for s_idx, d_idx in zip(*np.nonzero(grid.occupancy)):
+        grid_data[STANDARD_TIMES[s_idx]][STANDARD_DAYS[d_idx]] = "\n".join(
+            grid_cell_entries(grid, int(grid.occupancy[s_idx, d_idx]))
+        )
+    return grid_data
+
+
+def report_schedule_conflicts(grid, warnings):
+    """Warns about cells holding more than one course, and about courses in the COMMON HOUR cells.
+
+    Both checks are a single pass over the occupancy array; cells with the
+    same set of courses are reported together. Irregular slots aren't
+    checked for overlaps (see CONFLICT_SLOTS).
+    """
+    occupancy = grid.occupancy
+    conflicting = (np.bitwise_count(occupancy) > 1) & CONFLICT_SLOTS[:, None]
+    hidden = COMMON_HOUR_CELLS & (occupancy != 0)
+    if not (conflicting.any() or hidden.any()):
+        return
+
+    def cells_label(cells):
+        return ", ".join(f"{STANDARD_DAYS[d_idx]} {STANDARD_TIMES[s_idx]}" for s_idx, d_idx in zip(*np.nonzero(cells)))
+
+    def cells_detail(cells):
+        return [{"time": STANDARD_TIMES[s_idx], "day": STANDARD_DAYS[d_idx]} for s_idx, d_idx in zip(*np.nonzero(cells))]
+
+    for mask in np.unique(occupancy[conflicting]).tolist():
+        cells = conflicting & (occupancy == mask)
+        courses = grid_cell_entries(grid, mask)
+        add_warning(warnings, "schedule_conflict",
+                    f"Courses {', '.join(repr(course) for course in courses)} overlap on {cells_label(cells)}.",
+                    courses=courses, cells=cells_detail(cells))
+    for mask in np.unique(occupancy[hidden]).tolist():
+        cells = hidden & (occupancy == mask)
+        courses = grid_cell_entries(grid, mask)
+        add_warning(warnings, "common_hour_conflict",
+                    f"{'Course' if len(courses) == 1 else 'Courses'} {', '.join(repr(course) for course in courses)} "
+                    f"{'meets' if len(courses) == 1 else 'meet'} during COMMON HOUR on {cells_label(cells)} and {'is' if len(courses) == 1 else 'are'} not shown there.",
+                    courses=courses, cells=cells_detail(cells))
+
+
+def cohort_occupancy(grids):
+    """Stacks students' ScheduleGrids into a (students, slots, days) boolean tensor of busy cells.
+
+    Summing over the first axis gives how many students are in class in each slot.
+    """
+    if not grids:
+        return np.zeros((0, len(STANDARD_TIMES), len(STANDARD_DAYS)), dtype=bool)
+    return np.stack([grid.occupancy for grid in grids]) != 0
+
+
+def section_occupancy(grids):
+    """Counts students per course entry and cell across ScheduleGrids.
+
+    Returns (sections, load): the distinct course entries in first-seen order
+    and a (sections, slots, days) array with the number of students meeting
+    in each section in each cell.
+    """
+    positions = {}
+    for grid in grids:
+        for entry in grid.entries:
+            positions.setdefault(entry, len(positions))
+    load = np.zeros((len(positions), len(STANDARD_TIMES), len(STANDARD_DAYS)), dtype=np.int32)
+    for grid in grids:
+        for bit, entry in enumerate(grid.entries):
+            load[positions[entry]] += ((grid.occupancy >> np.uint64(bit)) & np.uint64(1)).astype(np.int32)
+    return list(positions), load
+
+
+## --- Generate Word doc ---
+def render_document(record):
+    """Builds the advising Word document for an extracted student record."""
+    name = record["name"]
+    uid = record["uid"]
+    major = record["major"]
+    advisor = record["advisor"]
+    comments = record["comments"]
+    orientation = record["orientation"]
+    courses = record["courses"]
+    total_credits = record["total_credits"]
+    schedule_grid_data = record["schedule_grid_data"]
+
+    doc = Document()
+
+    # --- Section 1: Student Information (Table Format) ---
+    doc.add_paragraph("\n\nNew York Campus, Undergraduate\n")
+
+    # Create a 4x2 table for student information
+    info_table = doc.add_table(rows=4, cols=2)
+    info_table.style = 'Table Grid' # Optional: Apply a table style
+
+    # Populate the table cells according to the corrected layout
+    # Row 0: UID (Col 1), Orientation Date (Col 2)
+    uid_cell_col1 = info_table.cell(0, 0)
+    uid_paragraph_col1_r0 = uid_cell_col1.paragraphs[0]
+    uid_paragraph_col1_r0.text = "" # Clear existing text
+    run = uid_paragraph_col1_r0.add_run("UID:")
+    run.bold = True
+    uid_paragraph_col1_r0.add_run(f" {uid}")
+
+    orientation_cell_col2 = info_table.cell(0, 1)
+    orientation_paragraph_col2_r0 = orientation_cell_col2.paragraphs[0]
+    orientation_paragraph_col2_r0.text = "" # Clear existing text
+    run = orientation_paragraph_col2_r0.add_run("Orientation Date:")
+    run.bold = True
+    orientation_paragraph_col2_r0.add_run(f" {orientation}")
+
+
+    # Row 1: Name (Col 1), Total Credits (Col 2)
+    name_cell_col1 = info_table.cell(1, 0)
+    name_paragraph_col1_r1 = name_cell_col1.paragraphs[0]
+    name_paragraph_col1_r1.text = "" # Clear existing text
+    run = name_paragraph_col1_r1.add_run("Name:")
+    run.bold = True
+    name_paragraph_col1_r1.add_run(f" {name}")
+
+    credits_cell_col2 = info_table.cell(1, 1)
+    credits_paragraph_col2_r1 = credits_cell_col2.paragraphs[0]
+    credits_paragraph_col2_r1.text = "" # Clear existing text
+    run = credits_paragraph_col2_r1.add_run("Total Credits:")
+    run.bold = True
+    credits_paragraph_col2_r1.add_run(f" {total_credits}")
+
+
+    # Row 2: Major (Col 1), Advisor (Col 2)
+    major_cell_col1 = info_table.cell(2, 0)
+    major_paragraph_col1_r2 = major_cell_col1.paragraphs[0]
+    major_paragraph_col1_r2.text = "" # Clear existing text
+    run = major_paragraph_col1_r2.add_run("Major:")
+    run.bold = True
+    major_paragraph_col1_r2.add_run(f" {major}")
+
+    advisor_cell_col2 = info_table.cell(2, 1)
+    advisor_paragraph_col2_r2 = advisor_cell_col2.paragraphs[0]
+    advisor_paragraph_col2_r2.text = "" # Clear existing text
+    run = advisor_paragraph_col2_r2.add_run("Advisor:")
+    run.bold = True
+    advisor_paragraph_col2_r2.add_run(f" {advisor}")
+
+    # Row 3: Comments (Col 1), Blank Cell (Col 2)
+    comments_cell_col1 = info_table.cell(3, 0)
+    comments_paragraph_col1_r3 = comments_cell_col1.paragraphs[0]
+    comments_paragraph_col1_r3.text = "" # Clear existing text
+    run = comments_paragraph_col1_r3.add_run("Comments:")
+    run.bold = True
+    comments_paragraph_col1_r3.add_run(f" {comments}")
+
+    info_table.cell(3, 1).text = "" # Keep this cell blank as requested
+
+
+    # Adjust text alignment and vertical alignment for the info table
+    for row in info_table.rows:
+        for cell in row.cells:
+            for paragraph in cell.paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT # Align text to the left
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER # Vertically center text
+
+    # Set minimum row height for the info table
+    info_table_row_height_cm = 0.8 # Adjust this value as needed
+    for row in info_table.rows:
+        row.height = Cm(info_table_row_height_cm)
+        row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
+
+
+    # --- Section 2: Course Table ---
+    doc.add_paragraph("\n") # Spacing after info table
+    doc.add_paragraph("Courses:").bold = True
+
+    if courses: # Check if the 'courses' list is not empty after filtering
+        # Add 1 for the header row
+        # Ensure the table has exactly len(courses) + 1 rows (header + one row per course)
+        table = doc.add_table(rows=len(courses) + 1, cols=5)
+        table.style = 'Table Grid'
+
+        hdr = table.rows[0].cells
+        hdr[0].text = 'CRN'
+        hdr[1].text = 'Course'
+        hdr[2].text = 'Instructor'
+        hdr[3].text = 'Crdt'
+        hdr[4].text = 'Attribute'
+
+        for cell in hdr:
+            for paragraph in cell.paragraphs:
+                 for run in paragraph.runs:
+                     run.bold = True
+                 paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+        # Iterate over the filtered 'courses' list and populate table rows
+        for i, course in enumerate(courses):
+            # Use i + 1 to get the correct row index after the header row
+            row = table.rows[i + 1].cells
+            row[0].text = course.get("CRN")
+            row[1].text = course.get("Course")
+            row[2].text = course.get("Instructor")
+            row[3].text = course.get("Credits")
+            row[4].text = "" # Attribute was not extracted, leave blank or add placeholder
+
+            for cell in row:
                 for paragraph in cell.paragraphs:
-                     for run in paragraph.runs:
-                         run.bold = True
-                     paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
 
-            # Iterate over the filtered 'courses' list and populate table rows
-            for i, course in enumerate(courses):
-                # Use i + 1 to get the correct row index after the header row
-                row = table.rows[i + 1].cells
-                row[0].text = course.get("CRN")
-                row[1].text = course.get("Course")
-                row[2].text = course.get("Instructor")
-                row[3].text = course.get("Credits")
-                row[4].text = "" # Attribute was not extracted, leave blank or add placeholder
-
-                for cell in row:
-                    for paragraph in cell.paragraphs:
-                        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-            # Set course table column widths
-            try:
-                # Calculate available page width (roughly)
-                total_page_width_inches = (doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin) / 914400.0 # Convert EMUs to inches
-                # Assign widths (adjust these proportions as needed)
-                col_widths_inches = [1.0, 1.8, 1.8, 0.7, 1.2] # Example widths in inches
-                total_assigned_width = sum(col_widths_inches)
-
-                # Scale widths if the sum exceeds the page width (optional, but helps prevent overflow)
-                if total_assigned_width > total_page_width_inches:
-                    scale_factor = total_page_width_inches / total_assigned_width
-                    col_widths_inches = [w * scale_factor for w in col_widths_inches]
-
-                for j in range(min(len(col_widths_inches), len(table.columns))):
-                     table.columns[j].width = Inches(col_widths_inches[j])
-
-            except Exception as e:
-                 print(f"An error occurred while setting course table column widths: {e}")
-
-            # Set minimum row height for the course table (including header row)
-            course_table_row_height_cm = 0.8 # Increased height
-            for row in table.rows:
-                 row.height = Cm(course_table_row_height_cm)
-                 row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
+        # Set course table column widths
+        try:
+            # Calculate available page width (roughly)
+            total_page_width_inches = (doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin) / 914400.0 # Convert EMUs to inches
+            # Assign widths (adjust these proportions as needed)
+            col_widths_inches = [1.0, 1.8, 1.8, 0.7, 1.2] # Example widths in inches
+            total_assigned_width = sum(col_widths_inches)
 
+            # Scale widths if the sum exceeds the page width (optional, but helps prevent overflow)
+            if total_assigned_width > total_page_width_inches:
+                scale_factor = total_page_width_inches / total_assigned_width
+                col_widths_inches = [w * scale_factor for w in col_widths_inches]
 
-        else:
-             doc.add_paragraph("No courses found.")
+            for j in range(min(len(col_widths_inches), len(table.columns))):
+                 table.columns[j].width = Inches(col_widths_inches[j])
+
+        except Exception as e:
+             logger.warning("An error occurred while setting course table column widths: %s", e)
+
+        # Set minimum row height for the course table (including header row)
+        course_table_row_height_cm = 0.8 # Increased height
+        for row in table.rows:
+             row.height = Cm(course_table_row_height_cm)
+             row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
+
+
+    else:
+         doc.add_paragraph("No courses found.")
 
 
-        doc.add_paragraph("\n") # Spacing
+    doc.add_paragraph("\n") # Spacing
 
-        # --- Section 3: Weekly Schedule Grid ---
-        doc.add_paragraph("SID:").bold = True # Add "SID:" heading (UID is often called SID)
+    # --- Section 3: Weekly Schedule Grid ---
+    doc.add_paragraph("SID:").bold = True # Add "SID:" heading (UID is often called SID)
 
-        # Add 1 to the number of columns for the Time column
-        schedule_table = doc.add_table(rows=len(STANDARD_TIMES) + 1, cols=len(STANDARD_DAYS) + 1)
-        schedule_table.style = 'Table Grid'
-        schedule_table.alignment = WD_TABLE_ALIGNMENT.CENTER
+    # Add 1 to the number of columns for the Time column
+    schedule_table = doc.add_table(rows=len(STANDARD_TIMES) + 1, cols=len(STANDARD_DAYS) + 1)
+    schedule_table.style = 'Table Grid'
+    schedule_table.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    # Set header row (Time | Mon | Tue | ...)
+    header_cells = schedule_table.rows[0].cells
+    header_cells[0].text = "Time"
+    for d_idx, day in enumerate(STANDARD_DAYS):
+        header_cells[d_idx + 1].text = day
+
+    for cell in header_cells:
+        for paragraph in cell.paragraphs:
+            for run in paragraph.runs:
+                 run.bold = True
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+
+    # Populate the schedule table with data from schedule_grid_data
+    for t_idx, time_slot in enumerate(STANDARD_TIMES):
+        row_cells = schedule_table.rows[t_idx + 1].cells # +1 to skip header row
+        row_cells[0].text = time_slot # First cell is the time slot
 
-        # Set header row (Time | Mon | Tue | ...)
-        header_cells = schedule_table.rows[0].cells
-        header_cells[0].text = "Time"
         for d_idx, day in enumerate(STANDARD_DAYS):
-            header_cells[d_idx + 1].text = day
+            # Get the course data for this time and day from our grid
+            course_entry = schedule_grid_data.get(time_slot, {}).get(day, "")
 
-        for cell in header_cells:
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                     run.bold = True
+            # Check for Common Hour time slots and days
+            is_common_hour_time = time_slot in COMMON_HOUR_TIMES
+            is_common_hour_day = day in COMMON_HOUR_DAYS
+
+            if is_common_hour_time and is_common_hour_day:
+                row_cells[d_idx + 1].text = "COMMON HOUR" # Set text to COMMON HOUR
+                # shade_cell(row_cells[d_idx + 1], "D3D3D3") # Shade the cell gray - Commented out as requested
+            else:
+                row_cells[d_idx + 1].text = course_entry # Populate day cells with extracted course data
+
+            # Center text and vertically align in data cells
+            for paragraph in row_cells[d_idx + 1].paragraphs:
                 paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            row_cells[d_idx + 1].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+    # Set schedule table column widths
+    try:
+        total_page_width_inches = (doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin) / 914400.0
+        num_cols = len(STANDARD_DAYS) + 1
+        if num_cols > 0:
+             # Assign a fixed width to the time column and distribute the rest
+             time_col_width_inches = 1.5
+             if num_cols > 1:
+                schedule_table.columns[0].width = Inches(time_col_width_inches)
+                remaining_width_inches = total_page_width_inches - time_col_width_inches
+                day_column_width_inches = remaining_width_inches / (num_cols - 1)
+
+                # Ensure day column width is not negative or zero
+                day_column_width_inches = max(0.1, day_column_width_inches)
+
+                for j in range(1, num_cols):
+                    schedule_table.columns[j].width = Inches(day_column_width_inches)
+             elif num_cols == 1:
+                 schedule_table.columns[0].width = Inches(total_page_width_inches) # Should not happen with standard days
 
+    except Exception as e:
+         logger.warning("An error occurred while setting schedule table column widths: %s", e)
+
+    # Set minimum row height for the schedule grid table
+    schedule_table_row_height_cm = 1.0 # Increased height
+    for row in schedule_table.rows:
+        row.height = Cm(schedule_table_row_height_cm)
+        row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
+
+
+    doc.add_paragraph("\n\n") # Spacing
+
+
+    # --- Section 4: Office Use Only ---
+    doc.add_paragraph("OFFICE USE ONLY").bold = True
+
+    # Using paragraphs for simplicity, adjust if sample doc uses a table
+    doc.add_paragraph("Creator: _________________ Tally Sheet Updated:____ Hold:_____")
+    doc.add_paragraph("M PMT: _________________")
+    doc.add_paragraph("Reviser: _________________ No Changes Made: ______ Schedule Changes Made (if Applicable): ______ Tally Sheet Updated: ______")
+
+    return doc
+
+
+## --- Skeleton rendering ---
+# Most of the document is identical for every student: the static paragraphs,
+# table structure, styles, widths, row heights and the OFFICE USE ONLY section.
+# That structure is built once with render_document and kept as a parsed
+# document.xml tree plus every other package part, already compressed. Each
+# conversion deep-copies the tree, fills in only the variable text and course
+# rows, and zips it with the unchanged parts; only document.xml is compressed
+# per conversion. A document filled for an earlier version of the same
+# student's record can instead be patched where the records differ (see
+# patch_document).
+
+DOCUMENT_PART_NAME = "word/document.xml"
+# Patching only pays for its lookup and parse when course rows are edited in
+# place: inserting or removing rows costs about as much as filling afresh. An
+# earlier document is patched only when the course count is unchanged and
+# SequenceMatcher rates the course lists at least this similar.
+PATCH_MIN_COURSE_SIMILARITY = 0.5
+
+# Text of the run holding each info-table value, as (row, column) -> record key
+INFO_TABLE_VALUE_CELLS = {
+    (0, 0): "uid",
+    (0, 1): "orientation",
+    (1, 0): "name",
+    (1, 1): "total_credits",
+    (2, 0): "major",
+    (2, 1): "advisor",
+    (3, 0): "comments",
+}
+INFO_TABLE_VALUE_RUN_INDEX = 2 # Each labelled cell holds: empty run, bold label run, value run
+
+class PackagePart(NamedTuple):
+    """A DOCX package member, deflated once and written as is into every package."""
+    name: bytes
+    crc: int
+    size: int
+    data: bytes
+
+
+def _deflate(data):
+    # Raw deflate stream, as stored in ZIP members
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def package_part(name, data):
+    return PackagePart(name.encode(), zlib.crc32(data), len(data), _deflate(data))
+
+
+class DocxSkeleton(NamedTuple):
+    """The pre-rendered document: a document.xml tree to copy and the other package parts."""
+    document: object
+    parts: list # [PackagePart] in package order; None marks document.xml
+    no_courses_paragraph: object
+
+
+def _blank_record():
+    """A record with empty values and one empty course, which renders every fixed structure."""
+    return {
+        "name": "",
+        "uid": "",
+        "major": "",
+        "advisor": "",
+        "comments": "",
+        "orientation": "",
+        "courses": [{"CRN": "", "Course": "", "Instructor": "", "Credits": ""}],
+        "total_credits": "",
+        "schedule_grid_data": {time: {day: "" for day in STANDARD_DAYS} for time in STANDARD_TIMES},
+    }
 
-        # Populate the schedule table with data from schedule_grid_data
-        for t_idx, time_slot in enumerate(STANDARD_TIMES):
-            row_cells = schedule_table.rows[t_idx + 1].cells # +1 to skip header row
-            row_cells[0].text = time_slot # First cell is the time slot
 
-            for d_idx, day in enumerate(STANDARD_DAYS):
-                # Get the course data for this time and day from our grid
-                course_entry = schedule_grid_data.get(time_slot, {}).get(day, "")
+@lru_cache(maxsize=1)
+def load_skeleton():
+    """Builds the DocxSkeleton once per process."""
+    buffer = BytesIO()
+    render_document(_blank_record()).save(buffer)
+    parts = []
+    document = None
+    with ZipFile(buffer) as package:
+        for member in package.namelist():
+            if member == DOCUMENT_PART_NAME:
+                document = parse_xml(package.read(member))
+                parts.append(None)
+            else:
+                parts.append(package_part(member, package.read(member)))
 
-                # Check for Common Hour time slots and days
-                is_common_hour_time = time_slot in ["12:15-12:35 pm", "12:45-1:10 pm"]
-                is_common_hour_day = day in ["Mon", "Wed", "Fri"]
+    # The paragraph render_document adds in place of the course table when there are no courses
+    placeholder = Document()
+    no_courses_paragraph = placeholder.add_paragraph("No courses found.")._p
+    return DocxSkeleton(document, parts, no_courses_paragraph)
 
-                if is_common_hour_time and is_common_hour_day:
-                    row_cells[d_idx + 1].text = "COMMON HOUR" # Set text to COMMON HOUR
-                    # shade_cell(row_cells[d_idx + 1], "D3D3D3") # Shade the cell gray - Commented out as requested
-                else:
-                    row_cells[d_idx + 1].text = course_entry # Populate day cells with extracted course data
 
-                # Center text and vertically align in data cells
-                for paragraph in row_cells[d_idx + 1].paragraphs:
-                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                row_cells[d_idx + 1].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+# Clark-notation tags of the elements looked up in every filled row
+W_TC, W_P, W_R = qn('w:tc'), qn('w:p'), qn('w:r')
 
-        # Set schedule table column widths
-        try:
-            total_page_width_inches = (doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin) / 914400.0
-            num_cols = len(STANDARD_DAYS) + 1
-            if num_cols > 0:
-                 # Assign a fixed width to the time column and distribute the rest
-                 time_col_width_inches = 1.5
-                 if num_cols > 1:
-                    schedule_table.columns[0].width = Inches(time_col_width_inches)
-                    remaining_width_inches = total_page_width_inches - time_col_width_inches
-                    day_column_width_inches = remaining_width_inches / (num_cols - 1)
-
-                    # Ensure day column width is not negative or zero
-                    day_column_width_inches = max(0.1, day_column_width_inches)
-
-                    for j in range(1, num_cols):
-                        schedule_table.columns[j].width = Inches(day_column_width_inches)
-                 elif num_cols == 1:
-                     schedule_table.columns[0].width = Inches(total_page_width_inches) # Should not happen with standard days
 
-        except Exception as e:
-             print(f"An error occurred while setting schedule table column widths: {e}")
+def _cell_runs(tr):
+    """Returns the first run of the first paragraph of each cell in a table row."""
+    return [tc.find(W_P).find(W_R) for tc in tr.iterchildren(W_TC)]
+
+
+def skeleton_tables():
+    """The skeleton's (info, course, schedule) tables, for copying unfilled rows and cells from."""
+    return load_skeleton().document.find(qn('w:body')).findall(qn('w:tbl'))
+
+
+@lru_cache(maxsize=None)
+def skeleton_schedule_text(t_idx, d_idx):
+    """Text of an unfilled schedule cell in the skeleton."""
+    return _cell_runs(skeleton_tables()[2].findall(qn('w:tr'))[t_idx + 1])[d_idx + 1].text
 
-        # Set minimum row height for the schedule grid table
-        schedule_table_row_height_cm = 1.0 # Increased height
-        for row in schedule_table.rows:
-            row.height = Cm(schedule_table_row_height_cm)
-            row.height_rule = 2 # 2 means at least, 1 means exact, 0 means auto
 
+def fill_info_table(tbl, record, keys=None):
+    """Sets the value run of each labelled info-table cell (only those for ``keys``, if given)."""
+    rows = tbl.findall(qn('w:tr'))
+    for (r_idx, c_idx), key in INFO_TABLE_VALUE_CELLS.items():
+        if keys is not None and key not in keys:
+            continue
+        tc = rows[r_idx].findall(qn('w:tc'))[c_idx]
+        value_run = tc.find(qn('w:p')).findall(qn('w:r'))[INFO_TABLE_VALUE_RUN_INDEX]
+        value_run.text = f" {record[key]}"
 
-        doc.add_paragraph("\n\n") # Spacing
 
+def course_row(template_row, course):
+    """Returns a copy of the course table's template row filled with one course."""
+    tr = deepcopy(template_row)
+    values = [course.get("CRN"), course.get("Course"), course.get("Instructor"), course.get("Credits"), ""]
+    for run, value in zip(_cell_runs(tr), values):
+        if value:
+            run.text = value
+    return tr
 
-        # --- Section 4: Office Use Only ---
-        doc.add_paragraph("OFFICE USE ONLY").bold = True
 
-        # Using paragraphs for simplicity, adjust if sample doc uses a table
-        doc.add_paragraph("Creator: _________________ Tally Sheet Updated:____ Hold:_____")
-        doc.add_paragraph("M PMT: _________________")
-        doc.add_paragraph("Reviser: _________________ No Changes Made: ______ Schedule Changes Made (if Applicable): ______ Tally Sheet Updated: ______")
+def fill_course_table(tbl, courses):
+    """Replaces the course table's template row with one row per course."""
+    template_row = tbl.findall(qn('w:tr'))[1]
+    for course in courses:
+        template_row.addprevious(course_row(template_row, course))
+    tbl.remove(template_row)
 
-        name = name.replace(" ", "_")
-        ## --- Save the document ---
-        doc.save(name)
-        print(f"\nGenerated Word document: {OUTPUT_FILENAME}")
+
+def fill_schedule_table(tbl, schedule_grid_data):
+    """Writes the course entries into the schedule grid cells (COMMON HOUR cells are fixed)."""
+    rows = tbl.findall(qn('w:tr'))
+    for t_idx, time_slot in enumerate(STANDARD_TIMES):
+        slot_entries = schedule_grid_data.get(time_slot, {})
+        is_common_hour_time = time_slot in COMMON_HOUR_TIMES
+        runs = None
+        for d_idx, day in enumerate(STANDARD_DAYS):
+            course_entry = slot_entries.get(day, "")
+            if not course_entry or (is_common_hour_time and day in COMMON_HOUR_DAYS):
+                continue
+            if runs is None:
+                runs = _cell_runs(rows[t_idx + 1])
+            runs[d_idx + 1].text = course_entry
+
+
+def fill_document(record):
+    """Fills a copy of the skeleton's document.xml with a student record and returns its root element."""
+    skeleton = load_skeleton()
+    document = deepcopy(skeleton.document)
+    info_table, course_table, schedule_table = document.find(qn('w:body')).findall(qn('w:tbl'))
+
+    fill_info_table(info_table, record)
+    if record["courses"]:
+        fill_course_table(course_table, record["courses"])
+    else:
+        course_table.addprevious(deepcopy(skeleton.no_courses_paragraph))
+        course_table.getparent().remove(course_table)
+    fill_schedule_table(schedule_table, record["schedule_grid_data"])
+    return document
+
+
+def worth_patching(previous, record):
+    """Whether a document filled for the ``previous`` record is cheaper to patch into ``record`` than to fill afresh."""
+    if len(previous["courses"]) != len(record["courses"]):
+        return False
+    if previous["courses"] == record["courses"]:
+        return True
+    matcher = SequenceMatcher(None, [tuple(course.items()) for course in previous["courses"]],
+                              [tuple(course.items()) for course in record["courses"]], autojunk=False)
+    return matcher.ratio() >= PATCH_MIN_COURSE_SIMILARITY
+
+
+def patch_document(document, previous, record):
+    """Updates a document filled for the ``previous`` record so it renders ``record``, and returns it.
+
+    Only what differs is rewritten: changed info-table values, changed,
+    added or removed course rows, and changed schedule cells. The result is
+    the same document fill_document(record) builds. A change between no
+    courses and some courses swaps the whole table, so it is filled afresh.
+    """
+    if bool(previous["courses"]) != bool(record["courses"]):
+        return fill_document(record)
+    skeleton_courses = skeleton_tables()[1]
+    tables = document.find(qn('w:body')).findall(qn('w:tbl'))
+    info_table, schedule_table = tables[0], tables[-1]
+
+    changed_keys = {key for key in INFO_TABLE_VALUE_CELLS.values() if f"{previous[key]}" != f"{record[key]}"}
+    if changed_keys:
+        fill_info_table(info_table, record, changed_keys)
+
+    if previous["courses"] != record["courses"]:
+        template_row = skeleton_courses.findall(qn('w:tr'))[1]
+        rows = tables[1].findall(qn('w:tr'))[1:1 + len(previous["courses"])]
+        matcher = SequenceMatcher(None, [tuple(course.items()) for course in previous["courses"]],
+                                  [tuple(course.items()) for course in record["courses"]], autojunk=False)
+        # Back to front, so the rows before each edit are still where they were
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            new_rows = [course_row(template_row, course) for course in record["courses"][j1:j2]]
+            if i1 < len(rows):
+                for tr in new_rows:
+                    rows[i1].addprevious(tr)
+            else:
+                for tr in reversed(new_rows):
+                    rows[-1].addnext(tr)
+            for tr in rows[i1:i2]:
+                tables[1].remove(tr)
+
+    previous_grid = previous["schedule_grid_data"]
+    rows = None
+    for t_idx, time_slot in enumerate(STANDARD_TIMES):
+        old_entries = previous_grid.get(time_slot, {})
+        new_entries = record["schedule_grid_data"].get(time_slot, {})
+        if old_entries == new_entries:
+            continue
+        rows = rows or schedule_table.findall(qn('w:tr'))
+        cells = rows[t_idx + 1].findall(W_TC)
+        is_common_hour_time = time_slot in COMMON_HOUR_TIMES
+        for d_idx, day in enumerate(STANDARD_DAYS):
+            course_entry = new_entries.get(day, "")
+            if course_entry == old_entries.get(day, "") or (is_common_hour_time and day in COMMON_HOUR_DAYS):
+                continue
+            # An emptied cell goes back to the skeleton's text
+            cells[d_idx + 1].find(W_P).find(W_R).text = course_entry or skeleton_schedule_text(t_idx, d_idx)
+    return document
+
+
+def _dos_date_time():
+    year, month, day, hour, minute, second = localtime()[:6]
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+def write_package(parts):
+    """Assembles a ZIP package from PackageParts whose data is already deflated."""
+    dos_date, dos_time = _dos_date_time()
+    chunks = []
+    directory = []
+    offset = 0
+    for part in parts:
+        fields = (20, 0, 8, dos_time, dos_date, part.crc, len(part.data), part.size, len(part.name))
+        header = struct.pack("<I5H3I2H", 0x04034b50, *fields, 0)
+        directory.append(struct.pack("<I6H3I5H2I", 0x02014b50, 20, *fields, 0, 0, 0, 0, 0, offset) + part.name)
+        chunks += [header, part.name, part.data]
+        offset += len(header) + len(part.name) + len(part.data)
+    directory = b"".join(directory)
+    end = struct.pack("<I4H2IH", 0x06054b50, 0, 0, len(parts), len(parts), len(directory), offset, 0)
+    return b"".join(chunks) + directory + end
+
+
+def document_part(docx_bytes):
+    """Reads the document.xml part back out of a DOCX package."""
+    with ZipFile(BytesIO(docx_bytes)) as package:
+        return package.read(DOCUMENT_PART_NAME)
+
+
+def save_docx(document):
+    """Serializes a filled document.xml root into a DOCX package alongside the skeleton's other parts."""
+    skeleton = load_skeleton()
+    document_xml = etree.tostring(document, encoding="UTF-8", standalone=True)
+    return write_package([
+        package_part(DOCUMENT_PART_NAME, document_xml) if part is None else part
+        for part in skeleton.parts
+    ])
+
+
+def render_docx(record):
+    """Renders a student record to DOCX bytes by filling a copy of the skeleton."""
+    return save_docx(fill_document(record))
+
+
+## --- Output ---
+# Characters that are not safe in file and archive member names
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def output_filename(record):
+    """Builds the DOCX file name for a student record: Name_UID.docx."""
+    stem = "_".join(part for part in (record["name"], record["uid"]) if part)
+    stem = UNSAFE_FILENAME_CHARS.sub("_", stem).strip("._")
+    return f"{stem or 'schedule'}.docx"
+
+
+def unique_filename(filename, used_names):
+    """Returns filename, or filename with a "_2", "_3", ... suffix if it is already in used_names.
+
+    The returned name is added to used_names.
+    """
+    candidate = filename
+    stem, dot, extension = filename.rpartition(".")
+    if not dot:
+        stem, extension = filename, ""
+    counter = 2
+    while candidate in used_names:
+        candidate = f"{stem}_{counter}{dot}{extension}"
+        counter += 1
+    used_names.add(candidate)
+    return candidate
+
+
+class ConversionResult(NamedTuple):
+    """A converted document plus the structured warnings collected while extracting it.
+
+    ``timings`` maps each conversion stage (load, extraction, grid_mapping,
+    render, save) to the seconds it took; ``grid`` is the student's
+    ScheduleGrid, for cohort-wide occupancy, and ``record`` the extracted
+    student record the document was rendered from.
+    """
+    filename: str
+    docx_bytes: bytes
+    warnings: list
+    timings: dict
+    grid: ScheduleGrid
+    record: dict
+
+
+def convert_record(df_raw, previous=None, layout=None, text_rows=None):
+    """Extracts and renders one student's sheet, returning a ConversionResult whose timings start after loading.
+
+    ``previous``, if given, is called with the student's UID and returns the
+    (record, document.xml bytes) of an earlier conversion of that student, or
+    None; the earlier document is then patched instead of filled from scratch
+    when worth_patching says the change is small. The lookup counts towards
+    the render stage.
+    ``layout`` is the sheet's LayoutProfile, detected when not given, and
+    ``text_rows`` its sheet_text_rows if already made.
+    """
+    start = perf_counter()
+    if text_rows is None:
+        text_rows = sheet_text_rows(df_raw)
+    if layout is None:
+        layout = detect_layout(df_raw, text_rows)
+    warnings = []
+    record = extract_details(df_raw, warnings, layout, text_rows)
+    extracted = perf_counter()
+    grid = build_schedule_grid(df_raw, warnings, layout)
+    record["schedule_grid_data"] = schedule_grid_entries(grid)
+    record["warnings"] = warnings
+    mapped = perf_counter()
+    prior = previous(record["uid"]) if previous is not None and record["uid"] else None
+    if prior is not None and worth_patching(prior[0], record):
+        previous_record, previous_document = prior
+        document = patch_document(parse_xml(previous_document), previous_record, record)
     else:
-        print("\nWord document not generated due to errors in data loading or processing.")
-    return name
+        document = fill_document(record)
+    rendered = perf_counter()
+    docx_bytes = save_docx(document)
+    saved = perf_counter()
+    filename = output_filename(record)
+    logger.debug("Generated Word document: %s", filename)
+    timings = {
+        "extraction": extracted - start,
+        "grid_mapping": mapped - extracted,
+        "render": rendered - mapped,
+        "save": saved - rendered,
+    }
+    return ConversionResult(filename, docx_bytes, warnings, timings, grid, record)
+
+
+def convert(xlsx_bytes, previous=None, filename=None):
+    """Converts an uploaded workbook (or CSV/TSV export) into a ConversionResult without touching the filesystem.
+
+    ``previous`` looks up earlier conversions to patch (see convert_record);
+    ``filename`` is the upload's name, a hint for detecting the input format.
+    Raises ValueError if the workbook can't be loaded.
+    """
+    start = perf_counter()
+    df_raw = load_raw_sheet(xlsx_bytes, filename)
+    load_seconds = perf_counter() - start
+    if df_raw is None:
+        raise ValueError("Could not load the workbook; Word document not generated.")
+    result = convert_record(df_raw, previous)
+    return result._replace(timings={"load": load_seconds, **result.timings})
+
+
+def split_student_blocks(df_raw, layout=DEFAULT_LAYOUT):
+    """Splits a sheet into one frame per student, one block per student info line of the layout.
+
+    Each block is re-indexed so its info line sits on the same row as the
+    first block's, which keeps the extraction row ranges valid for every
+    block. Title rows above the first info line that are repeated above a
+    later one go with that later block; where they aren't repeated, the block
+    starts at its info line and is padded with blank rows above it. A sheet
+    with a single info line is returned whole; a sheet without one gives an
+    empty list.
+    """
+    if layout.student_info_col >= df_raw.shape[1]:
+        return []
+    labels = df_raw.iloc[:, layout.student_info_col]
+    is_anchor = labels.notna() & labels.astype(str).str.contains(layout.student_info_anchor, regex=False)
+    anchor_rows = np.flatnonzero(is_anchor.to_numpy())
+    if len(anchor_rows) <= 1:
+        return [df_raw] if len(anchor_rows) else []
+    # Rows above the first info line (titles, blank rows) are layout, not a student
+    lead = int(anchor_rows[0])
+    titles = df_raw.iloc[:lead].reset_index(drop=True)
+    starts = [0]
+    for previous, anchor in zip(anchor_rows[:-1].tolist(), anchor_rows[1:].tolist()):
+        above = df_raw.iloc[anchor - lead:anchor].reset_index(drop=True)
+        starts.append(anchor - lead if anchor - lead > previous and above.equals(titles) else anchor)
+    ends = starts[1:] + [len(df_raw)]
+    blocks = []
+    for start, end, anchor in zip(starts, ends, anchor_rows.tolist()):
+        block = df_raw.iloc[start:end].reset_index(drop=True)
+        if anchor - start < lead:
+            # Titles only appear once: shift the block down onto the first block's rows
+            block.index += lead - (anchor - start)
+            block = block.reindex(range(len(block) + lead - (anchor - start)))
+        blocks.append(block)
+    # Only the last block can run into the sheet's row bound
+    for block in blocks[:-1]:
+        truncated = {bound: count for bound, count in block.attrs.get(SHEET_TRUNCATED, {}).items() if bound != "rows"}
+        block.attrs = {key: value for key, value in block.attrs.items() if key != SHEET_TRUNCATED}
+        if truncated:
+            block.attrs[SHEET_TRUNCATED] = truncated
+    return blocks
+
+
+def load_students(xlsx_bytes, filename=None):
+    """Loads a cohort workbook once and splits it into (label, sheet, layout, text_rows) tuples, one per student.
+
+    The label is the sheet title plus " #n" on sheets holding several
+    students. Each sheet's layout is detected once and used to split and
+    extract all of its students. ``text_rows`` are the sheet_text_rows made
+    for detection, passed on for the first student of each sheet (whose
+    block starts at the top of the sheet) and None for the rest. Sheets
+    without a student info line are skipped; if no sheet has one, the first
+    sheet is returned as a single student so its warnings are reported. A
+    CSV/TSV export is a single sheet titled after ``filename``. Returns
+    (students, load_seconds).
+
+    Raises ValueError if the workbook can't be loaded.
+    """
+    start = perf_counter()
+    try:
+        sheets = load_sheets(xlsx_bytes, filename=filename)
+    except (WorkbookTooLarge, TimeoutError):
+        raise
+    except Exception as e:
+        logger.warning("An error occurred while loading the Excel file: %s", e)
+        sheets = []
+    load_seconds = perf_counter() - start
+    if not sheets:
+        raise ValueError("Could not load the workbook; Word documents not generated.")
+
+    students = []
+    layouts = []
+    for title, df_raw in sheets:
+        text_rows = sheet_text_rows(df_raw)
+        layout = detect_layout(df_raw, text_rows)
+        layouts.append((layout, text_rows))
+        blocks = split_student_blocks(df_raw, layout)
+        for number, block in enumerate(blocks, 1):
+            label = title if len(blocks) == 1 else f"{title} #{number}"
+            students.append((label, block, layout, text_rows[:len(block)] if number == 1 else None))
+    return students or [(*sheets[0], *layouts[0])], load_seconds
+
+
+def convert_workbook(xlsx_bytes, previous=None, filename=None):
+    """Converts every student in a cohort workbook: each sheet, and each stacked student block in a sheet.
+
+    The workbook is parsed once for all students (see load_students). Returns
+    a list of (label, ConversionResult) in workbook order; the load time is
+    shared evenly between the students' timings. ``previous`` looks up
+    earlier conversions to patch (see convert_record).
+
+    Raises ValueError if the workbook can't be loaded.
+    """
+    students, load_seconds = load_students(xlsx_bytes, filename)
+    results = []
+    for label, block, layout, text_rows in students:
+        result = convert_record(block, previous, layout, text_rows)
+        results.append((label, result._replace(timings={"load": load_seconds / len(students), **result.timings})))
+    return results
+
+
+## --- Preview ---
+# Record fields returned by preview (the rest are document placeholders)
+PREVIEW_FIELDS = ["name", "uid", "major", "courses", "total_credits", "schedule_grid_data", "layout", "warnings"]
+
+
+def preview_record(record):
+    return {field: record[field] for field in PREVIEW_FIELDS}
+
+
+def preview(xlsx_bytes, filename=None):
+    """Extracts a workbook's student record without rendering a document, for validating uploads.
+
+    Returns a JSON-ready dict of PREVIEW_FIELDS. Raises ValueError if the
+    workbook can't be loaded.
+    """
+    df_raw = load_raw_sheet(xlsx_bytes, filename)
+    if df_raw is None:
+        raise ValueError("Could not load the workbook; Word document not generated.")
+    return preview_record(extract_student(df_raw))
+
+
+def preview_workbook(xlsx_bytes, filename=None):
+    """Like preview for every student in a cohort workbook; returns a list of (label, preview dict)."""
+    students, _ = load_students(xlsx_bytes, filename)
+    return [(label, preview_record(extract_student(block, layout, text_rows)))
+            for label, block, layout, text_rows in students]
+
+
+## --- Warm-up ---
+def warm_up_workbook():
+    """Returns the xlsx bytes of a one-student workbook in the expected layout, with one scheduled course."""
+    header_row = SCHEDULE_DATA_ROWS.start - 1
+    width = max(SCHEDULE_DAYS_COL_INDEX, SCHEDULE_TIME_COL_INDEX, SCHEDULE_COURSE_COL_INDEX) + 1
+    rows = [[None] * width for _ in range(header_row + 2)]
+    rows[STUDENT_INFO_SEARCH_ROWS.start][STUDENT_INFO_COL_INDEX] = f"{STUDENT_INFO_ANCHOR} Warm Up (U00000000)"
+    rows[STUDENT_INFO_SEARCH_ROWS.start + 2][STUDENT_INFO_COL_INDEX] = MAJOR_LABEL
+    rows[STUDENT_INFO_SEARCH_ROWS.start + 2][MAJOR_VALUE_COL_INDEX] = "Undeclared"
+    rows[header_row][:len(COURSE_HEADER_KEYWORDS)] = COURSE_HEADER_KEYWORDS
+    rows[header_row][SCHEDULE_DAYS_COL_INDEX] = "Days"
+    rows[header_row][SCHEDULE_TIME_COL_INDEX] = "Time"
+    rows[header_row + 1][:len(COURSE_HEADER_KEYWORDS)] = [10000, "WARM 100", "Instructor", 3]
+    rows[header_row + 1][SCHEDULE_DAYS_COL_INDEX] = "MW"
+    rows[header_row + 1][SCHEDULE_TIME_COL_INDEX] = STANDARD_TIMES[0]
+    return write_workbook(rows)
+
+
+def warm_up():
+    """Runs every conversion stage once on warm_up_workbook, so imports, caches, the layout profiles and the document skeleton are ready before real work arrives."""
+    result = convert(warm_up_workbook())
+    logger.debug("Warm-up conversion produced %s (%d bytes)", result.filename, len(result.docx_bytes))
+
+
+def convert_bytes(xlsx_bytes):
+    """Converts an uploaded workbook into (filename, docx_bytes) without touching the filesystem.
+
+    Raises ValueError if the workbook can't be loaded.
+    """
+    result = convert(xlsx_bytes)
+    return result.filename, result.docx_bytes
+
+
+def converter(file_contents):
+    """Converts a workbook and saves the document into the working directory, returning its file name.
+
+    Kept for scripts that used the original file-writing interface; prefer convert_bytes.
+    """
+    filename, docx_bytes = convert_bytes(file_contents)
+    with open(filename, "wb") as output_file:
+        output_file.write(docx_bytes)
+    return filename
@@ -0,0 +1,35 @@
+"""Production server settings: gunicorn --config gunicorn.conf.py "main:create_app()"
+
+The app is imported and warmed up once in the master (preload_app) and shared
+with the web workers by fork. Each web worker then starts and warms its own
+conversion pool before it accepts connections, so the first requests after a
+scale-out don't pay import, template or process start-up costs.
+"""
+import os
+
+from resources import WEB_CONCURRENCY
+from uploads import MAX_INFLIGHT_REQUESTS
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = True
+
+# Conversions run on each web worker's process pool (sized from CPU and memory,
+# see resources.conversion_worker_count), so one threaded web worker is enough
+# to keep the CPUs busy; more web workers split the pool between them.
+workers = WEB_CONCURRENCY
+worker_class = "gthread"
+# Room for every admitted conversion request plus health checks and job polls
+threads = int(os.environ.get("WEB_THREADS", 0)) or MAX_INFLIGHT_REQUESTS + 4
+
+# Streamed batch downloads can legitimately take a while
+timeout = int(os.environ.get("WEB_TIMEOUT", 300))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    # Runs in each web worker after fork and before it accepts connections
+    from main import warm_up_worker
+    warm_up_worker()
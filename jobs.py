@@ -0,0 +1,292 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from archive import batch_members, stream_zip
+from cache import get_cache
+from metrics import STAGE_SECONDS, record_results
+from storage import LocalConnections
+from workers import get_pool
+
+
+# Where job state (jobs.sqlite3) and finished archives are kept
+JOBS_DIR = os.environ.get("CONVERSION_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "generatedoc-jobs")
+# How long a finished job and its archive are kept before they expire
+JOB_TTL_SECONDS = int(os.environ.get("CONVERSION_JOB_TTL_SECONDS", 3600))
+# Number of jobs converted at once; later jobs wait in the queue. Each running
+# job feeds its files to the shared ConversionPool.
+JOB_WORKERS = int(os.environ.get("CONVERSION_JOB_WORKERS", 2))
+# Each process owning jobs refreshes its heartbeat this often; an owner whose
+# heartbeat is older than JOB_OWNER_TIMEOUT_SECONDS is taken to have exited
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("CONVERSION_JOB_HEARTBEAT_SECONDS", 15))
+JOB_OWNER_TIMEOUT_SECONDS = 4 * JOB_HEARTBEAT_SECONDS
+
+JOB_DB_NAME = "jobs.sqlite3"
+JOB_RESULT_SUFFIX = ".zip"
+
+# Job and file states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    finished REAL,
+    expires REAL,
+    error TEXT,
+    owner INTEGER,
+    owner_id TEXT
+);
+-- One row per process that has owned jobs. Pids are reused across restarts
+-- (gunicorn workers often get the same ones), so owners are told apart by a
+-- random id and judged alive by their heartbeat.
+CREATE TABLE IF NOT EXISTS job_owners (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    filename TEXT,
+    error TEXT,
+    warnings TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+class JobStore:
+    """SQLite-backed record of conversion jobs, with each finished archive stored next to the database.
+
+    The database lives in ``jobs_dir`` so that several server processes
+    sharing the directory see the same jobs. Finished jobs expire
+    ``ttl_seconds`` after they finish; expired rows and archives are removed by
+    expire(), which runs whenever a job is created.
+
+    Each store registers this process as a job owner under a fresh
+    ``owner_id``; heartbeat() must be called every JOB_HEARTBEAT_SECONDS
+    (JobRunner does) for its jobs to count as alive.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, ttl_seconds=JOB_TTL_SECONDS):
+        self.jobs_dir = jobs_dir
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._connections = LocalConnections(os.path.join(jobs_dir, JOB_DB_NAME))
+        self.owner_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.executescript(JOB_SCHEMA)
+            # Databases created before owners were tracked by id
+            if "owner_id" not in {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner_id TEXT")
+            db.execute("INSERT INTO job_owners VALUES (?, ?, ?, ?)", (self.owner_id, os.getpid(), now, now))
+
+    def _connect(self):
+        return self._connections.get()
+
+    def result_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id + JOB_RESULT_SUFFIX)
+
+    def create(self, sources):
+        """Records a new queued job for the given source file names and returns its id."""
+        self.expire()
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, created, owner, owner_id) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, time.time(), os.getpid(), self.owner_id),
+            )
+            db.executemany(
+                "INSERT INTO job_files (job_id, position, source, status) VALUES (?, ?, ?, ?)",
+                [(job_id, position, source, QUEUED) for position, source in enumerate(sources)],
+            )
+        return job_id
+
+    def set_status(self, job_id, status, error=None):
+        finished = expires = None
+        if status in (DONE, FAILED):
+            finished = time.time()
+            expires = finished + self.ttl_seconds
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, error = ? WHERE id = ?",
+                (status, finished, expires, error, job_id),
+            )
+
+    def set_file_result(self, job_id, position, result):
+        """Records the FileResult for one file of a job."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE job_files SET status = ?, filename = ?, error = ?, warnings = ? WHERE job_id = ? AND position = ?",
+                (FAILED if result.error else DONE, result.filename, result.error,
+                 json.dumps(result.warnings), job_id, position),
+            )
+
+    def get(self, job_id):
+        """Returns a JSON-ready description of a job and its files, or None if it doesn't exist or has expired."""
+        db = self._connect()
+        job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None or (job["expires"] is not None and job["expires"] <= time.time()):
+            return None
+        files = db.execute(
+            "SELECT * FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+        ).fetchall()
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "created": job["created"],
+            "finished": job["finished"],
+            "expires": job["expires"],
+            "error": job["error"],
+            "files": [
+                {
+                    "source": file["source"],
+                    "status": file["status"],
+                    "filename": file["filename"],
+                    "error": file["error"],
+                    "warnings": json.loads(file["warnings"]) if file["warnings"] else [],
+                }
+                for file in files
+            ],
+        }
+
+    def expire(self):
+        """Deletes jobs whose TTL has passed, along with their archives."""
+        now = time.time()
+        with self._connect() as db:
+            expired = [row["id"] for row in db.execute("SELECT id FROM jobs WHERE expires <= ?", (now,))]
+            db.execute("DELETE FROM jobs WHERE expires <= ?", (now,))
+        for job_id in expired:
+            try:
+                os.unlink(self.result_path(job_id))
+            except FileNotFoundError:
+                pass
+        return len(expired)
+
+    def heartbeat(self):
+        """Marks this process's jobs as still owned."""
+        with self._connect() as db:
+            db.execute("UPDATE job_owners SET heartbeat = ? WHERE id = ?", (time.time(), self.owner_id))
+
+    def abandon_unfinished(self):
+        """Marks jobs whose owning process has exited before finishing them as failed.
+
+        Uploads are only held in the memory of the process that accepted the
+        job, so those jobs can never complete. An owner has exited when its
+        heartbeat is older than JOB_OWNER_TIMEOUT_SECONDS (jobs from before
+        owners were tracked have none).
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM job_owners WHERE heartbeat < ?", (now - JOB_OWNER_TIMEOUT_SECONDS,))
+            orphaned = [
+                row["id"]
+                for row in db.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?)"
+                    " AND (owner_id IS NULL OR owner_id NOT IN (SELECT id FROM job_owners))",
+                    (QUEUED, RUNNING),
+                )
+            ]
+            db.executemany(
+                "UPDATE jobs SET status = ?, finished = ?, expires = ?, error = ? WHERE id = ?",
+                [(FAILED, now, now + self.ttl_seconds, "Server restarted before the job finished.", job_id)
+                 for job_id in orphaned],
+            )
+        return len(orphaned)
+
+
+class JobRunner:
+    """Runs conversion jobs in the background on a bounded number of threads.
+
+    A job's files are converted on the shared ConversionPool (with the
+    conversion cache), each file's result is recorded as it arrives, and the
+    archive is written to a temporary file and moved into place when complete.
+    """
+
+    def __init__(self, store, max_workers=JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="conversion-job")
+        # Keeps this process's jobs from being taken for orphans by other processes
+        self._stopped = threading.Event()
+        threading.Thread(target=self._heartbeat, name="conversion-job-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                self.store.heartbeat()
+            except sqlite3.Error:
+                # A busy database only delays the beat; the owner timeout allows for a few misses
+                pass
+
+    def submit(self, files, on_finish=None):
+        """Queues (source_name, file_contents) pairs as a new job and returns the job id.
+
+        ``on_finish``, if given, is called once the job has finished or failed.
+        """
+        job_id = self.store.create([source for source, _ in files])
+        self._executor.submit(self._run, job_id, files, on_finish)
+        return job_id
+
+    def _run(self, job_id, files, on_finish=None):
+        try:
+            self._convert(job_id, files)
+        finally:
+            if on_finish is not None:
+                on_finish()
+
+    def _convert(self, job_id, files):
+        self.store.set_status(job_id, RUNNING)
+        fd, temp_path = tempfile.mkstemp(dir=self.store.jobs_dir, suffix=".tmp")
+        try:
+            results = get_pool().iter_convert(files, cache=get_cache())
+            with os.fdopen(fd, "wb") as zip_file:
+                members = batch_members(self._record(job_id, record_results(results)))
+                for chunk in stream_zip(members, on_zip_time=lambda seconds: STAGE_SECONDS.observe(seconds, stage="zip")):
+                    zip_file.write(chunk)
+            os.replace(temp_path, self.store.result_path(job_id))
+        except Exception as e:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            self.store.set_status(job_id, FAILED, error=f"{type(e).__name__}: {e}")
+            return
+        self.store.set_status(job_id, DONE)
+
+    def _record(self, job_id, results):
+        for position, result in enumerate(results):
+            self.store.set_file_result(job_id, position, result)
+            yield result
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Returns the process-wide JobRunner, creating its store on first use."""
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            store = JobStore()
+            store.abandon_unfinished()
+            _default_runner = JobRunner(store)
+        return _default_runner
@@ -1,11 +1,102 @@
 import os
-import shutil
-import tempfile
-from converter import converter
-from flask import Flask, request, send_file, after_this_request, render_template
-from zipfile import ZipFile
+import threading
+from archive import batch_members, stream_zip
+from cache import get_cache
+from converter import warm_up
+from jobs import DONE, get_job_runner
+from metrics import (
+    METRICS_CONTENT_TYPE, REGISTRY, REJECTED_REQUESTS, STAGE_SECONDS, RequestTimer, cache_collector,
+    record_results, record_upload,
+)
+from uploads import (
+    RETRY_AFTER_SECONDS, UPLOAD_MAX_FILE_BYTES, UPLOAD_MAX_FILES, UPLOAD_MAX_REQUEST_BYTES, SpoolingRequest,
+    get_limiter, oversized_uploads, read_uploads, upload_size,
+)
+from workers import get_pool
+from flask import Flask, abort, g, request, Response, jsonify, render_template, send_file, url_for
 
 app = Flask(__name__)
+# Uploaded files past the spool threshold go to temporary files, and
+# requests over the size cap are refused with 413 before being parsed
+app.request_class = SpoolingRequest
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_REQUEST_BYTES
+
+REGISTRY.add_collector(cache_collector(get_cache()))
+
+# Set once this process's conversion pool is up and warmed; /readyz reports it
+ready = threading.Event()
+
+def create_app():
+    """App factory for WSGI servers: warms up conversions in this process and returns the app.
+
+    Under gunicorn with preload_app this runs once in the master, so web
+    workers fork with every dependency imported and the document skeleton
+    built; each then starts its own pool in warm_up_worker (see gunicorn.conf.py).
+    """
+    warm_up()
+    return app
+
+def warm_up_worker():
+    """Starts this process's conversion pool (each worker runs a warm-up conversion) and marks it ready."""
+    get_pool()
+    # Also recovers jobs left unfinished by a previous process before any request arrives
+    get_job_runner()
+    ready.set()
+
+def observe_zip_time(seconds):
+    STAGE_SECONDS.observe(seconds, stage="zip")
+
+@app.before_request
+def start_timer():
+    g.timer = RequestTimer()
+
+@app.after_request
+def add_server_timing(response):
+    # Streamed bodies are still being produced at this point, so their
+    # conversion stages are only reported through /metrics
+    timer = g.get("timer")
+    if timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+def reject(response):
+    REJECTED_REQUESTS.inc(status=str(response.status_code))
+    abort(response)
+
+@app.errorhandler(413)
+def request_too_large(error):
+    # Raised by Werkzeug when the body is over MAX_CONTENT_LENGTH
+    REJECTED_REQUESTS.inc(status="413")
+    return f"Uploads are limited to {UPLOAD_MAX_REQUEST_BYTES} bytes per request", 413
+
+def accept_uploads(endpoint):
+    """Checks the request's uploaded files against the limits and admits them.
+
+    Returns (files, release): ``files`` are (source_name, uploads.Upload) pairs,
+    read only as their conversions are queued, and release must be called once
+    the files' conversions are finished. Aborts with 400/413, or 503 with Retry-After
+    when the server already has as much work in flight as it accepts.
+    """
+    uploaded_files = request.files.getlist('file')
+    if not uploaded_files or uploaded_files[0].filename == '':
+        abort(Response("No files uploaded", 400))
+    if len(uploaded_files) > UPLOAD_MAX_FILES:
+        reject(Response(f"At most {UPLOAD_MAX_FILES} files can be uploaded at once", 413))
+    oversized = oversized_uploads(uploaded_files)
+    if oversized:
+        reject(Response(f"Files larger than {UPLOAD_MAX_FILE_BYTES} bytes: {', '.join(oversized)}", 413))
+
+    # Admit the batch before taking it, so refused work is dropped with the request
+    release = get_limiter().acquire(sum(upload_size(uploaded_file) for uploaded_file in uploaded_files))
+    if release is None:
+        reject(Response("Server is busy, please retry", 503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)}))
+    try:
+        files = read_uploads(uploaded_files)
+    except Exception:
+        release()
+        raise
+    record_upload(endpoint, files)
+    return files, release
 
 @app.route('/')
 def index():
@@ -13,39 +104,98 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload():
-    uploaded_files = request.files.getlist('file')
-    if not uploaded_files or uploaded_files[0].filename == '':
-        return "No files uploaded", 400
-
-    # Create a temp directory to store converted files
-    temp_dir = tempfile.mkdtemp()
-    output_files = []
-
-    for uploaded_file in uploaded_files:
-        file_contents = uploaded_file.read()
-        # 👇 Pass original filename for context, if useful
-        output_path = converter(file_contents)
-        output_files.append(output_path)
-
-    # Create zip file
-    zip_path = os.path.join(temp_dir, "converted_files.zip")
-    with ZipFile(zip_path, 'w') as zipf:
-        for file_path in output_files:
-            zipf.write(file_path, arcname=os.path.basename(file_path))
-
-    @after_this_request
-    def cleanup(response):
-        try:
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            app.logger.error(f"Error cleaning up temp files: {e}")
-        return response
-
-    return send_file(
-        zip_path,
-        as_attachment=True,
-        download_name="converted_files.zip"
+    files, release = accept_uploads("upload")
+
+    # Files are queued on the worker pool a window at a time as the archive streams;
+    # results come back in upload order. Workbooks converted before are served
+    # from the cache without reconverting.
+    # Cohort workbooks hold several students (a sheet each, or stacked blocks); each gets its own document
+    cohort = request.form.get('cohort') in ('1', 'on', 'true')
+    try:
+        with g.timer.phase("queue"):
+            results = get_pool().iter_convert(files, cache=get_cache(), cohort=cohort)
+    except Exception:
+        release()
+        raise
+
+    # Stream the zip: each document is sent as soon as its conversion finishes
+    response = Response(
+        stream_zip(batch_members(record_results(results)), on_zip_time=observe_zip_time),
+        mimetype="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="converted_files.zip"'},
     )
+    # The batch stays in flight until the archive has been sent (or the client went away)
+    response.call_on_close(release)
+    return response
+
+@app.route('/preview', methods=['POST'])
+def preview():
+    files, release = accept_uploads("preview")
+    # Extraction and grid mapping only: shows what the documents would contain without rendering them
+    cohort = request.form.get('cohort') in ('1', 'on', 'true')
+    try:
+        with g.timer.phase("extract"):
+            previews = get_pool().preview_many(files, cohort=cohort)
+    finally:
+        release()
+    return jsonify(files=previews)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    files, release = accept_uploads("jobs")
+
+    # Convert in the background; the client polls the job instead of holding this request open.
+    # Queued jobs count as in flight, since their uploads are held until they run.
+    try:
+        with g.timer.phase("queue"):
+            job_id = get_job_runner().submit(files, on_finish=release)
+    except Exception:
+        release()
+        raise
+    return jsonify(id=job_id, status_url=url_for('job_status', job_id=job_id)), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return "Job not found or expired", 404
+    if job["status"] == DONE:
+        job["result_url"] = url_for('job_result', job_id=job_id)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    store = get_job_runner().store
+    job = store.get(job_id)
+    if job is None:
+        return "Job not found or expired", 404
+    if job["status"] != DONE:
+        return f"Job is {job['status']}", 409
+    result_path = store.result_path(job_id)
+    if not os.path.exists(result_path):
+        return "Job not found or expired", 404
+    return send_file(result_path, mimetype="application/zip", as_attachment=True,
+                     download_name="converted_files.zip")
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and answering
+    return "ok"
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: conversions are warmed up, so traffic won't pay cold-start costs
+    if not ready.is_set():
+        return Response("warming up", 503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return "ready"
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
 
 if __name__ == '__main__':
+    # Development server; production runs under gunicorn (see gunicorn.conf.py).
+    # With the reloader only the child process serves requests, so only it starts a pool.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_worker()
     app.run(debug=True)
@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Histogram bucket upper bounds
+STAGE_SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+FILES_PER_REQUEST_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+FILE_BYTES_BUCKETS = [4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Counts of observations per bucket (cumulative on output), plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = list(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += count
+                yield self.name + "_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text exposition format.
+
+    ``collectors`` are callables returning extra (name, kind, documentation,
+    value) tuples read at scrape time, for values kept elsewhere such as the
+    conversion cache statistics.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, buckets, labelnames=()):
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            for name, kind, documentation, value in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """Accumulates named phase durations for one request, rendered as a Server-Timing header value."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def server_timing(self):
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+## --- Conversion metrics ---
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "generatedoc_stage_seconds", "Time spent in each conversion stage.", STAGE_SECONDS_BUCKETS, ["stage"],
+)
+FILES_PER_REQUEST = REGISTRY.histogram(
+    "generatedoc_files_per_request", "Files uploaded per conversion request.", FILES_PER_REQUEST_BUCKETS, ["endpoint"],
+)
+INPUT_BYTES = REGISTRY.histogram(
+    "generatedoc_input_bytes", "Size of each uploaded workbook.", FILE_BYTES_BUCKETS,
+)
+OUTPUT_BYTES = REGISTRY.histogram(
+    "generatedoc_output_bytes", "Size of each generated document.", FILE_BYTES_BUCKETS,
+)
+CONVERSIONS = REGISTRY.counter(
+    "generatedoc_conversions_total", "Files converted, by outcome (converted or error).", ["outcome"],
+)
+REJECTED_REQUESTS = REGISTRY.counter(
+    "generatedoc_rejected_requests_total", "Conversion requests refused by the upload limits, by status code.", ["status"],
+)
+
+
+def record_upload(endpoint, files):
+    """Records the size of an incoming batch of (source_name, file_contents) pairs."""
+    FILES_PER_REQUEST.observe(len(files), endpoint=endpoint)
+    for _, contents in files:
+        INPUT_BYTES.observe(len(contents))
+
+
+def record_results(results):
+    """Passes FileResults through, recording their stage timings, output sizes and outcomes."""
+    for result in results:
+        if result.error:
+            CONVERSIONS.inc(outcome="error")
+        else:
+            CONVERSIONS.inc(outcome="converted")
+            OUTPUT_BYTES.observe(len(result.data))
+        for stage, seconds in result.timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        yield result
+
+
+def cache_collector(cache):
+    """Returns a Registry collector exposing a ConversionCache's statistics."""
+    def collect():
+        stats = cache.stats()
+        return [
+            ("generatedoc_cache_hits_total", "counter", "Conversions served from the cache.", stats["hits"]),
+            ("generatedoc_cache_misses_total", "counter", "Cache lookups that found nothing.", stats["misses"]),
+            ("generatedoc_cache_evictions_total", "counter", "Entries evicted from the memory tier.", stats["memory_evictions"]),
+            ("generatedoc_cache_memory_bytes", "gauge", "Bytes held by the memory tier.", stats["memory_bytes"]),
+            ("generatedoc_cache_disk_bytes", "gauge", "Bytes held by the disk tier.", stats["disk_bytes"]),
+        ]
+    return collect
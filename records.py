@@ -0,0 +1,266 @@
+"""Persistent store of extracted student records, for re-rendering and cohort queries without re-parsing workbooks.
+
+When RECORD_STORE_PATH is set, every conversion (web, jobs and cli.py) saves
+the student record it extracted into that SQLite database, keyed by UID and a
+hash of the input workbook, together with the document.xml rendered from it.
+Documents can then be rebuilt from the store after a layout change, aggregate
+questions answered with SQL, and a re-uploaded student's document patched
+where their record changed instead of rendered from scratch:
+
+    python records.py summary
+    python records.py render --output-dir schedules/ [UID ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+from converter import conversion_version, document_part, output_filename, render_docx, unique_filename
+from storage import LocalConnections
+
+
+# SQLite database the extracted records are saved to; unset disables the store
+RECORD_STORE_PATH = os.environ.get("RECORD_STORE_PATH") or None
+
+# One row per student per input workbook; a re-converted workbook replaces its
+# rows. ``student`` is the cohort block label ('' for single-student workbooks).
+RECORD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    uid TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    student TEXT NOT NULL,
+    source TEXT,
+    name TEXT NOT NULL,
+    major TEXT NOT NULL,
+    advisor TEXT NOT NULL,
+    comments TEXT NOT NULL,
+    orientation TEXT NOT NULL,
+    total_credits INTEGER NOT NULL,
+    course_count INTEGER NOT NULL,
+    schedule TEXT NOT NULL,
+    warnings TEXT NOT NULL,
+    converter_version TEXT NOT NULL,
+    stored REAL NOT NULL,
+    document BLOB,
+    PRIMARY KEY (uid, input_hash, student)
+);
+CREATE INDEX IF NOT EXISTS students_by_uid ON students (uid, stored);
+CREATE INDEX IF NOT EXISTS students_by_input ON students (input_hash);
+CREATE TABLE IF NOT EXISTS courses (
+    uid TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    student TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    crn TEXT NOT NULL,
+    course TEXT NOT NULL,
+    instructor TEXT NOT NULL,
+    credits INTEGER NOT NULL,
+    PRIMARY KEY (uid, input_hash, student, position),
+    FOREIGN KEY (uid, input_hash, student) REFERENCES students (uid, input_hash, student) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS courses_by_section ON courses (course, crn);
+-- Each student's most recently stored record
+CREATE VIEW IF NOT EXISTS latest_students AS
+    SELECT students.* FROM students
+    JOIN (SELECT uid, MAX(stored) AS stored FROM students GROUP BY uid) USING (uid, stored);
+CREATE VIEW IF NOT EXISTS latest_courses AS
+    SELECT c.* FROM courses AS c JOIN latest_students USING (uid, input_hash, student);
+"""
+
+
+def input_hash(file_contents):
+    """SHA-256 of an input workbook's bytes."""
+    return hashlib.sha256(file_contents).hexdigest()
+
+
+class RecordStore:
+    """SQLite store of extracted student records.
+
+    Several processes (the conversion workers) write to the same database,
+    through storage.LocalConnections (WAL mode, a connection per thread).
+    """
+
+    def __init__(self, path=RECORD_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connections = LocalConnections(path)
+        with self._connect() as db:
+            db.executescript(RECORD_SCHEMA)
+            # Stores created before documents were kept
+            if "document" not in {row["name"] for row in db.execute("PRAGMA table_info(students)")}:
+                db.execute("ALTER TABLE students ADD COLUMN document BLOB")
+
+    def _connect(self):
+        return self._connections.get()
+
+    def put(self, file_hash, results, source=None):
+        """Saves the (student_label, ConversionResult) pairs of one input workbook, replacing earlier ones."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM students WHERE input_hash = ?", (file_hash,))
+            for label, result in results:
+                record = result.record
+                key = (record["uid"], file_hash, label or "")
+                db.execute(
+                    "INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*key, source, record["name"], record["major"], record["advisor"], record["comments"],
+                     record["orientation"], record["total_credits"], len(record["courses"]),
+                     json.dumps(record["schedule_grid_data"]), json.dumps(record["warnings"]),
+                     conversion_version(), now, zlib.compress(document_part(result.docx_bytes), 1)),
+                )
+                db.executemany(
+                    "INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*key, position, course["CRN"], course["Course"], course["Instructor"], int(course["Credits"]))
+                     for position, course in enumerate(record["courses"])],
+                )
+
+    def get(self, uid, file_hash=None):
+        """Returns a student's stored record (the latest, or the one from the given input), or None."""
+        db = self._connect()
+        if file_hash is None:
+            row = db.execute("SELECT * FROM latest_students WHERE uid = ?", (uid,)).fetchone()
+        else:
+            row = db.execute(
+                "SELECT * FROM students WHERE uid = ? AND input_hash = ? ORDER BY stored DESC", (uid, file_hash)
+            ).fetchone()
+        return self._record(row) if row is not None else None
+
+    def previous_render(self, uid):
+        """Returns the (record, document.xml bytes) of a student's latest conversion by this conversion version, or None.
+
+        Passed to converter.convert as ``previous``, so a re-uploaded
+        student's document is patched instead of rendered from scratch. The
+        version (converter.conversion_version) covers the layout profiles, so
+        documents built under other profiles are never patched.
+        """
+        row = self._connect().execute(
+            "SELECT * FROM students WHERE uid = ? AND converter_version = ? AND document IS NOT NULL"
+            " ORDER BY stored DESC LIMIT 1",
+            (uid, conversion_version()),
+        ).fetchone()
+        if row is None:
+            return None
+        return self._record(row), zlib.decompress(row["document"])
+
+    def latest(self):
+        """Yields every student's latest stored record."""
+        db = self._connect()
+        for row in db.execute("SELECT * FROM latest_students ORDER BY uid").fetchall():
+            yield self._record(row)
+
+    def _record(self, row):
+        courses = self._connect().execute(
+            "SELECT crn, course, instructor, credits FROM courses"
+            " WHERE uid = ? AND input_hash = ? AND student = ? ORDER BY position",
+            (row["uid"], row["input_hash"], row["student"]),
+        ).fetchall()
+        # The same shape converter.extract_student returns, so it can be rendered directly
+        return {
+            "name": row["name"],
+            "uid": row["uid"],
+            "major": row["major"],
+            "advisor": row["advisor"],
+            "comments": row["comments"],
+            "orientation": row["orientation"],
+            "courses": [
+                {"CRN": crn, "Course": course, "Instructor": instructor, "Credits": str(credits)}
+                for crn, course, instructor, credits in courses
+            ],
+            "total_credits": row["total_credits"],
+            "schedule_grid_data": json.loads(row["schedule"]),
+            "warnings": json.loads(row["warnings"]),
+        }
+
+    def query(self, sql, params=()):
+        """Runs a SELECT against the store (tables students and courses, views latest_students and latest_courses) as a DataFrame."""
+        return pd.read_sql_query(sql, self._connect(), params=params)
+
+    def credit_loads(self):
+        """Number of students at each total credit load (latest records)."""
+        return self.query(
+            "SELECT total_credits, COUNT(*) AS students FROM latest_students GROUP BY total_credits ORDER BY total_credits"
+        )
+
+    def majors(self):
+        """Number of students per major (latest records)."""
+        return self.query(
+            "SELECT major, COUNT(*) AS students FROM latest_students GROUP BY major ORDER BY students DESC, major"
+        )
+
+    def section_fill(self):
+        """Number of students enrolled in each section (course and CRN; latest records)."""
+        return self.query(
+            "SELECT course, crn, COUNT(*) AS students FROM latest_courses"
+            " GROUP BY course, crn ORDER BY students DESC, course, crn"
+        )
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_record_store():
+    """Returns the process-wide RecordStore, or None when RECORD_STORE_PATH isn't set."""
+    global _default_store
+    if RECORD_STORE_PATH is None:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = RecordStore()
+        return _default_store
+
+
+def summary(store, args):
+    for title, frame in (("Credit loads", store.credit_loads()), ("Majors", store.majors()),
+                         ("Section fill", store.section_fill())):
+        print(f"{title}:")
+        print(frame.to_string(index=False) if len(frame) else "  (none)")
+        print()
+    return 0
+
+
+def render(store, args):
+    """Re-renders the latest stored record of each given UID (or every student) into the output directory."""
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.uids:
+        records = [(uid, store.get(uid)) for uid in args.uids]
+    else:
+        records = ((record["uid"], record) for record in store.latest())
+    used_names = set()
+    missing = 0
+    for uid, record in records:
+        if record is None:
+            print(f"warning: no stored record for {uid}", file=sys.stderr)
+            missing += 1
+            continue
+        filename = unique_filename(output_filename(record), used_names)
+        with open(os.path.join(args.output_dir, filename), "wb") as output_file:
+            output_file.write(render_docx(record))
+    print(f"{len(used_names)} documents written to {args.output_dir}", file=sys.stderr)
+    return 1 if missing else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", default=RECORD_STORE_PATH, help="record store database (default: $RECORD_STORE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="print credit loads, majors and section fill").set_defaults(func=summary)
+    render_parser = commands.add_parser("render", help="re-render documents from stored records")
+    render_parser.add_argument("uids", nargs="*", help="students to render (default: all)")
+    render_parser.add_argument("--output-dir", required=True, help="directory to write the documents to")
+    render_parser.set_defaults(func=render)
+    args = parser.parse_args(argv)
+    if not args.store or not os.path.exists(args.store):
+        parser.error("no record store; pass --store or set RECORD_STORE_PATH")
+    return args.func(RecordStore(args.store), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
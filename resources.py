@@ -0,0 +1,99 @@
+import math
+import os
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# Memory budgeted per conversion worker process (its peak RSS on large workbooks)
+CONVERSION_WORKER_MEMORY_BYTES = int(os.environ.get("CONVERSION_WORKER_MEMORY_BYTES", 256 * 1024 * 1024))
+# Memory kept for each web process itself (Flask, upload buffers, the cache's memory tier)
+WEB_PROCESS_MEMORY_BYTES = int(os.environ.get("WEB_PROCESS_MEMORY_BYTES", 256 * 1024 * 1024))
+# Web server processes (gunicorn workers); each runs its own conversion pool
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+# Address space each conversion worker may map (RLIMIT_AS); past it, allocations
+# fail with MemoryError and only the file being converted fails. Address space
+# runs well above RSS (shared libraries, thread stacks, allocator arenas), hence
+# the margin over CONVERSION_WORKER_MEMORY_BYTES. 0 disables the cap.
+CONVERSION_MEMORY_LIMIT_BYTES = int(os.environ.get("CONVERSION_MEMORY_LIMIT_BYTES", 4 * CONVERSION_WORKER_MEMORY_BYTES))
+
+# cgroup files holding the container's CPU quota and memory limit (v2, then v1)
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_MEMORY_MAX = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+# cgroup v1 reports "no limit" as a huge number rather than "max"
+UNLIMITED_MEMORY_BYTES = 1 << 60
+
+
+def _read_cgroup(path):
+    try:
+        with open(path) as cgroup_file:
+            return cgroup_file.read().split()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """CPUs this process can use: the container's CPU quota when there is one, else the CPUs it may run on."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _read_cgroup(CGROUP_CPU_MAX)
+    if quota is None:
+        v1_quota, v1_period = _read_cgroup(CGROUP_V1_CPU_QUOTA), _read_cgroup(CGROUP_V1_CPU_PERIOD)
+        if v1_quota and v1_period:
+            quota = v1_quota + v1_period
+    if quota and len(quota) == 2 and quota[0] not in ("max", "-1"):
+        cpus = min(cpus, max(1, math.ceil(int(quota[0]) / int(quota[1]))))
+    return cpus
+
+
+def available_memory():
+    """Bytes of memory this process can use: the container's memory limit when there is one, else physical memory.
+
+    Returns None if neither can be determined.
+    """
+    for path in CGROUP_MEMORY_MAX:
+        limit = _read_cgroup(path)
+        if limit and limit[0].isdigit() and int(limit[0]) < UNLIMITED_MEMORY_BYTES:
+            return int(limit[0])
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def conversion_worker_count(web_processes=WEB_CONCURRENCY):
+    """Conversion processes each web process should run.
+
+    One per CPU, capped by how many fit in memory next to the web processes,
+    and shared between the web processes; at least one.
+    """
+    workers = available_cpus()
+    memory = available_memory()
+    if memory is not None:
+        workers = min(workers, (memory - web_processes * WEB_PROCESS_MEMORY_BYTES) // CONVERSION_WORKER_MEMORY_BYTES)
+    return max(1, workers // max(1, web_processes))
+
+
+def limit_memory(limit=CONVERSION_MEMORY_LIMIT_BYTES):
+    """Caps this process's address space at ``limit`` bytes (never above the hard limit).
+
+    Returns whether a cap was applied; it isn't when ``limit`` is 0 or the
+    platform has no RLIMIT_AS.
+    """
+    if not limit or resource is None or not hasattr(resource, "RLIMIT_AS"):
+        return False
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        return False
+    return True
@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+
+
+# Seconds a write waits for another process's transaction before failing
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+
+def connect(path):
+    """Opens a connection to the SQLite database at path with the settings every store uses.
+
+    Several processes (web workers, conversion workers) share each database,
+    so it runs in WAL mode, where readers don't block the writer. Commits are
+    durable at checkpoints rather than every commit: what the stores hold is
+    re-extracted, or reported as failed, after a crash.
+    """
+    db = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA foreign_keys = ON")
+    return db
+
+
+class LocalConnections:
+    """One connection per thread to the SQLite database at ``path``.
+
+    sqlite3 connections can't be shared between threads, so get() opens one
+    for each thread that asks and returns it on later calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect(self.path)
+        return db
@@ -0,0 +1,137 @@
+from datetime import time
+from io import BytesIO
+from zipfile import ZipFile
+
+import docx
+import numpy as np
+import pandas as pd
+import pytest
+from docx.oxml.parser import parse_xml
+from lxml import etree
+
+from benchmarks.workbooks import make_workbook
+from converter import (
+    DEFAULT_LAYOUT, DOCUMENT_PART_NAME, convert, document_part, fill_document, package_part, parse_time,
+    parse_time_range, patch_document, split_student_blocks, write_package,
+)
+
+
+## --- Time parsing ---
+@pytest.mark.parametrize("time_str, expected", [
+    ("8:25 am", time(8, 25)),
+    ("8:25am", time(8, 25)),
+    ("12:15 pm", time(12, 15)),
+    ("12:05 am", time(0, 5)),
+    ("1:10 PM", time(13, 10)),
+    ("14:30", time(14, 30)),
+    ("14:30 pm", time(14, 30)),
+    ("9:00", time(9, 0)),
+    (" 9:5 ", time(9, 5)),
+])
+def test_parse_time(time_str, expected):
+    assert parse_time(time_str) == expected
+
+
+@pytest.mark.parametrize("time_str", ["", "   ", "noon", "9:60", "24:00", "9", None, 930])
+def test_parse_time_rejects(time_str):
+    assert parse_time(time_str) is None
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # A start without am/pm takes the end's...
+    ("1:20 ", "2:15 pm", (time(13, 20), time(14, 15))),
+    ("8:25", "9:20 am", (time(8, 25), time(9, 20))),
+    # ...unless that would put it after the end
+    ("11:10", "12:05 pm", (time(11, 10), time(12, 5))),
+    # Starts with their own meridian, and ranges without any, are left alone
+    ("11:10 am", "12:05 pm", (time(11, 10), time(12, 5))),
+    ("9:00", "9:55", (time(9, 0), time(9, 55))),
+    ("9:00", "noon", (time(9, 0), None)),
+])
+def test_parse_time_range(start, end, expected):
+    assert parse_time_range(start, end) == expected
+
+
+## --- Cohort splitting ---
+ANCHOR = DEFAULT_LAYOUT.student_info_anchor
+COLUMN = DEFAULT_LAYOUT.student_info_col
+TITLES = [["Schedule report"], []]
+
+
+def sheet(rows, width=COLUMN + 2):
+    """A raw sheet frame from rows of cell values, padded with NaN to width."""
+    return pd.DataFrame([row + [np.nan] * (width - len(row)) for row in rows], dtype=object)
+
+
+def student(number):
+    """A student's rows: the info line, then two rows with values in the column after it."""
+    return [[np.nan] * COLUMN + [f"{ANCHOR} Student {number}"]] + [
+        [np.nan] * (COLUMN + 1) + [f"{number}{row}"] for row in "ab"
+    ]
+
+
+def block_values(block):
+    return block.iloc[:, COLUMN + 1].dropna().tolist()
+
+
+def test_split_student_blocks_with_titles_once():
+    blocks = split_student_blocks(sheet(TITLES + student(1) + student(2) + student(3)))
+    assert [block_values(block) for block in blocks] == [["1a", "1b"], ["2a", "2b"], ["3a", "3b"]]
+    # Every block's info line lands on the first block's row
+    for number, block in enumerate(blocks, 1):
+        assert block.iloc[len(TITLES), COLUMN] == f"{ANCHOR} Student {number}"
+
+
+def test_split_student_blocks_with_repeated_titles():
+    blocks = split_student_blocks(sheet(TITLES + student(1) + TITLES + student(2)))
+    assert [block_values(block) for block in blocks] == [["1a", "1b"], ["2a", "2b"]]
+    for number, block in enumerate(blocks, 1):
+        assert block.iloc[0, 0] == "Schedule report"
+        assert block.iloc[len(TITLES), COLUMN] == f"{ANCHOR} Student {number}"
+        assert len(block) == len(TITLES) + 3
+
+
+def test_split_student_blocks_single_and_none():
+    single = sheet(TITLES + student(1))
+    blocks = split_student_blocks(single)
+    assert len(blocks) == 1 and blocks[0] is single
+    assert split_student_blocks(sheet(TITLES)) == []
+
+
+## --- Rendering ---
+@pytest.mark.parametrize("edited", [
+    make_workbook(0, courses=6),  # unchanged
+    make_workbook(1, courses=6),  # another student's values
+    make_workbook(0, courses=5),  # a course dropped
+    make_workbook(0, courses=7),  # a course added
+    make_workbook(0, courses=0),  # every course dropped
+])
+def test_patch_document_matches_full_render(edited):
+    original = convert(make_workbook(0, courses=6))
+    record = convert(edited).record
+    patched = patch_document(parse_xml(document_part(original.docx_bytes)), original.record, record)
+    assert etree.tostring(patched) == etree.tostring(fill_document(record))
+
+
+def test_patched_conversion_matches_full_conversion():
+    original = convert(make_workbook(0, courses=6))
+    edited = make_workbook(1, courses=6)
+    patched = convert(edited, lambda uid: (original.record, document_part(original.docx_bytes)))
+    assert document_part(patched.docx_bytes) == document_part(convert(edited).docx_bytes)
+
+
+def test_write_package_round_trips_parts():
+    parts = {"a.xml": b"<a/>" * 100, "dir/b.bin": bytes(range(256)), "empty.txt": b""}
+    package = write_package([package_part(name, data) for name, data in parts.items()])
+    with ZipFile(BytesIO(package)) as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == parts
+
+
+def test_converted_document_opens_in_python_docx():
+    result = convert(make_workbook(0))
+    with ZipFile(BytesIO(result.docx_bytes)) as package:
+        assert DOCUMENT_PART_NAME in package.namelist()
+    document = docx.Document(BytesIO(result.docx_bytes))
+    cells = [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+    assert any("BIO 100" in text for text in cells)
@@ -0,0 +1,73 @@
+from functools import partial
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+
+import main
+import uploads
+from benchmarks.workbooks import make_workbook
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = uploads.InFlightLimiter(max_requests=1, max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(main, "get_limiter", lambda: limiter)
+    return limiter
+
+
+@pytest.fixture
+def client(limiter):
+    return main.app.test_client()
+
+
+def post(client, files=None, endpoint="/upload"):
+    files = [("student.xlsx", make_workbook(0))] if files is None else files
+    data = {"file": [(BytesIO(contents), name) for name, contents in files]}
+    return client.post(endpoint, data=data, content_type="multipart/form-data")
+
+
+def test_upload_converts(client, limiter):
+    response = post(client, [(f"s{i}.xlsx", make_workbook(i)) for i in range(3)])
+    assert response.status_code == 200
+    with ZipFile(BytesIO(response.data)) as archive:
+        assert [name for name in archive.namelist() if name.endswith(".docx")] == [
+            f"Student_{i}_Example_U1000000{i}.docx" for i in range(3)
+        ]
+    response.close()
+    assert limiter.requests == 0 and limiter.bytes == 0
+
+
+def test_upload_without_files(client):
+    response = client.post("/upload", data={}, content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def test_upload_too_many_files(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_MAX_FILES", 2)
+    response = post(client, [(f"s{i}.xlsx", make_workbook(i)) for i in range(3)])
+    assert response.status_code == 413
+
+
+def test_upload_file_too_large(client, monkeypatch):
+    monkeypatch.setattr(main, "oversized_uploads", partial(uploads.oversized_uploads, max_file_bytes=1000))
+    response = post(client)
+    assert response.status_code == 413
+    assert b"student.xlsx" in response.data
+
+
+def test_upload_request_too_large(client, monkeypatch):
+    monkeypatch.setitem(main.app.config, "MAX_CONTENT_LENGTH", 1000)
+    response = post(client)
+    assert response.status_code == 413
+
+
+def test_upload_when_busy(client, limiter):
+    release = limiter.acquire(0)
+    try:
+        response = post(client)
+    finally:
+        release()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(uploads.RETRY_AFTER_SECONDS)
+    assert limiter.requests == 0
@@ -0,0 +1,149 @@
+import os
+import threading
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+
+# Largest request body accepted (Flask's MAX_CONTENT_LENGTH); larger requests get 413
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", 100 * 1024 * 1024))
+# Largest single uploaded workbook
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", 10 * 1024 * 1024))
+# Most files accepted in one request
+UPLOAD_MAX_FILES = int(os.environ.get("UPLOAD_MAX_FILES", 1000))
+# Uploaded files larger than this are spooled to a temporary file instead of held in memory
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", 512 * 1024))
+
+# Limits on work accepted at once across all requests (and queued jobs). Uploads
+# stay spooled once admitted and are only read into memory as their conversions
+# are queued, so these bound the spool space and conversions held by in-flight
+# work; requests over the limit get 503 with Retry-After.
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("MAX_INFLIGHT_REQUESTS", 16))
+MAX_INFLIGHT_BYTES = int(os.environ.get("MAX_INFLIGHT_BYTES", 256 * 1024 * 1024))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", 5))
+
+
+class UploadSpool(SpooledTemporaryFile):
+    """Spooled upload stream that can be kept open past the end of its request.
+
+    Werkzeug closes a request's files when the request ends, which is before a
+    streamed archive or a background job reads them; a ``kept`` spool ignores
+    that close and is closed by discard() instead.
+    """
+
+    kept = False
+
+    def close(self):
+        if not self.kept:
+            super().close()
+
+    def discard(self):
+        """Closes the spool, deleting its temporary file if it has one."""
+        super().close()
+
+
+class SpoolingRequest(Request):
+    """Request that spools uploaded files to disk past UPLOAD_SPOOL_BYTES and caps the number of parts."""
+
+    max_form_parts = UPLOAD_MAX_FILES + 10  # room for the non-file fields
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool(max_size=UPLOAD_SPOOL_BYTES, mode="rb+")
+
+
+class Upload:
+    """An admitted uploaded file whose contents are read when its conversion is queued.
+
+    read() returns the contents once and discards the spool; an Upload dropped
+    unread is discarded when it is garbage collected. ``len()`` is the
+    upload's size, as for file contents already in memory.
+    """
+
+    def __init__(self, stream):
+        self.size = upload_size_of(stream)
+        if isinstance(stream, UploadSpool):
+            stream.kept = True
+        self._stream = stream
+
+    def __len__(self):
+        return self.size
+
+    def read(self):
+        stream, self._stream = self._stream, None
+        if stream is None:
+            raise ValueError("Upload has already been read.")
+        try:
+            stream.seek(0)
+            return stream.read()
+        finally:
+            getattr(stream, "discard", stream.close)()
+
+    def __del__(self):
+        if self._stream is not None:
+            getattr(self._stream, "discard", self._stream.close)()
+
+
+def upload_size(uploaded_file):
+    """Size in bytes of an uploaded file's (spooled) stream, without reading it."""
+    return upload_size_of(uploaded_file.stream)
+
+
+def upload_size_of(stream):
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def oversized_uploads(uploaded_files, max_file_bytes=UPLOAD_MAX_FILE_BYTES):
+    """Returns the names of uploaded files larger than max_file_bytes."""
+    return [uploaded_file.filename for uploaded_file in uploaded_files if upload_size(uploaded_file) > max_file_bytes]
+
+
+def read_uploads(uploaded_files):
+    """Takes each uploaded file as (source_name, Upload), leaving its contents spooled until its conversion is queued."""
+    return [(uploaded_file.filename, Upload(uploaded_file.stream)) for uploaded_file in uploaded_files]
+
+
+class InFlightLimiter:
+    """Admits work while the number of admitted requests and their total bytes stay within limits.
+
+    acquire() never blocks: it returns a release callback, or None when the
+    work doesn't fit right now. A single request larger than ``max_bytes`` is
+    still admitted when nothing else is in flight, so it can't be refused forever.
+    """
+
+    def __init__(self, max_requests=MAX_INFLIGHT_REQUESTS, max_bytes=MAX_INFLIGHT_BYTES):
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        with self._lock:
+            if self.requests and (self.requests >= self.max_requests or self.bytes + size > self.max_bytes):
+                return None
+            self.requests += 1
+            self.bytes += size
+
+        released = threading.Event()
+
+        def release():
+            # Safe to call more than once (e.g. from both a response close and a generator finally)
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                self.requests -= 1
+                self.bytes -= size
+        return release
+
+
+_default_limiter = InFlightLimiter()
+
+
+def get_limiter():
+    """Returns the process-wide InFlightLimiter."""
+    return _default_limiter
@@ -0,0 +1,249 @@
+import csv
+import os
+import re
+from io import BytesIO, StringIO
+from itertools import islice
+from zipfile import BadZipFile, ZipFile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+
+# Default read bounds (rows/columns are counted from the top-left of the sheet).
+# Everything converter reads sits well inside these: the header/info rows are in
+# the first 20 rows, the schedule grid in columns A-J, and the course block runs
+# down from the header row. Cells past the bounds are never parsed.
+MAX_SHEET_ROWS = int(os.environ.get("WORKBOOK_MAX_ROWS", 1000))
+MAX_SHEET_COLS = int(os.environ.get("WORKBOOK_MAX_COLS", 26))  # A-Z
+# Cohort exports stack one block per student down a sheet, so they are read further down
+MAX_COHORT_SHEET_ROWS = int(os.environ.get("WORKBOOK_MAX_COHORT_ROWS", 100000))
+# DataFrame.attrs key set on a sheet with data past its read bounds: maps
+# "rows"/"columns" to the bound that cut it off. Only this many rows and
+# columns past each bound are looked at to tell, so blank separator rows don't
+# hide more students and the bounds still cap the parsing.
+SHEET_TRUNCATED = "truncated"
+TRUNCATION_LOOKAHEAD = int(os.environ.get("WORKBOOK_TRUNCATION_LOOKAHEAD", 50))
+# Bound on the unpacked size of an input: the sum of an xlsx package's part
+# sizes as declared in its ZIP directory (zipfile stops inflating a part at its
+# declared size, so the declaration can't be understated), or the length of a
+# text file. Larger inputs, zip bombs included, are refused before parsing.
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("WORKBOOK_MAX_DECOMPRESSED_BYTES", 64 * 1024 * 1024))
+
+# Input formats are told apart by their first bytes: xlsx files are ZIP
+# packages; legacy .xls files are OLE2 compound files; other text is read as
+# delimited text (the same layout exported as CSV or TSV by the SIS). Binary
+# files and files named like workbooks without the ZIP signature are refused.
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+DELIMITED_EXTENSIONS = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv"}
+# Bytes looked at to choose a delimiter when the file name doesn't say
+SNIFF_BYTES = 4096
+# Tried in order; text that decodes with neither isn't a CSV/TSV export
+TEXT_ENCODINGS = ("utf-8-sig", "cp1252")
+# Title given to the single "sheet" of a delimited file without a file name
+DELIMITED_SHEET_TITLE = "Sheet1"
+# Text cells holding plain integers or decimals, which xlsx stores as numbers
+NUMBER_PATTERN = re.compile(r"-?(?:\d+|\d*\.\d+)")
+
+
+class WorkbookTooLarge(ValueError):
+    """Raised for inputs that unpack to more than MAX_DECOMPRESSED_BYTES."""
+
+
+def _convert_cell(value):
+    """Normalizes a cell value the way pd.read_excel does (empty -> NaN, integral floats -> int)."""
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _convert_text(value):
+    """Types a delimited-text cell the way the xlsx export stores it: plain numbers as int/float, the rest as text.
+
+    Integers with leading zeros (which xlsx would drop) stay text, so IDs and
+    CRNs keep every character.
+    """
+    if value and NUMBER_PATTERN.fullmatch(value):
+        if "." in value:
+            return float(value)
+        if str(int(value)) == value:
+            return int(value)
+    return value
+
+
+def _trim_row(converted_row):
+    # Trim trailing empty cells so formatted-but-blank columns don't widen the grid
+    while converted_row and converted_row[-1] is np.nan:
+        converted_row.pop()
+    return converted_row
+
+
+def _frame_from_rows(value_rows, max_rows, max_cols):
+    """Builds the sheet DataFrame from rows of raw cell values, read TRUNCATION_LOOKAHEAD past the bounds.
+
+    The extra rows and columns are dropped; if they hold data, the frame's
+    SHEET_TRUNCATED attr records the bound it ran past.
+    """
+    rows = []
+    last_row_with_data = -1
+    width = 0
+    truncated = {}
+    for r_idx, row in enumerate(value_rows):
+        converted_row = _trim_row([_convert_cell(value) for value in row])
+        if r_idx >= max_rows:
+            if converted_row:
+                truncated["rows"] = max_rows
+                break
+            continue
+        if len(converted_row) > max_cols:
+            truncated["columns"] = max_cols
+            converted_row = _trim_row(converted_row[:max_cols])
+        if converted_row:
+            last_row_with_data = r_idx
+            width = max(width, len(converted_row))
+        rows.append(converted_row)
+
+    rows = rows[:last_row_with_data + 1]
+    frame = pd.DataFrame([row + [np.nan] * (width - len(row)) for row in rows])
+    if truncated:
+        frame.attrs[SHEET_TRUNCATED] = truncated
+    return frame
+
+
+def _read_sheet(sheet, max_rows, max_cols):
+    """Streams the bounded top-left block of a read-only worksheet into a DataFrame."""
+    return _frame_from_rows(sheet.iter_rows(max_row=max_rows + TRUNCATION_LOOKAHEAD,
+                                            max_col=max_cols + TRUNCATION_LOOKAHEAD, values_only=True),
+                            max_rows, max_cols)
+
+
+def sheet_format(file_contents, filename=None):
+    """Returns the input format, "xlsx", "csv" or "tsv", from the file's magic bytes and name.
+
+    Text files named .csv/.tsv are read with that delimiter; otherwise the
+    delimiter used more often in the first SNIFF_BYTES wins. Raises
+    ValueError for legacy .xls workbooks, files named .xlsx/.xlsm that aren't
+    ZIP packages, and empty or binary (NUL-containing) files.
+    """
+    head = bytes(file_contents[:SNIFF_BYTES])
+    if head.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if head.startswith(XLS_MAGIC):
+        raise ValueError("Legacy .xls workbooks are not supported; save the file as .xlsx or CSV.")
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in WORKBOOK_EXTENSIONS:
+        raise ValueError(f"File is named {extension} but is not an Excel workbook.")
+    if not head.strip():
+        raise ValueError("File is empty.")
+    if b"\0" in file_contents:
+        raise ValueError("File is neither an Excel workbook nor CSV/TSV text.")
+    if extension in DELIMITED_EXTENSIONS:
+        return DELIMITED_EXTENSIONS[extension]
+    return "tsv" if head.count(b"\t") > head.count(b",") else "csv"
+
+
+def _decode(file_contents):
+    """Decodes delimited text with the first of TEXT_ENCODINGS that fits; raises ValueError if none does."""
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return bytes(file_contents).decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    raise ValueError(f"File is not text in any of {', '.join(TEXT_ENCODINGS)}; it isn't a CSV/TSV export.")
+
+
+def _read_delimited(file_contents, delimiter, max_rows, max_cols):
+    """Parses the bounded top-left block of CSV/TSV text into a DataFrame shaped like an xlsx sheet's."""
+    # Lines are split lazily, so rows past max_rows are never parsed into cells
+    lines = StringIO(_decode(file_contents), newline="")
+    rows = islice(csv.reader(lines, delimiter=delimiter), max_rows + TRUNCATION_LOOKAHEAD)
+    return _frame_from_rows(([_convert_text(value) for value in row[:max_cols + TRUNCATION_LOOKAHEAD]] for row in rows),
+                            max_rows, max_cols)
+
+
+def _delimited_title(filename):
+    return os.path.splitext(os.path.basename(filename))[0] if filename else DELIMITED_SHEET_TITLE
+
+
+def unpacked_size(file_contents, input_format):
+    """Bytes an input unpacks to: the declared part sizes of an xlsx package, or a text file's length."""
+    if input_format != "xlsx":
+        return len(file_contents)
+    try:
+        with ZipFile(BytesIO(file_contents)) as package:
+            return sum(info.file_size for info in package.infolist())
+    except BadZipFile:
+        # Not a readable package; load_workbook reports that
+        return len(file_contents)
+
+
+def check_unpacked_size(file_contents, input_format):
+    """Raises WorkbookTooLarge if the input unpacks to more than MAX_DECOMPRESSED_BYTES."""
+    size = unpacked_size(file_contents, input_format)
+    if size > MAX_DECOMPRESSED_BYTES:
+        raise WorkbookTooLarge(f"Workbook unpacks to {size} bytes, over the {MAX_DECOMPRESSED_BYTES} byte limit.")
+
+
+def _open_workbook(file_contents):
+    if isinstance(file_contents, (bytes, bytearray)):
+        file_contents = BytesIO(file_contents)
+    return load_workbook(file_contents, read_only=True, data_only=True, keep_links=False)
+
+
+def load_sheet(file_contents, max_rows=MAX_SHEET_ROWS, max_cols=MAX_SHEET_COLS, filename=None):
+    """Loads the first worksheet of an xlsx file (or a CSV/TSV export) into a bounded DataFrame.
+
+    Cells are streamed with openpyxl in read-only, values-only mode and reading
+    stops at ``max_rows``/``max_cols``, so hidden extra sheets and trailing
+    formatted rows cost nothing. The result is indexed like
+    ``pd.read_excel(file_contents, header=None)``: integer row/column labels,
+    NaN for empty cells, and trailing empty rows and columns trimmed. A sheet
+    with data past the bounds is marked in its SHEET_TRUNCATED attr.
+
+    Delimited text (see sheet_format; ``filename`` is only a hint) is parsed
+    with the csv module into the same grid, with the same bounds. Raises
+    WorkbookTooLarge for inputs over MAX_DECOMPRESSED_BYTES.
+    """
+    input_format = sheet_format(file_contents, filename)
+    check_unpacked_size(file_contents, input_format)
+    if input_format != "xlsx":
+        return _read_delimited(file_contents, DELIMITERS[input_format], max_rows, max_cols)
+    workbook = _open_workbook(file_contents)
+    try:
+        return _read_sheet(workbook.worksheets[0], max_rows, max_cols)
+    finally:
+        workbook.close()
+
+
+def load_sheets(file_contents, max_rows=MAX_COHORT_SHEET_ROWS, max_cols=MAX_SHEET_COLS, filename=None):
+    """Loads every worksheet of an xlsx file, returning (title, DataFrame) pairs in workbook order.
+
+    The container and shared strings are parsed once for all sheets; each
+    sheet is read like load_sheet. A CSV/TSV file is a single sheet titled
+    after its file name.
+    """
+    input_format = sheet_format(file_contents, filename)
+    check_unpacked_size(file_contents, input_format)
+    if input_format != "xlsx":
+        return [(_delimited_title(filename), _read_delimited(file_contents, DELIMITERS[input_format], max_rows, max_cols))]
+    workbook = _open_workbook(file_contents)
+    try:
+        return [(sheet.title, _read_sheet(sheet, max_rows, max_cols)) for sheet in workbook.worksheets]
+    finally:
+        workbook.close()
+
+
+def write_workbook(rows):
+    """Returns the xlsx bytes of a one-sheet workbook holding rows of cell values (None leaves a cell empty)."""
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
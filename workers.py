@@ -0,0 +1,375 @@
+import logging
+import os
+import signal
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
+from cache import cache_key
+from converter import convert, convert_workbook, preview, preview_workbook, warm_up
+from records import get_record_store, input_hash
+from resources import CONVERSION_MEMORY_LIMIT_BYTES, conversion_worker_count, limit_memory
+
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes used for conversions (defaults to one per CPU, as far as memory allows)
+CONVERSION_WORKERS = int(os.environ.get("CONVERSION_WORKERS", 0)) or conversion_worker_count()
+# Wall-clock budget for one file's conversion in a worker; 0 disables it.
+# Together with the memory cap (resources.CONVERSION_MEMORY_LIMIT_BYTES) and
+# the read bounds in workbook.py, it keeps one hostile file from holding a
+# worker: the file fails with its own error and the rest of the batch carries on.
+CONVERSION_TIMEOUT_SECONDS = float(os.environ.get("CONVERSION_TIMEOUT_SECONDS", 120))
+
+
+class FileResult(NamedTuple):
+    """Outcome of converting one uploaded file: ``filename``/``data`` on success, ``error`` otherwise.
+
+    ``warnings`` holds the structured extraction warnings for a successful conversion
+    and ``timings`` the seconds spent in each conversion stage (empty for cache hits).
+    In cohort mode ``student`` labels which sheet/block of the source it came from.
+    ``grid`` is the student's converter.ScheduleGrid (None for errors and cache hits).
+    """
+    source: str
+    filename: str
+    data: bytes
+    warnings: list
+    error: str
+    timings: dict
+    student: str = None
+    grid: object = None
+
+    @property
+    def label(self):
+        """The source name, with the student block label in cohort mode."""
+        return f"{self.source} [{self.student}]" if self.student else self.source
+
+
+class ConversionTimeout(TimeoutError):
+    """Raised inside a worker when a file's conversion runs past CONVERSION_TIMEOUT_SECONDS."""
+
+
+def _on_timeout(signum, frame):
+    raise ConversionTimeout(f"Conversion took longer than {CONVERSION_TIMEOUT_SECONDS:g} seconds.")
+
+
+def _warm_up():
+    """Runs one throwaway conversion so the first real conversion in this worker doesn't pay for imports and caches.
+
+    Then puts the worker under the per-conversion budgets: the memory cap,
+    and the SIGALRM handler time_limit arms for each file.
+    """
+    warm_up()
+    limit_memory()
+    if CONVERSION_TIMEOUT_SECONDS and hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _on_timeout)
+
+
+@contextmanager
+def time_limit():
+    """Raises ConversionTimeout in the body once CONVERSION_TIMEOUT_SECONDS have passed.
+
+    Only armed in pool workers (whose initializer installs the handler); the
+    worker runs tasks on its main thread, where the signal is delivered.
+    """
+    armed = hasattr(signal, "setitimer") and signal.getsignal(signal.SIGALRM) is _on_timeout
+    if armed:
+        signal.setitimer(signal.ITIMER_REAL, CONVERSION_TIMEOUT_SECONDS)
+    try:
+        yield
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def describe_error(e):
+    """The per-file error message for an exception raised while converting a file."""
+    if isinstance(e, MemoryError):
+        return f"MemoryError: Conversion needed more than the {CONVERSION_MEMORY_LIMIT_BYTES} bytes of memory a worker may use."
+    return f"{type(e).__name__}: {e}"
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def previous_render():
+    """The record store's lookup of earlier conversions to patch, or None without a store."""
+    store = get_record_store()
+    if store is None:
+        return None
+
+    def lookup(uid):
+        try:
+            return store.previous_render(uid)
+        except sqlite3.Error as e:
+            logger.warning("Could not look up the previous conversion of %s: %s", uid, e)
+            return None
+    return lookup
+
+
+def store_records(file_contents, source, results):
+    """Saves the (label, ConversionResult) pairs of a file to the record store, if one is configured."""
+    store = get_record_store()
+    if store is None:
+        return
+    try:
+        store.put(input_hash(file_contents), results, source)
+    except sqlite3.Error as e:
+        # The store is a by-product; the documents are still good
+        logger.warning("Could not save extracted records of %s: %s", source or "upload", e)
+
+
+def convert_file(file_contents, source=None):
+    """Runs convert on one file, returning (filename, docx_bytes, warnings, error, timings, grid) instead of raising."""
+    try:
+        with time_limit():
+            result = convert(file_contents, previous_render(), source)
+            store_records(file_contents, source, [(None, result)])
+        filename, docx_bytes, warnings, timings, grid, _ = result
+    except Exception as e:
+        return None, None, [], describe_error(e), {}, None
+    return filename, docx_bytes, warnings, None, timings, grid
+
+
+def convert_cohort_file(file_contents, source=None):
+    """Runs convert_workbook on one file, returning (documents, error) instead of raising.
+
+    ``documents`` is a list of (label, filename, docx_bytes, warnings, timings, grid), one per student.
+    """
+    try:
+        with time_limit():
+            results = convert_workbook(file_contents, previous_render(), source)
+            store_records(file_contents, source, results)
+    except Exception as e:
+        return [], describe_error(e)
+    return [(label, *result[:-1]) for label, result in results], None
+
+
+def preview_file(file_contents, cohort=False, source=None):
+    """Runs preview (or preview_workbook) on one file, returning (previews, error) instead of raising.
+
+    ``previews`` is a list of (label, preview dict); the label is None outside cohort mode.
+    """
+    try:
+        with time_limit():
+            if cohort:
+                return preview_workbook(file_contents, source), None
+            return [(None, preview(file_contents, source))], None
+    except Exception as e:
+        return [], describe_error(e)
+
+
+def read_contents(contents):
+    """The bytes of an input file: ``contents`` itself, or those read from an uploads.Upload."""
+    return contents if isinstance(contents, (bytes, bytearray)) else contents.read()
+
+
+def convert_path(path, cohort=False):
+    """Reads and converts one workbook file, returning the same result as convert_file (or convert_cohort_file)."""
+    try:
+        with open(path, "rb") as input_file:
+            file_contents = input_file.read()
+    except OSError as e:
+        error = f"{type(e).__name__}: {e}"
+        return ([], error) if cohort else (None, None, [], error, {}, None)
+    return convert_cohort_file(file_contents, path) if cohort else convert_file(file_contents, path)
+
+
+class ConversionPool:
+    """A persistent process pool that converts batches of files in parallel.
+
+    Worker processes are started and warmed up once, then reused for every
+    batch. Results come back in submission order, and a failure in one file
+    (including a crashed worker) is reported as that file's error.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or CONVERSION_WORKERS
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker processes and waits until each has run the warm-up."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_warm_up)
+                # Workers may be spawned on demand, so submit one task per worker to bring them all up
+                for future in [self._executor.submit(_worker_pid) for _ in range(self.max_workers)]:
+                    future.result()
+            return self._executor
+
+    def submit(self, func, *args):
+        executor = self._executor or self.start()
+        try:
+            return executor.submit(func, *args)
+        except BrokenProcessPool:
+            # A worker died during an earlier batch; replace the pool and retry once
+            self._reset(executor)
+            return self.start().submit(func, *args)
+
+    def iter_convert(self, files, cache=None, cohort=False, window=None):
+        """Converts (source_name, file_contents) pairs and yields a FileResult per input in order.
+
+        At most ``window`` files (default four per worker) are queued at once,
+        and each entry is dropped as its result is yielded, so a batch streamed
+        into an archive holds about a window of documents rather than all of
+        them. ``file_contents`` may also be an uploads.Upload, which is read
+        only when its file is queued. With a ConversionCache, files already converted are served from
+        it without reaching a worker, and new successful results are stored in it.
+
+        With ``cohort``, every student in each workbook is converted (see
+        converter.convert_workbook) and a file yields one FileResult per
+        student, or a single error result. Cohort conversions bypass the cache.
+        """
+        window = window or self.max_workers * 4
+        if cohort:
+            collect = lambda source, future, key: self._cohort_results(source, future)
+        else:
+            collect = lambda source, future, key: [self._result(source, future, key, cache)]
+        pending = deque()
+        # Conversions still in the window, by cache key; a duplicate after its
+        # original has left the window is served from the cache instead
+        in_flight = {}
+
+        def finish_first():
+            source, future, key = pending.popleft()
+            if in_flight.get(key) is future:
+                del in_flight[key]
+            return collect(source, future, key)
+
+        for source, contents in files:
+            pending.append(self._queue(source, contents, cache, cohort, in_flight))
+            del contents
+            if len(pending) >= window:
+                yield from finish_first()
+        while pending:
+            yield from finish_first()
+
+    def _queue(self, source, contents, cache, cohort, in_flight):
+        """Starts one file's conversion (or finds its result) and returns its (source, future, key) entry."""
+        contents = read_contents(contents)
+        if cohort:
+            return source, self.submit(convert_cohort_file, contents, source), None
+        if cache is None:
+            return source, self.submit(convert_file, contents, source), None
+        key = cache_key(contents, filename=source)
+        if key in in_flight:
+            # Same workbook twice in one window: share the first conversion
+            return source, in_flight[key], None
+        cached = cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result((*cached, None, {}, None))
+            return source, future, None
+        future = in_flight[key] = self.submit(convert_file, contents, source)
+        return source, future, key
+
+    def iter_convert_paths(self, paths, window=None, cohort=False):
+        """Converts workbook files by path and yields a FileResult per path (per student with ``cohort``) in input order.
+
+        Files are read by the workers, not this process, and at most ``window``
+        (default four per worker) are queued at once, so arbitrarily long path
+        lists run in bounded memory.
+        """
+        window = window or self.max_workers * 4
+        collect = self._cohort_results if cohort else (lambda source, future: [self._result(source, future)])
+        pending = deque()
+        for path in paths:
+            pending.append((path, self.submit(convert_path, path, cohort)))
+            if len(pending) >= window:
+                yield from collect(*pending.popleft())
+        while pending:
+            yield from collect(*pending.popleft())
+
+    def preview_many(self, files, cohort=False, window=None):
+        """Extracts (source_name, file_contents) pairs without rendering, returning a list of JSON-ready dicts.
+
+        Each dict holds ``source`` and either the preview fields (plus
+        ``student`` in cohort mode) or ``error``; a cohort file gives one dict
+        per student. Like iter_convert, at most ``window`` files are queued at once.
+        """
+        window = window or self.max_workers * 4
+        pending = deque()
+        previews = []
+        for source, contents in files:
+            pending.append((source, self.submit(preview_file, read_contents(contents), cohort, source)))
+            if len(pending) >= window:
+                previews.extend(self._previews(*pending.popleft(), cohort))
+        while pending:
+            previews.extend(self._previews(*pending.popleft(), cohort))
+        return previews
+
+    @staticmethod
+    def _previews(source, future, cohort):
+        try:
+            students, error = future.result()
+        except BrokenProcessPool:
+            students, error = [], "Conversion worker crashed while processing this file."
+        except Exception as e:
+            students, error = [], f"{type(e).__name__}: {e}"
+        previews = [{"source": source, "error": error}] if error else []
+        for label, record in students:
+            previews.append({"source": source, **({"student": label} if cohort else {}), **record})
+        return previews
+
+    def convert_many(self, files, cache=None):
+        """Converts (source_name, file_contents) pairs, returning a FileResult per input in order."""
+        return list(self.iter_convert(files, cache))
+
+    @staticmethod
+    def _result(source, future, key=None, cache=None):
+        try:
+            filename, data, warnings, error, timings, grid = future.result()
+        except BrokenProcessPool:
+            filename, data, warnings, error, timings, grid = None, None, [], "Conversion worker crashed while processing this file.", {}, None
+        except Exception as e:
+            filename, data, warnings, error, timings, grid = None, None, [], f"{type(e).__name__}: {e}", {}, None
+        if key is not None and error is None:
+            cache.put(key, filename, data, warnings)
+        return FileResult(source, filename, data, warnings, error, timings, grid=grid)
+
+    @staticmethod
+    def _cohort_results(source, future):
+        try:
+            documents, error = future.result()
+        except BrokenProcessPool:
+            documents, error = [], "Conversion worker crashed while processing this file."
+        except Exception as e:
+            documents, error = [], f"{type(e).__name__}: {e}"
+        if error:
+            return [FileResult(source, None, None, [], error, {})]
+        return [
+            FileResult(source, filename, data, warnings, None, timings, label, grid)
+            for label, filename, data, warnings, timings, grid in documents
+        ]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+    def _reset(self, broken_executor):
+        with self._lock:
+            if self._executor is broken_executor:
+                broken_executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide ConversionPool, starting it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConversionPool()
+    _default_pool.start()
+    return _default_pool